@@ -0,0 +1,39 @@
+# app/access_tags.py
+# Access tags in chunk metadata: "access_tags" (comma-joined, for display) plus one boolean
+# tag_<name> key per tag, which vector queries filter on natively.
+
+# prefix of the boolean per-tag metadata keys
+TAG_KEY_PREFIX = "tag_"
+
+
+def tag_key(tag: str) -> str:
+    return f"{TAG_KEY_PREFIX}{tag}"
+
+
+# tags of a comma-joined access_tags string
+def split_access_tags(access_tag: str) -> list[str]:
+    return [tag.strip() for tag in (access_tag or "").split(",") if tag.strip()]
+
+
+# sets access_tags and the tag_<name> keys of a chunk metadata dict, replacing the tag keys already in it
+# previous: access_tags already stored for the chunk; their keys are set to None, which makes
+# ChromaDB remove them on update/upsert (metadata updates merge with the stored keys)
+def set_access_tags(meta: dict, access_tag: str, previous: str = None) -> dict:
+    for key in [key for key in meta if key.startswith(TAG_KEY_PREFIX)]:
+        del meta[key]
+    tags = split_access_tags(access_tag)
+    for tag in split_access_tags(previous):
+        if tag not in tags:
+            meta[tag_key(tag)] = None
+    meta["access_tags"] = access_tag
+    for tag in tags:
+        meta[tag_key(tag)] = True
+    return meta
+
+
+# where filter matching the chunks readable with any of the given tags; None when there are no tags
+def access_filter(tags: list[str]) -> dict:
+    conditions = [{tag_key(tag): True} for tag in dict.fromkeys(tags or [])]
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
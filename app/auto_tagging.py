@@ -6,6 +6,14 @@ import os
 import asyncio
 import fitz  # PyMuPDF
 import aiohttp
+from app.config import (
+    TAG_KEYWORDS_FILE, TAG_CLASSIFIER_PATH, TAG_CLASSIFIER_MIN_CONFIDENCE, TAG_CHUNK_SMOOTHING,
+    LLM_TAG_CONCURRENCY, LLM_TAG_TIMEOUT, LLM_TAG_RETRIES, LLM_TAG_CACHE_SIZE, LLM_TAG_FALLBACK
+)
+from app.keyword_matcher import KeywordMatcher, load_keyword_patterns
+from app.llm_tagger import LLMTagger
+from app.tag_classifier import load_tag_classifier
+from app.pdf_extractor import ParsedDocument, open_pdf_stream
 
 logging.basicConfig(level=logging.INFO)
 
@@ -20,6 +28,29 @@ PATTERNS = {
     "general_access": ["announcement", "notice", "schedule", "event", "update", "welcome", "guide", "handbook", "policy"]
 }
 
+# a keyword file from config replaces the built-in patterns
+if TAG_KEYWORDS_FILE:
+    PATTERNS = load_keyword_patterns(TAG_KEYWORDS_FILE)
+    unknown_tags = set(PATTERNS) - set(ACCESS_TAGS)
+    if unknown_tags:
+        logging.warning(f"⚠️ Ignoring keywords of unknown tags {sorted(unknown_tags)} in {TAG_KEYWORDS_FILE}")
+        PATTERNS = {tag: keywords for tag, keywords in PATTERNS.items() if tag in ACCESS_TAGS}
+
+# every keyword compiled once into a single matcher
+keyword_matcher = KeywordMatcher(PATTERNS)
+
+# embedding classifier, loaded on first use (None when no classifier was trained)
+_tag_classifier = None
+_tag_classifier_loaded = False
+
+def get_tag_classifier():
+    global _tag_classifier, _tag_classifier_loaded
+    if not _tag_classifier_loaded:
+        from app.embedder import embedding_model_id
+        _tag_classifier = load_tag_classifier(TAG_CLASSIFIER_PATH, embedding_model_id)
+        _tag_classifier_loaded = True
+    return _tag_classifier
+
 # llm for fallback strategy:
 llm = Ollama(
     model="mistral",
@@ -49,28 +80,22 @@ Document content:
 \"\"\"
 """
 
-# Async function to call Ollama
-async def call_ollama(prompt: str) -> list:
-    response = await llm.ainvoke(prompt)
-    try:
-        tag_data = eval(response.strip())  # simple JSON-likex
-        return tag_data.get("access_tags", [])
-    except Exception as e:
-        print("⚠️ Failed to parse tags:", response)
-        return []
-    
+# every LLM tagging call goes through one bounded, cached tagger,
+# so a bulk upload never sends more than LLM_TAG_CONCURRENCY requests to Ollama at a time
+llm_tagger = LLMTagger(
+    llm,
+    ACCESS_TAGS,
+    build_llm_prompt,
+    concurrency=LLM_TAG_CONCURRENCY,
+    timeout=LLM_TAG_TIMEOUT,
+    retries=LLM_TAG_RETRIES,
+    cache_size=LLM_TAG_CACHE_SIZE,
+    fallback_tag=LLM_TAG_FALLBACK
+)
 
 async def classify_with_llm(text:str)->str:
     """Call LLM to classify and return a single tag."""
-    prompt = build_llm_prompt(text)
-    response = await llm.ainvoke(prompt)
-    tag = response.strip().lower()
-
-    if tag in ACCESS_TAGS:
-        return tag
-    else:
-        logging.warning(f"⚠️ Unexpected LLM response: {response}")
-        return "general_access"  # Fallback default    
+    return await llm_tagger.classify(text)
 
 # Text extractor using PyMuPDF
 def extract_pdf_text(pdf_path: str) -> str:
@@ -92,59 +117,61 @@ def extract_text_head(pdf_path: str, max_words: int = 100) -> str:
     return " ".join(text.split()[:max_words])
 
 def match_by_keywords(text: str) -> str:
-    """Match patterns in the first `k` words of text and return access tag."""
-    text_lower = text.lower()
-    match_counts = {tag: 0 for tag in ACCESS_TAGS}
-
-    for tag, keywords in PATTERNS.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                match_counts[tag] += 1
-
-    # Choose tag with highest match count
-    best_tag = max(match_counts, key=match_counts.get)
+    """Match patterns in the text in one pass and return the access tag with the most keywords, or None."""
+    return keyword_matcher.best_tag(text)
 
-    if match_counts[best_tag] > 0:
-        # If best tag is general_access, return only that
-        return "general_access" if best_tag == "general_access" else best_tag
-    else:
-        return None  # No confident match
+# True when a document without keyword match can be tagged from its chunk embeddings,
+# so the ingestion pipeline should tag it after the embedding stage
+def needs_chunk_embeddings(pdf: ParsedDocument) -> bool:
+    return match_by_keywords(pdf.head) is None and get_tag_classifier() is not None
 
 # === MAIN ASYNC FUNCTION ===
-async def auto_tag_pdf(pdf_path: str) -> str:
-    """Return a single access tag for the given PDF path."""
-    logging.info(f"🔍 Processing: {pdf_path}")
-
-    head_text = extract_text_head(pdf_path)
-    tag = match_by_keywords(head_text)
+# the ingestion pipeline passes the ParsedDocument it already decoded,
+# so the PDF is not opened again for tagging
+# with chunk_embeddings, the embedding classifier is tried before the LLM
+async def auto_tag_pdf(pdf: ParsedDocument | str, chunk_embeddings: list[list[float]] = None) -> str:
+    """Return a single access tag for the given parsed PDF (or PDF path)."""
+    if isinstance(pdf, str):
+        # only the pages needed for the head are decoded; the PDF is closed right away
+        pdf, pages = open_pdf_stream(pdf)
+        pages.close()
+    logging.info(f"🔍 Processing: {pdf.path}")
+
+    tag = match_by_keywords(pdf.head)
 
     if tag:
         logging.info(f"✅ Rule-based tag found: {tag}")
         return tag
-    else:
-        logging.info("🤖 No confident keyword match, falling back to LLM...")
-        full_text = extract_text_head(pdf_path)
-        tag = await classify_with_llm(full_text)
-        logging.info(f"✅ LLM-based tag: {tag}")
-        return tag
-
-# # Main async function
-# async def auto_tag_pdfs(pdf_dir: str = "./pdfs"):
-#     tagged_results = {}
-
-#     for filename in os.listdir(pdf_dir):
-#         if filename.endswith(".pdf"):
-#             path = os.path.join(pdf_dir, filename)
-#             print(f"🔍 Processing {filename}...")
-
-#             text = extract_pdf_text(path)
-#             prompt = build_prompt(text)
-#             tags = await call_ollama(prompt)
-
-#             tagged_results[filename] = tags
-#             print(f"✅ {filename} → Tags: {tags}")
 
-#     return tagged_results
+    classifier = get_tag_classifier() if chunk_embeddings else None
+    if classifier is not None:
+        tag, confidence = classifier.classify_document(chunk_embeddings)
+        if confidence >= TAG_CLASSIFIER_MIN_CONFIDENCE:
+            logging.info(f"✅ Embedding classifier tag: {tag} (confidence {confidence:.2f})")
+            return tag
+        logging.info(f"Embedding classifier not confident ({tag}, {confidence:.2f})")
+
+    logging.info("🤖 No confident keyword match, falling back to LLM...")
+    tag = await classify_with_llm(pdf.head)
+    logging.info(f"✅ LLM-based tag: {tag}")
+    return tag
+
+# per-chunk access tags for mixed-content documents (TAG_MODE = "chunk")
+# every chunk is classified in one pass over the chunk embedding matrix, no extra model call;
+# chunks the classifier is not confident about keep the document's tag
+def tag_chunks(chunk_embeddings: list[list[float]], document_tag: str, smoothing: int = TAG_CHUNK_SMOOTHING) -> list[str]:
+    classifier = get_tag_classifier()
+    if classifier is None or not chunk_embeddings:
+        return [document_tag] * len(chunk_embeddings)
+    tags, confidences = classifier.classify_chunks(chunk_embeddings, smoothing)
+    chunk_tags = [
+        tag if confidence >= TAG_CLASSIFIER_MIN_CONFIDENCE else document_tag
+        for tag, confidence in zip(tags, confidences)
+    ]
+    retagged = sum(tag != document_tag for tag in chunk_tags)
+    if retagged:
+        logging.info(f"✅ {retagged}/{len(chunk_tags)} chunks tagged differently from the document ({document_tag})")
+    return chunk_tags
 
 # For standalone test
 if __name__ == "__main__":
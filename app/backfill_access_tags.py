@@ -0,0 +1,11 @@
+# app/backfill_access_tags.py
+# Adds the per-tag metadata keys (tag_<name>: True) to chunks ingested before they existed.
+# RBAC queries filter on these keys, so such chunks are not returned until this has run once.
+#
+#   python -m app.backfill_access_tags
+from app.document_store import backfill_access_tag_keys
+
+if __name__ == "__main__":
+    print("Backfilling access tag keys in the ChromaDB collection...")
+    updated = backfill_access_tag_keys()
+    print(f"Updated {updated} chunks.")
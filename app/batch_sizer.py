@@ -0,0 +1,67 @@
+# app/batch_sizer.py
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveBatchSizer:
+    """
+    Batch size driven by the observed write latency.
+
+    Every write reports its size and duration; the per-item write time is smoothed
+    (exponential moving average) and the next batch size is the number of items that
+    should take target_seconds to write. The size grows by at most growth per write,
+    so one fast write on an idle store does not jump straight to max_size.
+
+    Args:
+        initial (int): Batch size before any write was measured.
+        min_size (int): Smallest batch size.
+        max_size (int): Largest batch size.
+        target_seconds (float): Wanted duration of one write.
+        smoothing (float): Weight of the newest measurement in the moving average.
+        growth (float): Max factor between two consecutive sizes.
+    """
+
+    def __init__(self, initial: int, min_size: int, max_size: int, target_seconds: float,
+                 smoothing: float = 0.3, growth: float = 2.0):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.growth = growth
+        self.seconds_per_item = None
+        self._size = max(min_size, min(initial, max_size))
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def record(self, count: int, seconds: float) -> int:
+        """
+        Record one write and return the new batch size.
+
+        Args:
+            count (int): Items written.
+            seconds (float): Duration of the write.
+        Returns:
+            int: Batch size for the next write.
+        """
+        if count <= 0:
+            return self._size
+        with self._lock:
+            per_item = max(seconds, 1e-6) / count
+            if self.seconds_per_item is None:
+                self.seconds_per_item = per_item
+            else:
+                self.seconds_per_item += self.smoothing * (per_item - self.seconds_per_item)
+
+            wanted = int(self.target_seconds / self.seconds_per_item)
+            wanted = min(wanted, int(self._size * self.growth))
+            size = max(self.min_size, min(wanted, self.max_size))
+            if size != self._size:
+                logger.info(f"Write batch size {self._size} -> {size} ({self.seconds_per_item * 1000:.2f} ms per item)")
+                self._size = size
+            return size
@@ -0,0 +1,220 @@
+# app/bulk_ingest.py
+# Headless bulk loader: ingests every PDF under a directory through the ingestion pipeline,
+# without going through the API.
+#
+#   python -m app.bulk_ingest ./corpus --user admin [--access-tags hr_only,hr_user]
+#
+# Every file is appended to a JSONL checkpoint ({"path", "size", "mtime", "status", ...}) as soon as
+# the pipeline reports its result. Running the same command again skips the files already recorded
+# as done, so an interrupted load resumes where it stopped; only the files that were in flight are
+# ingested again (the chunks they had written are deleted first, see IngestionPipeline).
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from app.ingestion_pipeline import IngestionPipeline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# statuses that need no further work
+DONE_STATUSES = ("success", "duplicate")
+
+
+# --- FUNCTION: find_files ---
+
+# every file under root matching the extension, in a stable order
+def find_files(root: str, extension: str = ".pdf") -> list[str]:
+    paths = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(extension):
+                paths.append(os.path.join(directory, filename))
+    return paths
+
+
+# --- FUNCTION: load_checkpoint ---
+
+# {path: last record} from a JSONL checkpoint; a truncated last line (crash while writing) is ignored
+def load_checkpoint(path: str) -> dict:
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record["path"]] = record
+    return records
+
+
+# a file is done when its last record succeeded and it has not changed since
+def is_done(record: dict, path: str) -> bool:
+    if not record or record["status"] not in DONE_STATUSES:
+        return False
+    stat = os.stat(path)
+    return record["size"] == stat.st_size and record["mtime"] == stat.st_mtime
+
+
+class BulkIngestor:
+    """
+    Ingests a list of files as one continuous stream, checkpointing every file as soon as it is finished.
+
+    Up to max_in_flight files are in the pipeline at a time, and the next file starts as soon as
+    one finishes, so a slow file only holds its own slot instead of the files queued behind it.
+    The files share the pipeline's process pool, embedding service and ChromaDB writer.
+
+    Args:
+        checkpoint_path (str): JSONL file recording the result of every file.
+        access_tags (list[str]): Manual access tags; auto-tagging is used when empty.
+        user (dict): Owner recorded as created_by, must contain 'username'.
+        max_in_flight (int): Files being ingested at the same time.
+        streaming (bool): Force the streaming mode on or off (default: by file size).
+        pipeline (IngestionPipeline): Pipeline settings to ingest with; each file runs through a
+            copy whose progress callback is the ingestor's, which writes the checkpoint.
+    """
+
+    def __init__(self, checkpoint_path: str, access_tags: list[str] = None, user: dict = {},
+                 max_in_flight: int = 32, streaming: bool = None, pipeline: IngestionPipeline = None):
+        self.checkpoint_path = checkpoint_path
+        self.access_tags = access_tags
+        self.user = user
+        self.max_in_flight = max_in_flight
+        self.streaming = streaming
+        self.pipeline = pipeline or IngestionPipeline()
+        self.pages = 0
+        self.chunks = 0
+        self.done = 0
+        self.statuses = {}
+        self.total_bytes = 0
+        # os.stat() of the files in flight and the open checkpoint file
+        self._stats = {}
+        self._checkpoint_file = None
+        self._start = None
+
+    def _on_progress(self, path: str, filename: str, event: str, index: int = None, **data):
+        if event == "parsed":
+            self.pages += data.get("pages") or 0
+        elif event == "written":
+            self.chunks += data.get("count", 0)
+        elif event == "finished":
+            self._record(path, data["result"])
+
+    # appends the result of a file to the checkpoint, durably
+    def _record(self, path: str, result: dict):
+        stat = self._stats.pop(path)
+        record = {
+            "path": path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "status": result["status"],
+            "document_id": result.get("document_id"),
+            "chunks": result.get("chunks_uploaded", 0),
+            "reason": result.get("reason"),
+        }
+        self._checkpoint_file.write(json.dumps(record) + "\n")
+        self._checkpoint_file.flush()
+        os.fsync(self._checkpoint_file.fileno())
+        self.statuses[result["status"]] = self.statuses.get(result["status"], 0) + 1
+        self.total_bytes += stat.st_size
+        self.done += 1
+        if self.done % self.max_in_flight == 0:
+            elapsed = time.perf_counter() - self._start
+            logger.info(f"{self.done} files ({self.done / elapsed:.1f} files/s, {self.chunks} chunks written)")
+
+    # ingests one file through its own copy of the pipeline, so its progress events carry its path
+    async def _ingest(self, path: str):
+        pipeline = copy.copy(self.pipeline)
+        pipeline.progress = lambda *args, **kwargs: self._on_progress(path, *args, **kwargs)
+        # the file is checkpointed by _on_progress when the pipeline reports it finished
+        await pipeline.run([(os.path.basename(path), path)], self.access_tags, self.user, streaming=self.streaming)
+
+    async def run(self, paths: list[str]) -> dict:
+        """
+        Ingest the files not yet recorded as done in the checkpoint.
+
+        Args:
+            paths (list[str]): Files to ingest.
+        Returns:
+            dict: Throughput summary.
+        """
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        pending = [path for path in paths if not is_done(checkpoint.get(path), path)]
+        logger.info(f"{len(paths)} files, {len(paths) - len(pending)} already done, {len(pending)} to ingest.")
+
+        self._start = start = time.perf_counter()
+        slots = asyncio.Semaphore(self.max_in_flight)
+        in_flight = set()
+
+        async def ingest(path: str):
+            try:
+                await self._ingest(path)
+            finally:
+                slots.release()
+
+        with open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+            self._checkpoint_file = checkpoint_file
+            # files are started one by one as slots free up, so only max_in_flight tasks exist at a time
+            try:
+                for path in pending:
+                    await slots.acquire()
+                    self._stats[path] = os.stat(path)
+                    task = asyncio.create_task(ingest(path))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                await asyncio.gather(*in_flight)
+            finally:
+                # interrupted: the files in flight are not checkpointed and start over on the next run
+                for task in in_flight:
+                    task.cancel()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "files": len(paths),
+            "skipped": len(paths) - len(pending),
+            "ingested": len(pending),
+            "statuses": self.statuses,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "megabytes": round(self.total_bytes / 1024 / 1024, 2),
+            "seconds": round(elapsed, 2),
+            "files_per_sec": round(len(pending) / elapsed, 2) if elapsed else 0.0,
+            "pages_per_sec": round(self.pages / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_sec": round(self.chunks / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest every PDF under a directory, with checkpoint and resume.")
+    parser.add_argument("directory", help="root directory to walk")
+    parser.add_argument("--user", default="bulk_ingest", help="username recorded as created_by")
+    parser.add_argument("--access-tags", default="", help="comma-separated manual access tags (default: auto-tagging)")
+    parser.add_argument("--checkpoint", help="JSONL checkpoint file (default: <directory>/.bulk_ingest_checkpoint.jsonl)")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="files being ingested at the same time")
+    streaming = parser.add_mutually_exclusive_group()
+    streaming.add_argument("--streaming", dest="streaming", action="store_true", default=None)
+    streaming.add_argument("--no-streaming", dest="streaming", action="store_false")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or os.path.join(args.directory, ".bulk_ingest_checkpoint.jsonl")
+    access_tags = [tag.strip() for tag in args.access_tags.split(",") if tag.strip()]
+    ingestor = BulkIngestor(
+        checkpoint_path, access_tags, {"username": args.user}, max_in_flight=args.max_in_flight, streaming=args.streaming
+    )
+    summary = asyncio.run(ingestor.run(find_files(args.directory)))
+
+    print(
+        f"Ingested {summary['ingested']} files ({summary['skipped']} already done) in {summary['seconds']}s: "
+        f"{summary['files_per_sec']} files/s, {summary['pages_per_sec']} pages/s, {summary['chunks_per_sec']} chunks/s"
+    )
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
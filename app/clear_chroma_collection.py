@@ -1,17 +1,46 @@
-from app.vector_store import chroma_collection
+import argparse
+from app.document_store import delete_documents
+from app.vector_store import chroma_client, vector_store
 
-def batch_iterable(iterable, batch_size):
-    for i in range(0, len(iterable), batch_size):
-        yield iterable[i:i + batch_size]
+BATCH_SIZE = 1000
+
+# deletes every chunk of the collection, one page of ids at a time (ids only, no documents or metadata)
+def clear_collection(collection=vector_store, batch_size: int = BATCH_SIZE) -> int:
+    deleted = 0
+    while True:
+        batch = collection.get(include=[], limit=batch_size)["ids"]
+        if not batch:
+            return deleted
+        collection.delete(ids=batch)
+        deleted += len(batch)
+        print(f"Deleted batch of {len(batch)} documents.")
+
+# drops the temp_filtered_context_* collections left behind by crashed queries of the old retriever
+def drop_temp_collections(client=chroma_client, prefix: str = "temp_filtered_context_") -> int:
+    names = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    dropped = [name for name in names if name.startswith(prefix)]
+    for name in dropped:
+        client.delete_collection(name)
+    return len(dropped)
 
 if __name__ == "__main__":
-    print("Clearing all documents from ChromaDB collection...")
-    all_ids = chroma_collection.get()["ids"]
-    if all_ids:
-        BATCH_SIZE = 1000
-        for batch in batch_iterable(all_ids, BATCH_SIZE):
-            chroma_collection.delete(ids=batch)
-            print(f"Deleted batch of {len(batch)} documents.")
-        print(f"Deleted {len(all_ids)} documents from ChromaDB collection.")
+    parser = argparse.ArgumentParser(description="Delete documents from the vector store (all of them without filters).")
+    parser.add_argument("--document-id")
+    parser.add_argument("--title")
+    parser.add_argument("--created-by")
+    parser.add_argument("--access-tag")
+    parser.add_argument("--temp-collections", action="store_true", help="only drop leftover temporary retriever collections")
+    args = parser.parse_args()
+
+    if args.temp_collections:
+        print(f"Dropped {drop_temp_collections()} temporary collections.")
+    elif any((args.document_id, args.title, args.created_by, args.access_tag)):
+        result = delete_documents(args.document_id, args.title, args.created_by, args.access_tag)
+        print(f"Deleted {result['chunks_deleted']} chunks of {len(result['document_ids'])} documents.")
     else:
-        print("ChromaDB collection is already empty.")
\ No newline at end of file
+        print("Clearing all documents from the vector store...")
+        deleted = clear_collection()
+        if deleted:
+            print(f"Deleted {deleted} documents from the vector store.")
+        else:
+            print("The vector store is already empty.")
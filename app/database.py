@@ -2,7 +2,7 @@
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, String, Integer, Table, ForeignKey, ARRAY, Text, DateTime, select, insert
+from sqlalchemy import Column, String, Integer, Table, ForeignKey, ARRAY, Text, DateTime, Index, select, insert
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -10,6 +10,7 @@ import os
 from pgvector.sqlalchemy import Vector
 from dotenv import load_dotenv
 from sqlalchemy import cast, ARRAY
+from app.config import EMBEDDING_DIMENSION, PGVECTOR_HNSW_M, PGVECTOR_HNSW_EF_CONSTRUCTION
 load_dotenv()
 
 # --- Database URL ---
@@ -38,6 +39,33 @@ class User(Base):
     access_tags = Column(ARRAY(Text))
     hashed_password = Column(String)
 
+# --- TABLE: document_chunks ---
+
+# chunk store of the pgvector evaluation store (app/pg_vector_store.py), one row per chunk
+# same ids and metadata as the ChromaDB collection; access_tags is an array so RBAC is an && overlap in SQL
+# HNSW index on the embedding (L2, like the ChromaDB collection), GIN index on access_tags
+class DocumentChunk(Base):
+    __tablename__ = 'document_chunks'
+    id = Column(String, primary_key=True)
+    document_id = Column(String, index=True)
+    chunk_index = Column(Integer)
+    title = Column(String, index=True)
+    created_by = Column(String, index=True)
+    content_hash = Column(String, index=True)
+    chunk_hash = Column(String, index=True)
+    content = Column(Text)
+    access_tags = Column(ARRAY(Text))
+    embedding = Column(Vector(EMBEDDING_DIMENSION))
+    __table_args__ = (
+        Index(
+            "ix_document_chunks_embedding_hnsw", "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": PGVECTOR_HNSW_M, "ef_construction": PGVECTOR_HNSW_EF_CONSTRUCTION},
+            postgresql_ops={"embedding": "vector_l2_ops"},
+        ),
+        Index("ix_document_chunks_access_tags", "access_tags", postgresql_using="gin"),
+    )
+
 # --- TABLE: document_metadata ---
 
 # # table to store metadata of documents
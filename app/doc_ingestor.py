@@ -1,14 +1,12 @@
-# app/doc_ingestor_mcp.py
+# app/doc_ingestor.py
 
-from app.database import store_metadata
-from app.embedder import embed_doc
 from fastapi import HTTPException, UploadFile
 from app.models import UploadRequest
-from app.vector_store import chroma_collection
-from app.embedder import splitter
-from app.auto_tagging import auto_tag_pdf
-from langchain_community.document_loaders import PyPDFLoader
-import tempfile
+from app.ingestion_pipeline import IngestionPipeline
+from app.config import INGEST_UPLOAD_DIR, UPLOAD_CHUNK_SIZE, MAX_UPLOAD_FILE_BYTES, MAX_UPLOAD_REQUEST_BYTES
+import aiofiles
+import hashlib
+import shutil
 import os
 import uuid
 import logging
@@ -16,110 +14,127 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def batch_iterable(iterable, batch_size):
-    for i in range(0, len(iterable), batch_size):
-        yield iterable[i:i + batch_size]
+# copies one upload to path in UPLOAD_CHUNK_SIZE pieces with non-blocking file I/O
+# the file is hashed while it streams, so ingestion does not read it again for deduplication
+# raises 413 as soon as the file grows past max_bytes
+# returns the number of bytes written and the sha256 of the file
+async def save_upload(file: UploadFile, path: str, max_bytes: int = MAX_UPLOAD_FILE_BYTES) -> tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(path, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{file.filename} is larger than the {max_bytes} bytes upload limit."
+                )
+            digest.update(chunk)
+            await out.write(chunk)
+    return size, digest.hexdigest()
+
+# saves uploaded files under their own directory in INGEST_UPLOAD_DIR
+# enforces the per-file and per-request size limits; on any error nothing is left on disk
+# returns (filename, path, file_hash) tuples for the ingestion pipeline / job manager
+async def save_uploads(files: list[UploadFile], upload_dir: str = INGEST_UPLOAD_DIR,
+                       max_request_bytes: int = MAX_UPLOAD_REQUEST_BYTES) -> list[tuple[str, str, str]]:
+    # reject early when the sizes are already known
+    known_total = sum(file.size or 0 for file in files)
+    if known_total > max_request_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload is larger than the {max_request_bytes} bytes limit.")
+    for file in files:
+        if file.size is not None and file.size > MAX_UPLOAD_FILE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{file.filename} is larger than the {MAX_UPLOAD_FILE_BYTES} bytes upload limit."
+            )
+
+    batch_dir = os.path.join(upload_dir, str(uuid.uuid4()))
+    os.makedirs(batch_dir, exist_ok=True)
+
+    saved = []
+    total = 0
+    try:
+        for i, file in enumerate(files):
+            # the index keeps two uploads with the same name apart
+            path = os.path.join(batch_dir, f"{i}_{os.path.basename(file.filename)}")
+            remaining = max_request_bytes - total
+            try:
+                size, file_hash = await save_upload(file, path, min(MAX_UPLOAD_FILE_BYTES, remaining))
+            except HTTPException as e:
+                if e.status_code == 413 and remaining < MAX_UPLOAD_FILE_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Upload is larger than the {max_request_bytes} bytes limit.")
+                raise
+            total += size
+            saved.append((file.filename, path, file_hash))
+    except BaseException:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Saved {len(saved)} uploads ({total} bytes) to {batch_dir}")
+    return saved
+
+# removes files saved by save_uploads, and their batch directory once it is empty
+def cleanup_uploads(paths: list[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove upload {path}: {e}")
+
+    for batch_dir in {os.path.dirname(path) for path in paths}:
+        try:
+            os.rmdir(batch_dir)
+        except OSError:
+            pass  # not empty or already gone
+
+async def ingest_pdfs(files: list[UploadFile], access_tags: list[str] = None, user: dict = {}, streaming: bool = None):
+    # stream every upload to disk so the extraction workers can open it by path
+    saved_files = await save_uploads(files)
+
+    try:
+        # results stores the status of each file processed
+        # extraction, embedding and ChromaDB writes run as separate pipeline stages
+        results = await IngestionPipeline().run(saved_files, access_tags, user, streaming=streaming)
+    finally:
+        cleanup_uploads([path for _, path, _ in saved_files])
 
-async def ingest_pdfs(files: list[str], access_tags: list[str] = None, user: dict = {} ):
-    # results stores the status of each file processed
-    results = []
-    
-    # batch size for ChromaDB
-    # ChromaDB requires batching for efficient ingestion
-    BATCH_SIZE = 5000  # ChromaDB safe batch size
+    return {
+        "message": "Upload complete.",
+        "results": results
+    }
 
+# re-ingests a new version of a stored document (looked up by document_id or title)
+# only new or changed chunks are embedded, removed chunks are deleted
+async def update_pdf(file: UploadFile, document_id: str = None, title: str = None,
+                     access_tags: list[str] = None, user: dict = {}):
+    [(filename, path, file_hash)] = await save_uploads([file])
 
-    for file in files:
+    try:
+        result = await IngestionPipeline().update(
+            filename, path, document_id, title, access_tags, user, file_hash=file_hash
+        )
+    finally:
+        cleanup_uploads([path])
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                tmp.write(await file.read())
-                tmp_path = tmp.name
-
-        logger.info(f"Processing file: {file.filename}")
-        try:            
-            if not access_tags: 
-                access_tag = await auto_tag_pdf(tmp_path)
-
-            elif access_tag:
-                access_tag = ",".join(access_tags)    
-
-            # Extract text from PDF using LangChain PyPDFLoader
-            loader = PyPDFLoader(tmp_path)
-            pages = loader.load()
-            content = "\n".join([page.page_content for page in pages])
-            logger.info(f"Extracted text from {file.filename}, length: {len(content)}")
-
-            if not content.strip():
-                logger.warning(f"{file.filename} is empty after extraction.")
-                results.append({"filename": file.filename, "status": "failed", "reason": "Empty PDF"})
-                continue    
-
-            # text splitting
-            chunks = splitter.create_documents([content])
-            chunk_texts = [chunk.page_content for chunk in chunks]
-            logger.info(f"Split {file.filename} into {len(chunk_texts)} chunks.")
-
-            if not chunk_texts:
-                logger.warning(f"No chunks created for {file.filename}.")
-                results.append({"filename": file.filename, "status": "failed", "reason": "No chunks"})
-                continue
-
-            for i, chunk in enumerate(chunk_texts[:5]):
-                logger.info(f"Sample chunk {i}: {chunk[:100]}")
-
-            chunk_embeddings = embed_doc(chunk_texts)
-            logger.info(f"Generated embeddings for {file.filename}.")
-
-            if len(chunk_texts) != len(chunk_embeddings):
-                logger.error(f"Embedding mismatch for {file.filename}.")
-                results.append({"filename": file.filename, "status": "failed", "reason": "Embedding mismatch"})
-                continue
-
-            document_id = str(uuid.uuid4())
-            metadatas = [{
-                "title": file.filename,
-                "chunk_index": i,
-                "access_tags": access_tag,
-                "created_by": user["username"],
-                "document_id": document_id
-            } for i in range(len(chunk_texts))]
-            ids = [f"{document_id}_{i}" for i in range(len(chunk_texts))]
-
-            # Store in ChromaDB in batches
-            for chunk_batch, embed_batch, meta_batch, id_batch in zip(
-                batch_iterable(chunk_texts, BATCH_SIZE),
-                batch_iterable(chunk_embeddings, BATCH_SIZE),
-                batch_iterable(metadatas, BATCH_SIZE),
-                batch_iterable(ids, BATCH_SIZE)
-            ):
-                logger.debug(f"Sample metadata: {meta_batch[0]}")
-                logger.debug(f"access_tags type: {type(meta_batch[0]['access_tags'])}")
-
-                logger.info(f"Adding batch of {len(chunk_batch)} chunks to ChromaDB for {file.filename}")
-                chroma_collection.add(
-                    documents=chunk_batch,
-                    embeddings=embed_batch,
-                    metadatas=meta_batch,
-                    ids=id_batch
-                )
+    return {
+        "message": "Update complete.",
+        "results": [result]
+    }
+
+# deletes the stored documents matching every given filter (document_id, title, uploader, access tag)
+# raises 400 when no filter is given, 404 when nothing matched
+async def delete_pdfs(document_id: str = None, title: str = None, created_by: str = None, access_tag: str = None):
+    if not any((document_id, title, created_by, access_tag)):
+        raise HTTPException(status_code=400, detail="Give a document_id, title, created_by or access_tag.")
 
-            results.append({
-                "filename": file.filename,
-                "status": "success",
-                "document_id": document_id,
-                "chunks_uploaded": len(chunk_texts)
-            })
-            logger.info(f"Successfully processed {file.filename}")
-
-        except Exception as e:
-            logger.exception(f"Failed to process {file.filename}: {e}")
-            results.append({
-                "filename": file.filename,
-                "status": "failed",
-                "reason": str(e)
-            })
+    result = await IngestionPipeline().delete(document_id, title, created_by, access_tag)
+    if not result["chunks_deleted"]:
+        raise HTTPException(status_code=404, detail="No matching documents.")
 
     return {
-        "message": "Upload complete.",
-        "results": results
-    }
\ No newline at end of file
+        "message": "Delete complete.",
+        **result
+    }
@@ -0,0 +1,245 @@
+# app/document_store.py
+import hashlib
+import logging
+from typing import Iterator
+from app.access_tags import TAG_KEY_PREFIX, tag_key, split_access_tags, set_access_tags, access_filter
+from app.vector_store import vector_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Document-level operations on the vector store (app/vector_store_interface.py).
+# Every chunk carries its document's metadata, so a "document" is the set of chunks sharing a document_id.
+# Chunk metadata used here:
+#   content_hash -> sha256 of the uploaded file bytes (same for every chunk of a document)
+#   chunk_hash   -> sha256 of the chunk text
+#   chunk_count  -> number of chunks of the document; streamed documents only learn it after their last
+#                   write, so their chunks carry 0 and chunk 0 gets the count when the document is complete
+#   access_tags  -> comma-joined access tags, for display
+#   tag_<name>   -> True for each access tag, so vector queries can filter on tags natively
+
+# page size used when reading chunk ids and metadata
+PAGE_SIZE = 1000
+
+
+# sha256 of a chunk text
+def hash_chunk(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# --- FUNCTION: query_authorized_chunks ---
+
+# nearest chunks readable with the user's access tags; the RBAC filter is part of the vector query,
+# so every returned neighbour is authorized and n_results is not spent on chunks the user cannot see
+# returns the ChromaDB query result (one query), empty when the user has no tags
+def query_authorized_chunks(query_embedding: list[float], user_tags: list[str], n_results: int = 5,
+                            include: list[str] = None, collection=None) -> dict:
+    collection = collection if collection is not None else vector_store
+    include = ["metadatas", "documents", "distances"] if include is None else include
+    where = access_filter(user_tags)
+    if where is None:
+        return {"ids": [[]], **{key: [[]] for key in include}}
+    return collection.query(query_embeddings=[query_embedding], n_results=n_results, where=where, include=include)
+
+
+# --- FUNCTION: iter_chunk_pages ---
+
+# yields pages of {"ids": [...], "metadatas": [...], ...} for the chunks matching a where filter
+# only one page is held in memory at a time
+# include defaults to metadatas; pass [] to fetch ids only
+def iter_chunk_pages(where: dict, include: list[str] = None, page_size: int = PAGE_SIZE,
+                     collection=None) -> Iterator[dict]:
+    collection = collection if collection is not None else vector_store
+    include = ["metadatas"] if include is None else include
+    offset = 0
+    while True:
+        page = collection.get(where=where, include=include, limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+# --- FUNCTION: count_document_chunks ---
+
+# number of stored chunks of a document (ids only are read)
+def count_document_chunks(document_id: str, collection=None) -> int:
+    return sum(len(page["ids"]) for page in iter_chunk_pages({"document_id": document_id}, include=[],
+                                                             collection=collection))
+
+
+# --- FUNCTION: is_document_complete ---
+
+# True when every chunk of the document is stored: chunk 0 carries the chunk_count and that many chunks exist
+# an ingestion interrupted between two write batches leaves an incomplete document
+# documents stored before chunk_count existed cannot be checked and count as complete
+def is_document_complete(document_id: str, collection=None) -> bool:
+    collection = collection if collection is not None else vector_store
+    first = collection.get(ids=[f"{document_id}_0"], include=["metadatas"])
+    if not first["ids"]:
+        return False
+    expected = first["metadatas"][0].get("chunk_count")
+    if expected is None:
+        return True
+    return expected > 0 and count_document_chunks(document_id, collection=collection) == expected
+
+
+# --- FUNCTION: find_document_by_hash ---
+
+# returns the metadata of the first chunk of a complete document with this file hash, or None
+# incomplete documents with the hash are ignored (see delete_incomplete_documents)
+def find_document_by_hash(content_hash: str, collection=None) -> dict:
+    collection = collection if collection is not None else vector_store
+    result = collection.get(where={"$and": [{"content_hash": content_hash}, {"chunk_index": 0}]},
+                            include=["metadatas"])
+    for meta in result["metadatas"]:
+        if is_document_complete(meta["document_id"], collection=collection):
+            return meta
+    return None
+
+
+# --- FUNCTION: delete_incomplete_documents ---
+
+# deletes the chunks with this file hash that do not belong to keep_document_id (every chunk when it is None)
+# called once no complete document, or only the kept one, has the hash: the other chunks are left over
+# from an interrupted ingestion and the file is ingested again
+# returns the number of chunks deleted
+def delete_incomplete_documents(content_hash: str, keep_document_id: str = None, page_size: int = PAGE_SIZE,
+                                collection=None) -> int:
+    collection = collection if collection is not None else vector_store
+    where = {"content_hash": content_hash}
+    if keep_document_id is not None:
+        where = {"$and": [where, {"document_id": {"$ne": keep_document_id}}]}
+    deleted = 0
+    while True:
+        # deleted chunks leave the result set, so every page is read from offset 0
+        page = collection.get(where=where, include=[], limit=page_size)
+        if not page["ids"]:
+            break
+        collection.delete(ids=page["ids"])
+        deleted += len(page["ids"])
+    if deleted:
+        logger.info(f"Deleted {deleted} chunks of incomplete documents with content hash {content_hash}")
+    return deleted
+
+
+# --- FUNCTION: find_document ---
+
+# returns the metadata of one stored chunk of the document with this id or title, or None
+# when several documents share a title, any one of them is returned
+def find_document(document_id: str = None, title: str = None, collection=None) -> dict:
+    collection = collection if collection is not None else vector_store
+    if document_id:
+        where = {"document_id": document_id}
+    elif title:
+        where = {"title": title}
+    else:
+        raise ValueError("document_id or title is required")
+    result = collection.get(where=where, include=["metadatas"], limit=1)
+    if not result["ids"]:
+        return None
+    return result["metadatas"][0]
+
+
+# --- FUNCTION: load_chunk_hashes ---
+
+# returns {chunk_index: (chunk_id, chunk_hash, access_tags)} for every stored chunk of a document
+# chunks stored before chunk_hash existed are hashed from their text
+def load_chunk_hashes(document_id: str, collection=None) -> dict:
+    chunks = {}
+    for page in iter_chunk_pages({"document_id": document_id}, include=["metadatas", "documents"],
+                                 collection=collection):
+        for chunk_id, meta, text in zip(page["ids"], page["metadatas"], page["documents"]):
+            chunks[meta["chunk_index"]] = (chunk_id, meta.get("chunk_hash") or hash_chunk(text), meta.get("access_tags"))
+    return chunks
+
+
+# --- FUNCTION: update_document_access_tags ---
+
+# rewrites access_tags on every chunk of a document, without touching texts or embeddings
+# returns the number of chunks updated
+def update_document_access_tags(document_id: str, access_tag: str, collection=None) -> int:
+    collection = collection if collection is not None else vector_store
+    updated = 0
+    for page in iter_chunk_pages({"document_id": document_id}, collection=collection):
+        metadatas = [set_access_tags(dict(meta), access_tag, meta.get("access_tags")) for meta in page["metadatas"]]
+        collection.update(ids=page["ids"], metadatas=metadatas)
+        updated += len(page["ids"])
+    logger.info(f"Updated access_tags of {updated} chunks of document {document_id} to '{access_tag}'")
+    return updated
+
+
+# --- FUNCTION: delete_documents ---
+
+# deletes every chunk matching all of the given filters, page by page; at least one filter is required
+# every filter is part of the where filter, access_tag through the chunk's tag_<name> key
+# (chunks stored before those keys existed need backfill_access_tag_keys first)
+# only one page of ids and metadata is held in memory; deleted chunks leave the result set,
+# so every page is read from offset 0
+# returns {"chunks_deleted": n, "document_ids": [...]}
+def delete_documents(document_id: str = None, title: str = None, created_by: str = None,
+                     access_tag: str = None, page_size: int = PAGE_SIZE, collection=None) -> dict:
+    collection = collection if collection is not None else vector_store
+    conditions = [{key: value} for key, value in (
+        ("document_id", document_id), ("title", title), ("created_by", created_by)
+    ) if value]
+    if access_tag:
+        conditions.append({tag_key(access_tag): True})
+    if not conditions:
+        raise ValueError("At least one of document_id, title, created_by or access_tag is required")
+    where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    deleted = 0
+    document_ids = set()
+    while True:
+        page = collection.get(where=where, include=["metadatas"], limit=page_size)
+        if not page["ids"]:
+            break
+        document_ids.update(meta.get("document_id") for meta in page["metadatas"])
+        collection.delete(ids=page["ids"])
+        deleted += len(page["ids"])
+
+    document_ids.discard(None)
+    logger.info(f"Deleted {deleted} chunks of {len(document_ids)} documents "
+                f"(document_id={document_id}, title={title}, created_by={created_by}, access_tag={access_tag})")
+    return {"chunks_deleted": deleted, "document_ids": sorted(document_ids)}
+
+
+# --- FUNCTION: backfill_access_tag_keys ---
+
+# adds the tag_<name> keys to chunks stored before they existed (and fixes keys out of sync with access_tags)
+# chunks without them are invisible to query_authorized_chunks; returns the number of chunks updated
+def backfill_access_tag_keys(page_size: int = PAGE_SIZE, collection=None) -> int:
+    collection = collection if collection is not None else vector_store
+    updated = 0
+    for page in iter_chunk_pages(None, page_size=page_size, collection=collection):
+        ids, metadatas = [], []
+        for chunk_id, meta in zip(page["ids"], page["metadatas"]):
+            stored_keys = {key for key, value in meta.items() if key.startswith(TAG_KEY_PREFIX) and value}
+            tags = split_access_tags(meta.get("access_tags"))
+            if stored_keys != {tag_key(tag) for tag in tags}:
+                fixed = {key: None for key in stored_keys}
+                fixed.update({tag_key(tag): True for tag in tags})
+                ids.append(chunk_id)
+                metadatas.append(fixed)
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            updated += len(ids)
+    logger.info(f"Backfilled access tag keys of {updated} chunks")
+    return updated
+
+
+# --- FUNCTION: find_chunk_embeddings ---
+
+# looks up stored embeddings by chunk hash
+# returns {chunk_hash: embedding} for the hashes already present in the collection
+def find_chunk_embeddings(chunk_hashes: list[str], collection=None, batch_size: int = 500) -> dict:
+    collection = collection if collection is not None else vector_store
+    unique_hashes = list(dict.fromkeys(chunk_hashes))
+    found = {}
+    for i in range(0, len(unique_hashes), batch_size):
+        batch = unique_hashes[i:i + batch_size]
+        result = collection.get(where={"chunk_hash": {"$in": batch}}, include=["metadatas", "embeddings"])
+        for meta, embedding in zip(result["metadatas"], result["embeddings"]):
+            found[meta["chunk_hash"]] = embedding.tolist() if hasattr(embedding, "tolist") else embedding
+    return found
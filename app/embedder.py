@@ -1,12 +1,32 @@
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, ONNX_QUANTIZE,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES
+)
+from app.embedding_cache import EmbeddingCache
+from app.pdf_extractor import splitter
 
-# using a local HuggingFace model for embeddings
 # using the all-MiniLM-L6-v2 model for efficient embeddings
-embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# EMBEDDING_BACKEND selects eager PyTorch (local HuggingFace model) or the exported ONNX graph
+if EMBEDDING_BACKEND == "onnx":
+    from app.onnx_embedder import OnnxEmbeddings
+    embedding_model = OnnxEmbeddings()
+    # identifies the vectors: the backends produce slightly different ones, so they never share cache entries
+    embedding_model_id = f"{EMBEDDING_MODEL_NAME}-onnx{'-int8' if ONNX_QUANTIZE else ''}"
+elif EMBEDDING_BACKEND == "torch":
+    embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    embedding_model_id = EMBEDDING_MODEL_NAME
+else:
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {EMBEDDING_BACKEND}")
 
-# RecursiveCharacterTextSplitter splits text into smaller chunks based on character count,
-splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+# embeddings already computed are looked up on disk instead of being embedded again
+embedding_cache = (
+    EmbeddingCache(EMBEDDING_CACHE_DIR, embedding_model_id, EMBEDDING_CACHE_MAX_ENTRIES)
+    if EMBEDDING_CACHE_ENABLED else None
+)
+
+# the text splitter lives in app.pdf_extractor so ingestion worker processes
+# can split text without loading the embedding model; re-exported here
 
 
 #     Embed a list of chunk texts and return a list of embedding vectors.    
@@ -19,9 +39,13 @@ splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
 def embed_doc(chunk_texts: list[str]) -> list[list[float]]:
     if not chunk_texts or not isinstance(chunk_texts, list):
         raise ValueError("Input must be a list of strings (chunked texts).")
+    if embedding_cache is not None:
+        return embedding_cache.embed(chunk_texts, embedding_model.embed_documents)
     doc_embedding_vector = embedding_model.embed_documents(chunk_texts)
     return doc_embedding_vector
 
 # converts a query string into an embedding vector
 def embed_query_to_vector(query:str):
+    if embedding_cache is not None:
+        return embedding_cache.embed([query], lambda texts: [embedding_model.embed_query(texts[0])])[0]
     return embedding_model.embed_query(query)
\ No newline at end of file
@@ -0,0 +1,218 @@
+# app/embedding_cache.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# max host parameters per SQLite statement used for IN (...) lookups
+SQL_BATCH_SIZE = 500
+
+
+# sha256 of a text, the cache key together with the model name
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model_name, sha256(text)).
+
+    Vectors live in a fixed-size float32 memory-mapped file ({cache_dir}/{model}/vectors.f32,
+    one row per slot); a SQLite index maps each key to its slot and its last use.
+    When every slot is taken, the least recently used entries are evicted and their slots reused.
+    The cache is shared by the embedding service threads and by every process using the same
+    cache_dir (API workers, app.bulk_ingest): each operation runs in one SQLite write transaction
+    (BEGIN IMMEDIATE), so slot allocation, the vector writes and the index update of one process
+    never interleave with another's, and a slot read is not overwritten while it is being read.
+    The LRU clock is a counter in the meta table, shared by all processes.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+        os.makedirs(self.dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._vectors = None
+
+        # autocommit mode: transactions are opened explicitly by _transaction
+        self._db = sqlite3.connect(os.path.join(self.dir, "index.sqlite3"), timeout=60,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, slot INTEGER NOT NULL, last_used INTEGER NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        with self._transaction():
+            meta = dict(self._db.execute("SELECT name, value FROM meta"))
+            if "dim" in meta and (int(meta["max_entries"]) != max_entries or meta["model"] != model_name):
+                # the vector file layout changed: start over
+                logger.info(f"Embedding cache settings changed, clearing {self.dir}")
+                self._reset()
+
+    # holds the thread lock and a SQLite write transaction, which other processes wait for
+    # opens the vector file if another process created it since
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._vectors is None:
+                    dim = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+                    if dim is not None:
+                        self._open_vectors(int(dim[0]))
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # next value of the LRU clock shared by all processes (started from the newest entry on old caches)
+    # called inside a transaction
+    def _tick(self) -> int:
+        self._db.execute(
+            "INSERT OR IGNORE INTO meta (name, value) SELECT 'clock', COALESCE(MAX(last_used), 0) FROM entries"
+        )
+        self._db.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'clock'")
+        return int(self._db.execute("SELECT value FROM meta WHERE name = 'clock'").fetchone()[0])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_many(self, texts: list[str]) -> list:
+        """
+        Look up cached embeddings.
+
+        Args:
+            texts (list[str]): Texts to look up.
+        Returns:
+            list: One embedding (list[float]) per text, or None where the text is not cached.
+        """
+        hashes = [hash_text(text) for text in texts]
+        with self._transaction():
+            if self._vectors is None:
+                return [None] * len(texts)
+            slots = {}
+            unique_hashes = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique_hashes), SQL_BATCH_SIZE):
+                batch = unique_hashes[i:i + SQL_BATCH_SIZE]
+                rows = self._db.execute(
+                    f"SELECT text_hash, slot FROM entries WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                )
+                slots.update(rows)
+            if slots:
+                clock = self._tick()
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(clock, self.model_name, text_hash) for text_hash in slots]
+                )
+            return [self._vectors[slots[h]].tolist() if h in slots else None for h in hashes]
+
+    def put_many(self, texts: list[str], embeddings: list[list[float]]):
+        """
+        Store embeddings, evicting the least recently used entries when the cache is full.
+
+        Args:
+            texts (list[str]): Embedded texts.
+            embeddings (list[list[float]]): One embedding per text.
+        """
+        # one entry per text; past max_entries only the last texts are kept
+        entries = dict(zip((hash_text(text) for text in texts), embeddings))
+        entries = dict(list(entries.items())[-self.max_entries:])
+        if not entries:
+            return
+
+        with self._transaction():
+            if self._vectors is None:
+                self._create(len(next(iter(entries.values()))))
+
+            slots = {}
+            unique_hashes = list(entries)
+            for i in range(0, len(unique_hashes), SQL_BATCH_SIZE):
+                batch = unique_hashes[i:i + SQL_BATCH_SIZE]
+                slots.update(self._db.execute(
+                    f"SELECT text_hash, slot FROM entries WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                ))
+            new_hashes = [h for h in entries if h not in slots]
+            slots.update(zip(new_hashes, self._allocate_slots(len(new_hashes), exclude=set(slots))))
+
+            # vectors are written before the index points at them
+            for text_hash, embedding in entries.items():
+                self._vectors[slots[text_hash]] = embedding
+            self._vectors.flush()
+
+            clock = self._tick()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (model, text_hash, slot, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model_name, text_hash, slots[text_hash], clock) for text_hash in entries]
+            )
+
+    # embeds texts through the cache: cached texts are looked up, the others are embedded with embed and stored
+    def embed(self, texts: list[str], embed: Callable[[list[str]], list[list[float]]]) -> list[list[float]]:
+        embeddings = self.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            # rounded to float32 like the stored copy, so a hit returns exactly what the miss returned
+            new_embeddings = np.asarray(embed(missing_texts), dtype=np.float32).tolist()
+            self.put_many(missing_texts, new_embeddings)
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+        return embeddings
+
+    # returns n free slots, evicting least recently used entries (never the ones in exclude) if needed
+    # called inside a transaction
+    def _allocate_slots(self, n: int, exclude: set) -> list[int]:
+        if n == 0:
+            return []
+        next_slot = self._db.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM entries").fetchone()[0]
+        free = list(range(next_slot, min(next_slot + n, self.max_entries)))
+        if len(free) < n:
+            victims = [
+                (text_hash, slot) for text_hash, slot in self._db.execute(
+                    "SELECT text_hash, slot FROM entries ORDER BY last_used LIMIT ?", (n - len(free) + len(exclude),)
+                ) if text_hash not in exclude
+            ][:n - len(free)]
+            self._db.executemany(
+                "DELETE FROM entries WHERE model = ? AND text_hash = ?",
+                [(self.model_name, text_hash) for text_hash, _ in victims]
+            )
+            free.extend(slot for _, slot in victims)
+            logger.info(f"Evicted {len(victims)} entries from the embedding cache.")
+        return free
+
+    def _open_vectors(self, dim: int):
+        path = os.path.join(self.dir, "vectors.f32")
+        mode = "r+" if os.path.exists(path) else "w+"
+        self._vectors = np.memmap(path, dtype=np.float32, mode=mode, shape=(self.max_entries, dim))
+
+    # creates the vector file once the embedding size is known
+    def _create(self, dim: int):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+            [("model", self.model_name), ("dim", str(dim)), ("max_entries", str(self.max_entries))]
+        )
+        self._open_vectors(dim)
+
+    def _reset(self):
+        self._db.execute("DELETE FROM entries")
+        self._db.execute("DELETE FROM meta")
+        self._vectors = None
+        path = os.path.join(self.dir, "vectors.f32")
+        if os.path.exists(path):
+            os.remove(path)
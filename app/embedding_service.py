@@ -0,0 +1,130 @@
+# app/embedding_service.py
+import asyncio
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.config import EMBED_MAX_BATCH_SIZE, EMBED_MAX_WAIT_MS
+from app.embedder import embedding_model, embedding_cache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# request priorities: lower runs first
+QUERY_PRIORITY = 0
+BULK_PRIORITY = 1
+
+
+class EmbeddingService:
+    """
+    Dynamic micro-batching in front of the embedding model.
+
+    Concurrent requests are queued and collected for up to max_wait_ms, then embedded
+    as one batch on a dedicated model thread, so the event loop never blocks on a
+    forward pass. Query embeddings (/ask) have priority over bulk ingestion texts:
+    a query waits for at most the batch already running, never for a whole document.
+    Texts found in the embedding cache are answered without being queued.
+    """
+
+    def __init__(self, model=None, max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS, cache=None):
+        self.model = model if model is not None else embedding_model
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-service")
+        self._sequence = itertools.count()
+        self._queue = None
+        self._batcher = None
+        self._loop = None
+
+    async def embed_query(self, text: str) -> list[float]:
+        [vector] = await self._submit([text], QUERY_PRIORITY)
+        return vector
+
+    # ingestion uses the default bulk priority; texts embedded while answering a query
+    # should pass priority=QUERY_PRIORITY
+    async def embed_documents(self, texts: list[str], priority: int = BULK_PRIORITY) -> list[list[float]]:
+        if not texts or not isinstance(texts, list):
+            raise ValueError("Input must be a list of strings (chunked texts).")
+        return await self._submit(texts, priority)
+
+    # queues every text that is not cached as its own item so batches can mix requests
+    async def _submit(self, texts: list[str], priority: int) -> list[list[float]]:
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        embeddings = [None] * len(texts)
+        if self.cache is not None:
+            embeddings = await loop.run_in_executor(None, self.cache.get_many, texts)
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        futures = []
+        for i in missing:
+            future = loop.create_future()
+            # the sequence number keeps FIFO order within a priority
+            self._queue.put_nowait((priority, next(self._sequence), texts[i], future))
+            futures.append(future)
+        for i, embedding in zip(missing, await asyncio.gather(*futures)):
+            embeddings[i] = embedding
+        return embeddings
+
+    # (re)starts the batcher on the running event loop
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._batcher is None or self._batcher.done():
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._batcher = loop.create_task(self._run_batcher())
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            # collect whatever else arrives within the wait window
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # a cancelled caller no longer needs its vector
+            batch = [item for item in batch if not item[3].done()]
+            if not batch:
+                continue
+
+            texts = [text for _, _, text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._embed_batch, texts)
+            except Exception as e:
+                logger.exception(f"Embedding batch of {len(texts)} failed: {e}")
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            queries = sum(1 for priority, _, _, _ in batch if priority == QUERY_PRIORITY)
+            logger.debug(f"Embedded batch of {len(texts)} texts ({queries} queries).")
+            for (_, _, _, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    # runs on the model thread
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.model.embed_documents(texts)
+        if self.cache is not None:
+            vectors = np.asarray(vectors, dtype=np.float32).tolist()
+            self.cache.put_many(texts, vectors)
+        return vectors
+
+
+# shared service used by /ask and ingestion
+embedding_service = EmbeddingService(cache=embedding_cache)
@@ -0,0 +1,299 @@
+# app/ingestion_jobs.py
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from app.config import INGEST_JOBS_DIR, INGEST_JOB_CONCURRENCY, DELETE_UPLOADS_AFTER_INGESTION
+from app.doc_ingestor import cleanup_uploads
+from app.ingestion_pipeline import IngestionPipeline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory file locks (Windows): a single server process is assumed
+    fcntl = None
+
+# minimum seconds between two saves of a job's progress (status changes are always saved)
+SAVE_INTERVAL = 0.5
+# seconds between two scans of the jobs directory for unfinished jobs no process holds
+RECLAIM_INTERVAL = 30
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class IngestionJobManager:
+    """
+    Background ingestion jobs.
+
+    /upload stores the files on disk and submits a job, which is queued and run by a
+    bounded pool of workers (INGEST_JOB_CONCURRENCY jobs at a time).
+    Each job is persisted as {jobs_dir}/{job_id}.json, so jobs that were queued or running
+    when the server stopped are resumed on the next start. The result of every file is saved
+    as soon as the file is done, so a resumed job only ingests the files still pending;
+    a file that was partly written when the server stopped is deleted and ingested again.
+    Uploaded files are deleted once their job has finished (DELETE_UPLOADS_AFTER_INGESTION).
+
+    Several server processes (uvicorn workers) can share jobs_dir: a job is run by the
+    process holding the flock on {jobs_dir}/{job_id}.lock, taken on submit or when an
+    unfinished job is found unclaimed (on start, then every RECLAIM_INTERVAL seconds), so
+    a job is resumed once and by a single process. get() reads other processes' jobs from
+    disk, and only jobs queued or running in this process are kept in memory.
+    """
+
+    def __init__(self, jobs_dir: str = INGEST_JOBS_DIR, concurrency: int = INGEST_JOB_CONCURRENCY):
+        self.jobs_dir = jobs_dir
+        self.concurrency = concurrency
+        # jobs queued or running in this process, and their claim (open lock file)
+        self.jobs = {}
+        self._claims = {}
+        self._last_saved = {}
+        self._queue = None
+        self._workers = []
+        # job files are written by one thread, so saves of the same job land in order
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    # re-queues unfinished jobs no process holds and starts the workers
+    async def start(self):
+        if self._workers:
+            return
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._queue = asyncio.Queue()
+        await self._reclaim()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._reclaim_loop()))
+        logger.info(f"Started {self.concurrency} ingestion job workers.")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    # claims and queues the unfinished jobs of jobs_dir that no process holds
+    # (left by a stopped server, or by a worker process that died)
+    async def _reclaim(self):
+        loop = asyncio.get_running_loop()
+        for job in await loop.run_in_executor(self._writer, self._claim_unfinished):
+            logger.info(f"Resuming ingestion job {job['job_id']}")
+            job["status"] = "queued"
+            self.jobs[job["job_id"]] = job
+            self._queue.put_nowait(job["job_id"])
+
+    async def _reclaim_loop(self):
+        while True:
+            await asyncio.sleep(RECLAIM_INTERVAL)
+            try:
+                await self._reclaim()
+            except Exception as e:
+                logger.error(f"Could not scan for unfinished ingestion jobs: {e}")
+
+    # runs in the writer thread; returns the unfinished jobs claimed by this process
+    def _claim_unfinished(self) -> list[dict]:
+        claimed = []
+        for name in sorted(os.listdir(self.jobs_dir)):
+            job_id = name[:-len(".json")]
+            if not name.endswith(".json") or job_id in self.jobs:
+                continue
+            job = self._load(job_id)
+            if job is None or job["status"] not in ("queued", "running") or not self._claim(job_id):
+                continue
+            # reloaded under the claim: the previous holder may have finished it meanwhile
+            job = self._load(job_id)
+            if job is None or job["status"] not in ("queued", "running"):
+                self._release(job_id, finished=True)
+                continue
+            claimed.append(job)
+        return claimed
+
+    # takes the lock of a job without waiting; False when another process holds it
+    def _claim(self, job_id: str) -> bool:
+        if fcntl is None:
+            self._claims[job_id] = None
+            return True
+        lock = open(os.path.join(self.jobs_dir, f"{job_id}.lock"), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return False
+        self._claims[job_id] = lock
+        return True
+
+    # drops a job from memory and releases its lock
+    # the lock file of a finished job is removed: a process that locked it meanwhile reloads the
+    # job and finds it finished; an unfinished job keeps it, so its next holders all lock the same file
+    def _release(self, job_id: str, finished: bool):
+        self.jobs.pop(job_id, None)
+        self._last_saved.pop(job_id, None)
+        lock = self._claims.pop(job_id, None)
+        if lock is None:
+            return
+        if finished:
+            try:
+                os.remove(lock.name)
+            except FileNotFoundError:
+                pass
+        lock.close()
+
+    def _load(self, job_id: str) -> dict:
+        try:
+            with open(os.path.join(self.jobs_dir, f"{job_id}.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load ingestion job {job_id}: {e}")
+            return None
+
+    # creates and queues a job for files already stored on disk
+    # files is a list of (filename, path) or (filename, path, file_hash) tuples
+    async def submit(self, files: list[tuple], access_tags: list[str] = None,
+                     user: dict = {}, streaming: bool = None) -> dict:
+        await self.start()
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_by": user["username"],
+            "created_at": _now(),
+            "updated_at": _now(),
+            "access_tags": access_tags,
+            "streaming": streaming,
+            "error": None,
+            "files": [{
+                "filename": f[0],
+                "path": f[1],
+                "file_hash": f[2] if len(f) > 2 else None,
+                "status": "queued",
+                "parsed": False,
+                "tagged": False,
+                "pages": None,
+                "access_tags": None,
+                "chunks_total": None,
+                "chunks_embedded": 0,
+                "chunks_written": 0,
+                "result": None
+            } for f in files]
+        }
+        self._claim(job_id)
+        self.jobs[job_id] = job
+        await asyncio.wrap_future(self._save(job, force=True))
+        await self._queue.put(job_id)
+        logger.info(f"Queued ingestion job {job_id} with {len(files)} files.")
+        return job
+
+    # job of this process, or as last saved by the process running it; None if unknown
+    async def get(self, job_id: str) -> dict:
+        if job_id in self.jobs:
+            return self.jobs[job_id]
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self._load, job_id)
+
+    # job as returned by the API: server-side file paths are not exposed
+    @staticmethod
+    def public_view(job: dict) -> dict:
+        return {
+            **job,
+            "files": [{key: value for key, value in f.items() if key not in ("path", "file_hash")} for f in job["files"]]
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs[job_id]
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.exception(f"Ingestion job {job_id} failed: {e}")
+                job["status"] = "failed"
+                job["error"] = str(e)
+                await asyncio.wrap_future(self._save(job, force=True))
+            finally:
+                finished = job["status"] in ("completed", "failed")
+                if DELETE_UPLOADS_AFTER_INGESTION and finished:
+                    cleanup_uploads([f["path"] for f in job["files"]])
+                self._release(job_id, finished)
+                self._queue.task_done()
+
+    async def _run(self, job: dict):
+        job["status"] = "running"
+        self._save(job, force=True)
+
+        # files finished before a restart keep their result; the others start over
+        pending = [f for f in job["files"] if f["result"] is None]
+        for f in pending:
+            f.update(status="queued", parsed=False, tagged=False, chunks_embedded=0, chunks_written=0)
+
+        # progress callback of the ingestion pipeline; index is the file's position in pending,
+        # so files uploaded under the same name keep their own status
+        def on_progress(filename: str, event: str, index: int = None, **data):
+            if index is None:
+                return
+            f = pending[index]
+            if event == "parsed":
+                f["parsed"] = True
+                f["pages"] = data.get("pages")
+                f["chunks_total"] = data.get("chunks")
+            elif event == "tagged":
+                f["tagged"] = True
+                f["access_tags"] = data.get("access_tags")
+            elif event == "embedded":
+                f["chunks_embedded"] += data.get("count", 0)
+            elif event == "written":
+                f["chunks_written"] += data.get("count", 0)
+            elif event == "finished":
+                # saved right away, so a restart does not ingest the file again
+                f["result"] = data["result"]
+                f["status"] = data["result"]["status"]
+                self._save(job, force=True)
+                return
+            f["status"] = event
+            self._save(job)
+
+        pipeline = IngestionPipeline(progress=on_progress)
+        user = {"username": job["created_by"]}
+        results = await pipeline.run(
+            [(f["filename"], f["path"], f.get("file_hash")) for f in pending], job["access_tags"], user, streaming=job["streaming"]
+        )
+
+        for f, result in zip(pending, results):
+            f["result"] = result
+            f["status"] = result["status"]
+
+        job["status"] = "completed"
+        await asyncio.wrap_future(self._save(job, force=True))
+        logger.info(f"Ingestion job {job['job_id']} completed.")
+
+    # writes the job file atomically in the writer thread; progress-only saves are throttled
+    # to one per SAVE_INTERVAL
+    # the job is serialized here, on the event loop, so the write sees a consistent snapshot
+    # returns the write's future (None when throttled)
+    def _save(self, job: dict, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_saved.get(job["job_id"], 0) < SAVE_INTERVAL:
+            return None
+        self._last_saved[job["job_id"]] = now
+        job["updated_at"] = _now()
+        return self._writer.submit(self._write, job["job_id"], json.dumps(job))
+
+    def _write(self, job_id: str, data: str):
+        path = os.path.join(self.jobs_dir, f"{job_id}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+# shared job manager used by the API
+job_manager = IngestionJobManager()
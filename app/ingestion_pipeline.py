@@ -0,0 +1,800 @@
+# app/ingestion_pipeline.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory file locks (Windows): ingestion leases only cover the current process
+    fcntl = None
+
+from app.auto_tagging import auto_tag_pdf, needs_chunk_embeddings, tag_chunks
+from app.batch_sizer import AdaptiveBatchSizer
+from app.config import (
+    INGEST_PROCESS_WORKERS, INGEST_MAX_FILES_IN_FLIGHT, CHROMA_BATCH_SIZE,
+    CHROMA_INITIAL_BATCH_SIZE, CHROMA_MIN_BATCH_SIZE, CHROMA_WRITE_TARGET_SECONDS, CHROMA_WRITE_QUEUE_SIZE,
+    STREAMING_MIN_FILE_BYTES, STREAM_WINDOW_SIZE, DEDUP_CHUNKS, TAG_MODE, INGEST_LEASE_DIR
+)
+from app.document_store import (
+    hash_chunk, find_document, find_document_by_hash, delete_incomplete_documents, load_chunk_hashes,
+    update_document_access_tags, find_chunk_embeddings, delete_documents, set_access_tags
+)
+from app.embedding_service import embedding_service
+from app.pdf_extractor import hash_file, extract_and_split, open_pdf_stream, iter_chunks, iter_windows
+from app.vector_store import vector_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def batch_iterable(iterable, batch_size):
+    for i in range(0, len(iterable), batch_size):
+        yield iterable[i:i + batch_size]
+
+
+# --- Shared workers ---
+
+# PDF extraction and splitting are CPU bound, so they run in a process pool (one process per core).
+# "spawn" keeps the workers free of the embedding model and the ChromaDB client loaded in this process.
+# The pool is created lazily so importing this module does not start any process.
+_process_pool = None
+
+# ChromaDB writes go through a single writer thread shared by every ingestion request.
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-write")
+
+# write batch size, tuned on the observed ChromaDB write latency and shared by every ingestion request
+write_batch_sizer = AdaptiveBatchSizer(
+    CHROMA_INITIAL_BATCH_SIZE, CHROMA_MIN_BATCH_SIZE, CHROMA_BATCH_SIZE, CHROMA_WRITE_TARGET_SECONDS
+)
+
+# --- Ingestion leases ---
+# A file is ingested under a lease on its hash: the same file ingested meanwhile (another upload job,
+# another API worker, app.bulk_ingest) is reported as a duplicate of it, instead of having its partly
+# written chunks taken for an interrupted ingestion and deleted.
+# Within the process the lease is an entry of _ingesting_hashes; across processes it is an flock on
+# INGEST_LEASE_DIR/<hash>.lock holding the document_id. The lock dies with its process, so the lease
+# of a crashed ingestion expires at once and the file is cleaned up and ingested again.
+
+# file hash -> (document_id, open lease file) of the files being ingested by this process
+_ingesting_hashes = {}
+
+
+# takes the cross-process lease of a file hash
+# returns (lease file, None), or (None, document_id of the holder) when another process holds it
+# the holder removes the file on release: a lock taken on a file removed meanwhile is retried
+def acquire_ingestion_lease(file_hash: str, document_id: str, lease_dir: str = INGEST_LEASE_DIR) -> tuple:
+    if fcntl is None:
+        return None, None
+    os.makedirs(lease_dir, exist_ok=True)
+    path = os.path.join(lease_dir, f"{file_hash}.lock")
+    while True:
+        lease = open(path, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lease.seek(0)
+            holder = lease.read().strip() or None
+            lease.close()
+            return None, holder
+        try:
+            if os.stat(path).st_ino == os.fstat(lease.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        lease.close()
+    lease.seek(0)
+    lease.truncate()
+    lease.write(document_id)
+    lease.flush()
+    return lease, None
+
+
+# releases a lease taken by acquire_ingestion_lease
+def release_ingestion_lease(lease, lease_dir: str = INGEST_LEASE_DIR):
+    if lease is None:
+        return
+    try:
+        os.remove(lease.name)
+    except FileNotFoundError:
+        pass
+    lease.close()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=INGEST_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+class IngestionPipeline:
+    """
+    Staged ingestion engine for a batch of PDF files.
+
+    Stages:
+        1. parse + split   -> process pool, one task per file; each PDF is decoded once
+        2. tagging         -> event loop, on the parsed head (auto_tag_pdf awaits the LLM fallback)
+        3. embed           -> shared embedding service, at bulk priority so /ask queries go first
+        4. write           -> single ChromaDB writer
+    Within a file, chunks are embedded and written in batches through a bounded queue, so
+    batch N is written while batch N+1 is embedded; the batch size follows the observed
+    write latency (see batch_sizer.AdaptiveBatchSizer).
+    When no keyword matches and a tag classifier is trained, tagging moves after the embed
+    stage and classifies the document from its chunk embeddings, before any LLM call;
+    such files (and auto-tagged files in tag_mode "chunk") are embedded completely before
+    their first batch is written.
+    With tag_mode "chunk", auto-tagged documents also get a tag per chunk from the same
+    embeddings (see auto_tagging.tag_chunks), so mixed-content documents are not tagged as a whole.
+    Every file moves through the stages on its own, so file B is being extracted
+    while file A is embedded and file C is written.
+
+    Large files use the streaming mode instead: pages are read, split, embedded and
+    written window by window, so peak memory does not grow with the document size.
+
+    Ingestion is content-addressed: a file whose sha256 is already stored is not parsed
+    or embedded again (status "duplicate"), and chunks whose text is already stored
+    reuse their stored embedding. Only complete documents count: every chunk carries the
+    document's chunk_count (streamed documents set it on chunk 0 after their last write),
+    so the chunks left by an interrupted ingestion are deleted and the file is ingested again.
+    A file is ingested under a lease on its hash, held across processes: while the lease is
+    held elsewhere the file is reported as a duplicate, and the chunks of an incomplete
+    document are only deleted once its ingesting process has released the lease or died.
+
+    Progress is reported through the optional progress callback, called on the event loop
+    as progress(filename, event, index=i, **data), where i is the file's position in the
+    files passed to run() (filenames need not be unique), with event one of:
+        "parsed"   (pages, chunks)  "tagged" (access_tags)
+        "embedded" (count)          "written" (count)
+        "finished" (result: the file's entry of the returned list, reported as soon as it is known)
+    """
+
+    def __init__(self, collection=None, batch_size: int = CHROMA_BATCH_SIZE,
+                 max_files_in_flight: int = INGEST_MAX_FILES_IN_FLIGHT,
+                 window_size: int = STREAM_WINDOW_SIZE, progress=None, tag_mode: str = TAG_MODE,
+                 batch_sizer: AdaptiveBatchSizer = None, write_queue_size: int = CHROMA_WRITE_QUEUE_SIZE):
+        self.collection = collection if collection is not None else vector_store
+        self.batch_size = batch_size
+        self.batch_sizer = batch_sizer or write_batch_sizer
+        self.write_queue_size = write_queue_size
+        self.max_files_in_flight = max_files_in_flight or 2 * (os.cpu_count() or 1)
+        self.window_size = window_size
+        self.progress = progress
+        if tag_mode not in ("document", "chunk"):
+            raise ValueError(f"Unknown tag_mode: {tag_mode}")
+        self.tag_mode = tag_mode
+
+    async def run(self, files: list[tuple], access_tags: list[str] = None, user: dict = {},
+                  streaming: bool = None) -> list[dict]:
+        """
+        Ingest a batch of PDFs.
+
+        Args:
+            files (list[tuple]): (filename, path on disk) pairs, or (filename, path, file_hash)
+                when the sha256 was already computed while the upload streamed to disk.
+            access_tags (list[str]): Manual access tags; auto-tagging is used when empty.
+            user (dict): Uploading user, must contain 'username'.
+            streaming (bool): Force streaming mode on or off; by default only files
+                larger than STREAMING_MIN_FILE_BYTES are streamed.
+        Returns:
+            list[dict]: One result per file, in input order.
+        """
+        loop = asyncio.get_running_loop()
+        embed_queue = asyncio.Queue()
+        write_queue = asyncio.Queue(maxsize=self.write_queue_size)
+        in_flight = asyncio.Semaphore(self.max_files_in_flight)
+
+        # hash every file up front (unless already hashed); identical files in the same batch are ingested once
+        known_hashes = [f[2] if len(f) > 2 else None for f in files]
+        computed_hashes = iter(await asyncio.gather(*[
+            loop.run_in_executor(None, self._hash_file, f[1])
+            for f, file_hash in zip(files, known_hashes) if not file_hash
+        ]))
+        file_hashes = [file_hash or next(computed_hashes) for file_hash in known_hashes]
+        first_index = {}
+        for i, file_hash in enumerate(file_hashes):
+            if file_hash is not None:
+                first_index.setdefault(file_hash, i)
+        unique = [i for i, file_hash in enumerate(file_hashes) if first_index.get(file_hash, i) == i]
+
+        copies = {}
+        for i, file_hash in enumerate(file_hashes):
+            if first_index.get(file_hash, i) != i:
+                copies.setdefault(first_index[file_hash], []).append(i)
+
+        # every result is reported ("finished") as soon as the file is done, with its copies in the batch
+        results = {}
+        async def finish(i: int, processing) -> None:
+            results[i] = await processing
+            self._report(i, files[i][0], "finished", result=results[i])
+            for j in copies.get(i, []):
+                results[j] = self._batch_duplicate_result(files[j][0], results[i])
+                self._report(j, files[j][0], "finished", result=results[j])
+
+        embed_worker = asyncio.create_task(self._embed_worker(embed_queue, write_queue))
+        write_worker = asyncio.create_task(self._write_worker(write_queue))
+        try:
+            await asyncio.gather(*[
+                finish(i, self._process_file_streaming(i, files[i][0], files[i][1], file_hashes[i], access_tags,
+                                                       user, write_queue, in_flight)
+                       if self._use_streaming(files[i][1], streaming)
+                       else self._process_file(i, files[i][0], files[i][1], file_hashes[i], access_tags, user,
+                                               embed_queue, write_queue, in_flight))
+                for i in unique
+            ])
+        finally:
+            embed_worker.cancel()
+            write_worker.cancel()
+
+        return [results[i] for i in range(len(files))]
+
+    async def update(self, filename: str, path: str, document_id: str = None, title: str = None,
+                     access_tags: list[str] = None, user: dict = {}, file_hash: str = None) -> dict:
+        """
+        Re-ingest a new version of a stored document in place.
+
+        The new version is split and its chunk hashes are diffed against the stored
+        {document_id}_{i} chunks: unchanged chunks only get their metadata refreshed,
+        changed chunks are upserted (reusing stored embeddings of moved text), and
+        chunks past the new end of the document are deleted.
+
+        Args:
+            filename (str): Name of the new file, stored as the title.
+            path (str): Path of the new file on disk.
+            document_id (str): Document to update; takes precedence over title.
+            title (str): Title of the document to update when no document_id is given.
+            access_tags (list[str]): New manual access tags; the stored tags are kept when empty.
+            user (dict): Uploading user, must contain 'username'.
+            file_hash (str): sha256 of the file, if already known.
+        Returns:
+            dict: Result with status "updated", "unchanged" or "failed".
+        """
+        loop = asyncio.get_running_loop()
+        logger.info(f"Updating document (id={document_id}, title={title}) from {filename}")
+        try:
+            existing = await loop.run_in_executor(
+                None, lambda: find_document(document_id, title, collection=self.collection)
+            )
+            if existing is None:
+                return {"filename": filename, "status": "failed", "reason": "Document not found"}
+
+            document_id = existing["document_id"]
+            access_tag = ",".join(access_tags) if access_tags else existing.get("access_tags")
+
+            file_hash = file_hash or await loop.run_in_executor(None, hash_file, path)
+            if file_hash == existing.get("content_hash"):
+                if access_tag != existing.get("access_tags"):
+                    await loop.run_in_executor(
+                        _write_executor, update_document_access_tags, document_id, access_tag, self.collection
+                    )
+                return {"filename": filename, "status": "unchanged", "document_id": document_id, "chunks_uploaded": 0}
+
+            extracted = await loop.run_in_executor(get_process_pool(), extract_and_split, path, file_hash)
+            chunk_texts = extracted["chunk_texts"]
+            if not chunk_texts:
+                return {"filename": filename, "status": "failed", "reason": "No chunks"}
+
+            stored = await loop.run_in_executor(None, load_chunk_hashes, document_id, self.collection)
+            metadatas = self._chunk_metadatas(filename, document_id, file_hash, access_tag, user, chunk_texts,
+                                              chunk_count=len(chunk_texts))
+            ids = [f"{document_id}_{i}" for i in range(len(chunk_texts))]
+
+            unchanged = [i for i, meta in enumerate(metadatas) if i in stored and stored[i][1] == meta["chunk_hash"]]
+            unchanged_set = set(unchanged)
+            changed = [i for i in range(len(chunk_texts)) if i not in unchanged_set]
+            removed = [chunk_id for index, (chunk_id, _, _) in stored.items() if index >= len(chunk_texts)]
+            # chunk ids that already exist keep their stored metadata keys: drop the tag keys of tags no longer set
+            for i, meta in enumerate(metadatas):
+                if i in stored:
+                    set_access_tags(meta, access_tag, stored[i][2])
+
+            # changed chunks whose text moved from another position reuse the stored embedding
+            changed_texts = [chunk_texts[i] for i in changed]
+            changed_metas = [metadatas[i] for i in changed]
+            embeddings = []
+            if changed:
+                embeddings = await self._embed_chunks(changed_texts, changed_metas, reuse=True)
+
+            job = {
+                "filename": filename,
+                "changed": {
+                    "chunk_texts": changed_texts,
+                    "embeddings": embeddings,
+                    "metadatas": changed_metas,
+                    "ids": [ids[i] for i in changed],
+                },
+                "unchanged": {
+                    "metadatas": [metadatas[i] for i in unchanged],
+                    "ids": [ids[i] for i in unchanged],
+                },
+                "removed_ids": removed,
+            }
+            await loop.run_in_executor(_write_executor, self._write_update, job)
+
+            logger.info(
+                f"Updated document {document_id}: {len(changed)} changed, {len(unchanged)} unchanged, {len(removed)} removed chunks."
+            )
+            return {
+                "filename": filename,
+                "status": "updated",
+                "document_id": document_id,
+                "chunks_uploaded": len(changed),
+                "chunks_unchanged": len(unchanged),
+                "chunks_deleted": len(removed)
+            }
+
+        except Exception as e:
+            logger.exception(f"Failed to update {filename}: {e}")
+            return {"filename": filename, "status": "failed", "reason": str(e)}
+
+    async def delete(self, document_id: str = None, title: str = None, created_by: str = None,
+                     access_tag: str = None) -> dict:
+        """
+        Delete the stored chunks matching every given filter.
+
+        Runs on the ChromaDB writer thread, so it never interleaves with an ingestion write.
+
+        Args:
+            document_id (str): Delete this document.
+            title (str): Delete the documents with this title.
+            created_by (str): Delete the documents uploaded by this user.
+            access_tag (str): Delete the documents carrying this access tag.
+        Returns:
+            dict: {"chunks_deleted": int, "document_ids": list[str]}
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _write_executor,
+            lambda: delete_documents(document_id, title, created_by, access_tag, collection=self.collection)
+        )
+
+    # forwards a progress event to the progress callback; a failing callback never fails ingestion
+    # index is the file's position in the files passed to run()
+    def _report(self, index: int, filename: str, event: str, **data):
+        if self.progress is None:
+            return
+        try:
+            self.progress(filename, event, index=index, **data)
+        except Exception as e:
+            logger.warning(f"Progress callback failed for {filename} ({event}): {e}")
+
+    # file hash, or None when the file cannot be read (the file then fails in its own stage)
+    def _hash_file(self, path: str) -> str:
+        try:
+            return hash_file(path)
+        except OSError:
+            return None
+
+    def _batch_duplicate_result(self, filename: str, first: dict) -> dict:
+        if first.get("document_id") is None:
+            return {**first, "filename": filename}
+        return {
+            "filename": filename,
+            "status": "duplicate",
+            "document_id": first["document_id"],
+            "chunks_uploaded": 0
+        }
+
+    # returns a "duplicate" result if a complete document with this hash is already stored, else None
+    # chunks of incomplete documents with the hash (an interrupted ingestion) are deleted
+    # with manual tags that differ from the stored ones, only the chunk metadata is updated
+    def _check_duplicate(self, filename: str, file_hash: str, access_tags: list[str]) -> dict:
+        existing = find_document_by_hash(file_hash, collection=self.collection)
+        document_id = existing["document_id"] if existing is not None else None
+        deleted = delete_incomplete_documents(file_hash, keep_document_id=document_id, collection=self.collection)
+        if existing is None:
+            if deleted:
+                logger.warning(f"{filename} was partially ingested before ({deleted} chunks), ingesting it again.")
+            return None
+
+        result = {
+            "filename": filename,
+            "status": "duplicate",
+            "document_id": document_id,
+            "chunks_uploaded": 0
+        }
+        new_tag = ",".join(access_tags) if access_tags else None
+        if new_tag and new_tag != existing.get("access_tags"):
+            update_document_access_tags(document_id, new_tag, collection=self.collection)
+            result["access_tags_updated"] = True
+
+        logger.info(f"{filename} is a duplicate of document {document_id}, skipping parsing and embedding.")
+        return result
+
+    # takes the ingestion lease of file_hash for document_id; returns (True, None), or (False, duplicate result)
+    # when this process or another one is already ingesting the same file
+    # runs on the event loop, so the check and the registration cannot interleave with another file's
+    def _register_ingestion(self, filename: str, file_hash: str, document_id: str) -> tuple[bool, dict]:
+        ingesting = _ingesting_hashes.get(file_hash)
+        if ingesting is None:
+            lease, holder = acquire_ingestion_lease(file_hash, document_id)
+            if lease is not None or holder is None and fcntl is None:
+                _ingesting_hashes[file_hash] = (document_id, lease)
+                return True, None
+            ingesting = (holder, None)
+        logger.info(f"{filename} is already being ingested as document {ingesting[0]}, skipping it.")
+        return False, {"filename": filename, "status": "duplicate", "document_id": ingesting[0], "chunks_uploaded": 0}
+
+    # releases the lease taken by _register_ingestion
+    @staticmethod
+    def _release_ingestion(file_hash: str):
+        _, lease = _ingesting_hashes.pop(file_hash, (None, None))
+        release_ingestion_lease(lease)
+
+    @staticmethod
+    def _set_access_tag(metadatas: list[dict], access_tag: str):
+        for meta in metadatas:
+            set_access_tags(meta, access_tag)
+
+    # tag_mode "chunk": per-chunk tags from the chunk embeddings, the document tag where the classifier is unsure
+    @staticmethod
+    def _set_chunk_tags(metadatas: list[dict], embeddings: list[list[float]], document_tag: str):
+        for meta, chunk_tag in zip(metadatas, tag_chunks(embeddings, document_tag)):
+            set_access_tags(meta, chunk_tag)
+
+    # chunk metadata for chunk_texts, numbered from start_index
+    # chunk_count is the number of chunks of the whole document, 0 while it is not known yet (streaming)
+    def _chunk_metadatas(self, filename, document_id, file_hash, access_tag, user, chunk_texts, start_index=0,
+                         chunk_count=0):
+        return [set_access_tags({
+            "title": filename,
+            "chunk_index": start_index + i,
+            "chunk_count": chunk_count,
+            "created_by": user["username"],
+            "document_id": document_id,
+            "content_hash": file_hash,
+            "chunk_hash": hash_chunk(text)
+        }, access_tag) for i, text in enumerate(chunk_texts)]
+
+    # embeds chunks through the embedding service, reusing stored embeddings of chunks with the same text
+    async def _embed_chunks(self, chunk_texts: list[str], metadatas: list[dict], reuse: bool = DEDUP_CHUNKS) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        known = {}
+        if reuse:
+            known = await loop.run_in_executor(
+                None, lambda: find_chunk_embeddings([meta["chunk_hash"] for meta in metadatas], collection=self.collection)
+            )
+
+        missing = [i for i, meta in enumerate(metadatas) if meta["chunk_hash"] not in known]
+        embeddings = [known.get(meta["chunk_hash"]) for meta in metadatas]
+        if missing:
+            new_embeddings = await embedding_service.embed_documents([chunk_texts[i] for i in missing])
+            if len(new_embeddings) != len(missing):
+                raise ValueError("Embedding mismatch")
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+
+        if known:
+            logger.info(f"Reused {len(chunk_texts) - len(missing)} stored embeddings, embedded {len(missing)} chunks.")
+        return embeddings
+
+    # tag of a document: manual tags, else auto-tagging; None when it has to wait for the chunk embeddings
+    async def _access_tag(self, document, access_tags: list[str]) -> str:
+        if access_tags:
+            return ",".join(access_tags)
+        if needs_chunk_embeddings(document):
+            return None
+        return await auto_tag_pdf(document)
+
+    def _use_streaming(self, path: str, streaming: bool = None) -> bool:
+        if streaming is not None:
+            return streaming
+        try:
+            return os.path.getsize(path) >= STREAMING_MIN_FILE_BYTES
+        except OSError:
+            return False
+
+    # runs one file through extraction and tagging, then hands it to the embed/write stages
+    # and waits until the writer has stored it
+    async def _process_file(self, index, filename, path, file_hash, access_tags, user, embed_queue, write_queue, in_flight) -> dict:
+        loop = asyncio.get_running_loop()
+
+        async with in_flight:
+            logger.info(f"Processing file: {filename}")
+            document_id = str(uuid.uuid4())
+            job = None
+            registered = False
+            try:
+                if file_hash:
+                    registered, duplicate = self._register_ingestion(filename, file_hash, document_id)
+                    if not registered:
+                        return duplicate
+                    duplicate = await loop.run_in_executor(None, self._check_duplicate, filename, file_hash, access_tags)
+                    if duplicate:
+                        return duplicate
+
+                extracted = await loop.run_in_executor(get_process_pool(), extract_and_split, path, file_hash)
+                file_hash = extracted["document"].file_hash
+                self._report(index, filename, "parsed", pages=extracted["document"].page_count,
+                             chunks=len(extracted["chunk_texts"]))
+
+                access_tag = await self._access_tag(extracted["document"], access_tags)
+                if access_tag is not None:
+                    self._report(index, filename, "tagged", access_tags=access_tag)
+
+                logger.info(f"Extracted text from {filename}, length: {extracted['content_length']}")
+
+                if extracted["is_empty"]:
+                    logger.warning(f"{filename} is empty after extraction.")
+                    return {"filename": filename, "status": "failed", "reason": "Empty PDF"}
+
+                chunk_texts = extracted["chunk_texts"]
+                logger.info(f"Split {filename} into {len(chunk_texts)} chunks.")
+
+                if not chunk_texts:
+                    logger.warning(f"No chunks created for {filename}.")
+                    return {"filename": filename, "status": "failed", "reason": "No chunks"}
+
+                for i, chunk in enumerate(chunk_texts[:5]):
+                    logger.info(f"Sample chunk {i}: {chunk[:100]}")
+
+                job = self._new_job(
+                    index, filename, chunk_texts,
+                    self._chunk_metadatas(filename, document_id, file_hash, access_tag, user, chunk_texts,
+                                          chunk_count=len(chunk_texts)),
+                    [f"{document_id}_{i}" for i in range(len(chunk_texts))]
+                )
+                job["document_id"] = document_id
+                # the metadata is final before embedding: the embed stage writes batch by batch
+                job["pipelined"] = access_tag is not None and not (not access_tags and self.tag_mode == "chunk")
+                await embed_queue.put(job)
+                await job["embedded"]
+
+                if not job["pipelined"]:
+                    if access_tag is None:
+                        access_tag = await auto_tag_pdf(extracted["document"], job["embeddings"])
+                        self._set_access_tag(job["metadatas"], access_tag)
+                        self._report(index, filename, "tagged", access_tags=access_tag)
+                    if not access_tags and self.tag_mode == "chunk":
+                        self._set_chunk_tags(job["metadatas"], job["embeddings"], access_tag)
+                    await self._queue_writes(job, write_queue)
+
+                await job["done"]
+
+                logger.info(f"Successfully processed {filename}")
+                return {
+                    "filename": filename,
+                    "status": "success",
+                    "document_id": document_id,
+                    "chunks_uploaded": len(chunk_texts)
+                }
+
+            except Exception as e:
+                logger.exception(f"Failed to process {filename}: {e}")
+                if job is not None and job["queued"]:
+                    await self._discard_writes([job["done"]], job["document_id"])
+                return {"filename": filename, "status": "failed", "reason": str(e)}
+            finally:
+                if registered:
+                    self._release_ingestion(file_hash)
+
+    # streaming mode: pages -> chunks -> fixed-size windows, each window is embedded and handed to the
+    # bounded write queue, so it is written while the next one is read and embedded; only the windows
+    # in the write queue are held in memory
+    # chunk_index keeps counting across windows, so ids and metadata match the non-streaming mode
+    async def _process_file_streaming(self, index, filename, path, file_hash, access_tags, user, write_queue, in_flight) -> dict:
+        loop = asyncio.get_running_loop()
+
+        async with in_flight:
+            logger.info(f"Processing file (streaming): {filename}")
+            document_id = str(uuid.uuid4())
+            chunks_queued = 0
+            writes = []
+            pages = None
+            registered = False
+            try:
+                if file_hash:
+                    registered, duplicate = self._register_ingestion(filename, file_hash, document_id)
+                    if not registered:
+                        return duplicate
+                    duplicate = await loop.run_in_executor(None, self._check_duplicate, filename, file_hash, access_tags)
+                    if duplicate:
+                        return duplicate
+
+                parsed, pages = await loop.run_in_executor(None, open_pdf_stream, path, file_hash)
+                self._report(index, filename, "parsed", pages=parsed.page_count, chunks=None)
+
+                access_tag = await self._access_tag(parsed, access_tags)
+                if access_tag is not None:
+                    self._report(index, filename, "tagged", access_tags=access_tag)
+
+                windows = iter_windows(iter_chunks(pages), self.window_size)
+                while True:
+                    # PDF reading and splitting happen inside next(), keep them off the event loop
+                    chunk_texts = await loop.run_in_executor(None, next, windows, None)
+                    if chunk_texts is None:
+                        break
+
+                    metadatas = self._chunk_metadatas(
+                        filename, document_id, parsed.file_hash, access_tag, user, chunk_texts, chunks_queued
+                    )
+                    embeddings = await self._embed_chunks(chunk_texts, metadatas)
+                    self._report(index, filename, "embedded", count=len(chunk_texts))
+
+                    # deferred tagging uses the first window, the only one embedded before the first write
+                    if access_tag is None:
+                        access_tag = await auto_tag_pdf(parsed, embeddings)
+                        self._report(index, filename, "tagged", access_tags=access_tag)
+                    self._set_access_tag(metadatas, access_tag)
+                    # per-chunk smoothing stays within the window
+                    if not access_tags and self.tag_mode == "chunk":
+                        self._set_chunk_tags(metadatas, embeddings, access_tag)
+
+                    job = self._new_job(
+                        index, filename, chunk_texts, metadatas,
+                        [f"{document_id}_{i}" for i in range(chunks_queued, chunks_queued + len(chunk_texts))],
+                        embeddings
+                    )
+                    writes.append(job["done"])
+                    await self._queue_writes(job, write_queue)
+                    chunks_queued += len(chunk_texts)
+                    # stop reading as soon as a window failed to be written
+                    failed = next((done for done in writes if done.done() and done.exception()), None)
+                    if failed is not None:
+                        raise failed.exception()
+
+                await asyncio.gather(*writes)
+
+                if not chunks_queued:
+                    logger.warning(f"No chunks created for {filename}.")
+                    return {"filename": filename, "status": "failed", "reason": "No chunks"}
+
+                # the document counts as stored (and as a duplicate for later uploads) only from here on
+                await loop.run_in_executor(_write_executor, self._write_chunk_count, document_id, chunks_queued)
+
+                logger.info(f"Successfully processed {filename} ({chunks_queued} chunks, streamed)")
+                return {
+                    "filename": filename,
+                    "status": "success",
+                    "document_id": document_id,
+                    "chunks_uploaded": chunks_queued
+                }
+
+            except Exception as e:
+                logger.exception(f"Failed to process {filename}: {e}")
+                if writes:
+                    await self._discard_writes(writes, document_id)
+                return {"filename": filename, "status": "failed", "reason": str(e)}
+            finally:
+                # a failed file stops reading early: release the PDF
+                if pages is not None:
+                    pages.close()
+                if registered:
+                    self._release_ingestion(file_hash)
+
+    # a write job: the chunks of a file (or of a streaming window) with their metadata and embeddings;
+    # "done" resolves when the writer has stored its last batch
+    @staticmethod
+    def _new_job(index, filename, chunk_texts, metadatas, ids, embeddings=None) -> dict:
+        loop = asyncio.get_running_loop()
+        return {
+            "index": index,
+            "filename": filename,
+            "chunk_texts": chunk_texts,
+            "metadatas": metadatas,
+            "ids": ids,
+            "embeddings": embeddings,
+            "pipelined": False,
+            "queued": 0,
+            "embedded": loop.create_future(),
+            "done": loop.create_future(),
+        }
+
+    # hands a job to the writer in batches sized by the batch sizer; with embed, each batch is
+    # embedded just before it is queued, so it is written while the next batch is embedded
+    # a full write queue pauses this coroutine (backpressure); stops early when a batch failed
+    async def _queue_writes(self, job: dict, write_queue: asyncio.Queue, embed: bool = False):
+        total = len(job["ids"])
+        if embed:
+            job["embeddings"] = [None] * total
+        start = 0
+        while start < total and not job["done"].done():
+            end = min(start + min(self.batch_sizer.size, self.batch_size), total)
+            if embed:
+                job["embeddings"][start:end] = await self._embed_chunks(
+                    job["chunk_texts"][start:end], job["metadatas"][start:end]
+                )
+                self._report(job["index"], job["filename"], "embedded", count=end - start)
+            await write_queue.put({"job": job, "start": start, "end": end, "last": end == total})
+            job["queued"] += end - start
+            start = end
+
+    # failure cleanup: batches still queued are skipped, then the chunks already written are deleted
+    # (the delete runs on the writer thread, after the batch being written)
+    async def _discard_writes(self, futures: list, document_id: str):
+        for future in futures:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                # mark the error retrieved, it was already reported
+                future.exception()
+        await asyncio.get_running_loop().run_in_executor(
+            _write_executor, lambda: self.collection.delete(where={"document_id": document_id})
+        )
+
+    # embedding stage: embeds one file at a time through the embedding service
+    # pipelined jobs are queued for writing batch by batch as they are embedded; for the others
+    # the file's task is woken up to finish tagging and hand the job to the writer
+    async def _embed_worker(self, embed_queue: asyncio.Queue, write_queue: asyncio.Queue):
+        while True:
+            job = await embed_queue.get()
+            try:
+                if job["pipelined"]:
+                    await self._queue_writes(job, write_queue, embed=True)
+                else:
+                    job["embeddings"] = await self._embed_chunks(job["chunk_texts"], job["metadatas"])
+                    self._report(job["index"], job["filename"], "embedded", count=len(job["embeddings"]))
+                logger.info(f"Generated embeddings for {job['filename']}.")
+                job["embedded"].set_result(len(job["embeddings"]))
+            except Exception as e:
+                if not job["embedded"].done():
+                    job["embedded"].set_exception(e)
+
+    # write stage: the only place that writes to ChromaDB, one batch at a time
+    # every write is timed to adapt the batch size
+    async def _write_worker(self, write_queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await write_queue.get()
+            job = batch["job"]
+            # an earlier batch of this job failed, or the job was discarded
+            if job["done"].done():
+                continue
+            try:
+                seconds = await loop.run_in_executor(_write_executor, self._write_batch, job, batch["start"], batch["end"])
+                self.batch_sizer.record(batch["end"] - batch["start"], seconds)
+                self._report(job["index"], job["filename"], "written", count=batch["end"] - batch["start"])
+                if batch["last"]:
+                    job["done"].set_result(len(job["ids"]))
+            except Exception as e:
+                if not job["done"].done():
+                    job["done"].set_exception(e)
+
+    # Store one batch of a job in ChromaDB; returns the duration of the write
+    def _write_batch(self, job: dict, start: int, end: int) -> float:
+        logger.info(f"Adding batch of {end - start} chunks to ChromaDB for {job['filename']}")
+        started = time.perf_counter()
+        self.collection.add(
+            documents=job["chunk_texts"][start:end],
+            embeddings=job["embeddings"][start:end],
+            metadatas=job["metadatas"][start:end],
+            ids=job["ids"][start:end]
+        )
+        return time.perf_counter() - started
+
+    # completes a streamed document: its chunk count is only known after the last window was written
+    def _write_chunk_count(self, document_id: str, chunk_count: int):
+        self.collection.update(ids=[f"{document_id}_0"], metadatas=[{"chunk_count": chunk_count}])
+
+    # applies a document update: upsert changed chunks, refresh metadata of unchanged ones, delete removed ones
+    def _write_update(self, job: dict):
+        changed = job["changed"]
+        for chunk_batch, embed_batch, meta_batch, id_batch in zip(
+            batch_iterable(changed["chunk_texts"], self.batch_size),
+            batch_iterable(changed["embeddings"], self.batch_size),
+            batch_iterable(changed["metadatas"], self.batch_size),
+            batch_iterable(changed["ids"], self.batch_size)
+        ):
+            logger.info(f"Upserting batch of {len(chunk_batch)} chunks to ChromaDB for {job['filename']}")
+            self.collection.upsert(
+                documents=chunk_batch,
+                embeddings=embed_batch,
+                metadatas=meta_batch,
+                ids=id_batch
+            )
+
+        unchanged = job["unchanged"]
+        for meta_batch, id_batch in zip(
+            batch_iterable(unchanged["metadatas"], self.batch_size),
+            batch_iterable(unchanged["ids"], self.batch_size)
+        ):
+            self.collection.update(ids=id_batch, metadatas=meta_batch)
+
+        for id_batch in batch_iterable(job["removed_ids"], self.batch_size):
+            self.collection.delete(ids=id_batch)
@@ -0,0 +1,186 @@
+# app/keyword_matcher.py
+import json
+from collections import deque
+from dataclasses import dataclass, field
+
+# Multi-keyword matcher used by rule-based auto-tagging.
+# All keywords of all tags are compiled once into an Aho-Corasick automaton, so a text is scanned
+# in a single pass whatever the number of keywords. Matching is case-insensitive, any run of
+# whitespace in the text matches a single space in a keyword, and a match must start and end
+# on a word boundary ("tax" matches "tax return" but not "syntax").
+
+
+@dataclass
+class KeywordMatch:
+    tag: str
+    keyword: str
+    start: int  # offsets into the original text
+    end: int
+
+
+@dataclass
+class TagScore:
+    tag: str
+    counts: dict = field(default_factory=dict)      # keyword -> number of occurrences
+    positions: list = field(default_factory=list)   # (start, end) of every occurrence
+
+    # number of different keywords found
+    @property
+    def distinct(self) -> int:
+        return len(self.counts)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+# lowercases a keyword and collapses its whitespace, the form stored in the automaton
+def normalize_keyword(keyword: str) -> str:
+    return " ".join(keyword.lower().split())
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+# loads {tag: [keywords]} from a JSON file
+def load_keyword_patterns(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        patterns = json.load(f)
+    if not isinstance(patterns, dict) or not all(isinstance(v, list) for v in patterns.values()):
+        raise ValueError(f"{path} must contain a JSON object of tag -> list of keywords")
+    return patterns
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over the keywords of every tag.
+
+    Args:
+        patterns (dict): tag -> list of keywords. A keyword listed under several tags counts for each of them.
+    """
+
+    def __init__(self, patterns: dict):
+        self.tags = list(patterns)
+        # keyword id -> (normalized keyword, tags listing it)
+        self.keywords = []
+        keyword_ids = {}
+        for tag, keywords in patterns.items():
+            for keyword in keywords:
+                normalized = normalize_keyword(keyword)
+                if not normalized:
+                    continue
+                if normalized not in keyword_ids:
+                    keyword_ids[normalized] = len(self.keywords)
+                    self.keywords.append((normalized, []))
+                tags = self.keywords[keyword_ids[normalized]][1]
+                if tag not in tags:
+                    tags.append(tag)
+        self.max_length = max((len(k) for k, _ in self.keywords), default=0)
+        self._build()
+
+    def _build(self):
+        # trie: goto[state] maps a character to the next state; out[state] lists the keyword ids ending there
+        self._goto = [{}]
+        self._out = [[]]
+        for keyword_id, (keyword, _) in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._out.append([])
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._out[state].append(keyword_id)
+
+        # failure links, breadth first (states at depth 1 fail to the root);
+        # a state also outputs the keywords of its failure state
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> list[KeywordMatch]:
+        """
+        Find every keyword occurrence in one pass over the text.
+
+        Args:
+            text (str): Text to scan.
+        Returns:
+            list[KeywordMatch]: Matches in order of their end offset, one per tag listing the keyword.
+        """
+        matches = []
+        if not self.keywords or not text:
+            return matches
+
+        # str.lower() keeps offsets unless a character lowercases to several characters
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+        goto, fail, out = self._goto, self._fail, self._out
+        # original offsets of the last scanned characters, to turn a match length into a start offset
+        offsets = deque(maxlen=self.max_length)
+        state = 0
+        in_space = False
+        for i, ch in enumerate(lowered):
+            if ch.isspace():
+                if in_space:
+                    continue
+                in_space = True
+                ch = " "
+            else:
+                in_space = False
+            offsets.append(i)
+
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+
+            end = i + 1
+            for keyword_id in out[state]:
+                keyword, tags = self.keywords[keyword_id]
+                start = offsets[-len(keyword)]
+                if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                    continue
+                if end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                    continue
+                for tag in tags:
+                    matches.append(KeywordMatch(tag, keyword, start, end))
+        return matches
+
+    def score(self, text: str) -> dict[str, TagScore]:
+        """
+        Score every tag in one pass over the text.
+
+        Args:
+            text (str): Text to scan.
+        Returns:
+            dict[str, TagScore]: Keyword counts and positions per tag (every tag is present).
+        """
+        scores = {tag: TagScore(tag) for tag in self.tags}
+        for match in self.find(text):
+            score = scores[match.tag]
+            score.counts[match.keyword] = score.counts.get(match.keyword, 0) + 1
+            score.positions.append((match.start, match.end))
+        return scores
+
+    def best_tag(self, text: str) -> str:
+        """
+        Return the tag with the most different keywords found, or None when nothing matches.
+        Ties go to the tag with more occurrences, then to the tag listed first.
+        """
+        scores = self.score(text)
+        best = max(self.tags, key=lambda tag: (scores[tag].distinct, scores[tag].total), default=None)
+        if best is None or not scores[best].distinct:
+            return None
+        return best
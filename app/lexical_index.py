@@ -0,0 +1,577 @@
+# app/lexical_index.py
+# BM25 inverted index over the chunk texts, kept next to the vector store (LEXICAL_INDEX_DIR).
+#
+# Exact terms (names, email addresses, policy numbers, "High/Critical") are often missed by embedding
+# similarity; the lexical ranking of this index is fused with the vector ranking at retrieval time
+# (rbac_retrieval.hybrid_search_authorized_chunks). Chunks are indexed as they are written to the
+# vector store (LexicalIndexedStore) and filtered by access tag inside the index, like vector queries.
+#
+# Postings are compact per-term arrays (uint32 chunk ordinals, uint16 term frequencies); deleted chunks
+# are tombstoned and dropped at the next compaction. Changes are appended to a journal and folded
+# into a snapshot every LEXICAL_SNAPSHOT_EVERY operations.
+#
+# Several processes may write the same index (the API server, app.bulk_ingest, the delete script):
+# every change and every snapshot holds an exclusive lock on LOCK_FILE and first replays what the
+# other processes appended to the journal; searches replay new journal entries before they score.
+# A snapshot replaces the journal with an empty file, which tells the other processes to reload.
+#
+#   python -m app.lexical_index --rebuild      # index every chunk already in the vector store
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory file locks (Windows): only one process may write the index
+    fcntl = None
+
+from app.access_tags import split_access_tags
+from app.config import BM25_K1, BM25_B, LEXICAL_SNAPSHOT_EVERY
+from app.vector_store_interface import VectorStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "index.npz"
+JOURNAL_FILE = "journal.jsonl"
+LOCK_FILE = "index.lock"
+
+# words joined by . _ @ / + - are kept whole (emails, policy numbers, "high/critical") and also split
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._@/+-][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[._@/+-]")
+# "it" is not a stop word here: it is the IT department
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have if in into is of on or so such than that the their then "
+    "there these they this to was were will with".split()
+)
+
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+
+# query terms found in nearly every chunk (idf below this, e.g. the domain of every email address)
+# carry no ranking signal and are skipped instead of scoring their long posting lists
+MIN_TERM_IDF = 0.01
+
+
+# lowercase terms of a text: whole compound tokens plus their parts, without stop words
+def tokenize(text: str) -> list[str]:
+    terms = []
+    for token in TOKEN_PATTERN.findall((text or "").lower()):
+        if token.isalnum():
+            if token not in STOPWORDS:
+                terms.append(token)
+            continue
+        terms.append(token)
+        terms.extend(part for part in TOKEN_SEPARATORS.split(token) if part not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """
+    Incremental BM25 index of chunk texts with per-access-tag filtering.
+
+    Args:
+        path (str): Directory of the snapshot and journal, created if missing; None keeps the index in memory.
+        k1 (float): BM25 term frequency saturation.
+        b (float): BM25 length normalization.
+        snapshot_every (int): Journal operations before they are folded into a new snapshot.
+    """
+
+    def __init__(self, path: str = None, k1: float = BM25_K1, b: float = BM25_B,
+                 snapshot_every: int = LEXICAL_SNAPSHOT_EVERY):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._journal = None
+        # journal file this process has read (inode), bytes of it applied, and operations in it
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self._reset()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._lock_file = open(os.path.join(path, LOCK_FILE), "a")
+            with self._file_lock():
+                self._load()
+
+    def _reset(self):
+        self._terms: dict[str, int] = {}
+        self._post_docs: list[np.ndarray] = []
+        self._post_tfs: list[np.ndarray] = []
+        # postings added since the arrays of a term were last merged: term id -> (ordinals, frequencies)
+        self._pending: dict[int, tuple[list, list]] = {}
+        self._doc_ids: list = []
+        self._ordinal: dict[str, int] = {}
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        self._tags: dict[str, np.ndarray] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._ordinal)
+
+    # --- persistence ---
+
+    # advisory lock on LOCK_FILE, shared between the processes using the index directory;
+    # held around single operations only, never while another one is taken
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        if self._lock_file is None or fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _journal_path(self) -> str:
+        return os.path.join(self.path, JOURNAL_FILE)
+
+    # reads the snapshot and the whole journal; called with the file lock held
+    def _load(self):
+        snapshot = os.path.join(self.path, SNAPSHOT_FILE)
+        if os.path.exists(snapshot):
+            with np.load(snapshot) as data:
+                offsets = data["offsets"]
+                for term in data["terms"].tolist():
+                    self._term_id(term)
+                self._post_docs = [data["post_docs"][offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+                self._post_tfs = [data["post_tfs"][offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+                self._doc_ids = data["doc_ids"].tolist()
+                self._ordinal = {chunk_id: i for i, chunk_id in enumerate(self._doc_ids)}
+                self._lengths = data["lengths"].astype(np.float32)
+                self._live = np.ones(len(self._doc_ids), dtype=bool)
+                self._tags = {tag: row.copy() for tag, row in zip(data["tag_names"].tolist(), data["tag_matrix"])}
+                self._total_length = float(self._lengths.sum())
+
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self._journal_path(), "a", encoding="utf-8")
+        self._journal_inode = os.fstat(self._journal.fileno()).st_ino
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self._read_journal()
+        logger.info(f"Loaded lexical index of {len(self._ordinal)} chunks from {self.path}")
+
+    # applies the journal lines appended since the last read, by this process or another one
+    # a line without its newline is still being written, or was left by a crashed writer: it is not consumed
+    def _read_journal(self):
+        with open(self._journal_path(), "rb") as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._journal_offset += len(line)
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring a corrupt line of {self._journal_path()}")
+                    continue
+                self._apply(op)
+                self._journal_ops += 1
+
+    # True when the journal was replaced (snapshot or clear by any process) or has lines not applied here
+    def _journal_changed(self) -> bool:
+        try:
+            stat = os.stat(self._journal_path())
+        except FileNotFoundError:
+            return True
+        return stat.st_ino != self._journal_inode or stat.st_size != self._journal_offset
+
+    # brings the index up to date with the snapshot and journal on disk; called with the file lock held
+    def _sync(self):
+        if not self.path or not self._journal_changed():
+            return
+        try:
+            stat = os.stat(self._journal_path())
+        except FileNotFoundError:
+            stat = None
+        if stat is None or stat.st_ino != self._journal_inode or stat.st_size < self._journal_offset:
+            self._reset()
+            self._load()
+        else:
+            self._read_journal()
+
+    def refresh(self):
+        """Apply the changes other processes made to the index since this one last read it."""
+        with self._lock:
+            if self.path and self._journal_changed():
+                with self._file_lock(exclusive=False):
+                    self._sync()
+
+    # appends operations to the journal; called with the file lock held, after _sync
+    def _log(self, ops: list[dict]):
+        if self._journal is None or not ops:
+            return
+        # an unterminated line left by a crashed writer must not swallow the first operation
+        if os.fstat(self._journal.fileno()).st_size > self._journal_offset:
+            self._journal.write("\n")
+        self._journal.write("".join(json.dumps(op) + "\n" for op in ops))
+        self._journal.flush()
+        self._journal_offset = os.fstat(self._journal.fileno()).st_size
+        self._journal_ops += len(ops)
+        if self._journal_ops >= self.snapshot_every:
+            self._write_snapshot()
+
+    # replaces the journal with an empty file (new inode), so other processes reload
+    def _reset_journal(self):
+        temporary = self._journal_path() + ".tmp"
+        open(temporary, "w").close()
+        os.replace(temporary, self._journal_path())
+        self._journal.close()
+        self._journal = open(self._journal_path(), "a", encoding="utf-8")
+        self._journal_inode = os.fstat(self._journal.fileno()).st_ino
+        self._journal_offset = 0
+        self._journal_ops = 0
+
+    def snapshot(self):
+        """Write the compacted index to the snapshot file and empty the journal."""
+        with self._lock:
+            if not self.path:
+                return
+            with self._file_lock():
+                self._sync()
+                self._write_snapshot()
+
+    # called with the file lock held, after _sync: the journal holds nothing this process has not applied
+    # a crash between the two replacements leaves the new snapshot with the old journal, whose
+    # operations (each one sets the state of its chunks) replay to the same index
+    def _write_snapshot(self):
+        self._compact()
+        post_docs = [self._postings(term_id)[0] for term_id in range(len(self._post_docs))]
+        post_tfs = [self._post_tfs[term_id] for term_id in range(len(self._post_tfs))]
+        offsets = np.zeros(len(post_docs) + 1, dtype=np.int64)
+        np.cumsum([len(docs) for docs in post_docs], out=offsets[1:])
+        tag_names = list(self._tags)
+        temporary = os.path.join(self.path, SNAPSHOT_FILE + ".tmp")
+        with open(temporary, "wb") as f:
+            np.savez(
+                f,
+                terms=np.array(list(self._terms), dtype=str),
+                offsets=offsets,
+                post_docs=np.concatenate(post_docs) if post_docs else np.zeros(0, dtype=np.uint32),
+                post_tfs=np.concatenate(post_tfs) if post_tfs else np.zeros(0, dtype=np.uint16),
+                doc_ids=np.array(self._doc_ids, dtype=str),
+                lengths=self._lengths[:len(self._doc_ids)],
+                tag_names=np.array(tag_names, dtype=str),
+                tag_matrix=np.array([self._tags[tag][:len(self._doc_ids)] for tag in tag_names], dtype=bool)
+                             .reshape(len(tag_names), len(self._doc_ids)),
+            )
+        os.replace(temporary, os.path.join(self.path, SNAPSHOT_FILE))
+        self._reset_journal()
+        logger.info(f"Wrote lexical index snapshot of {len(self._ordinal)} chunks")
+
+    def clear(self):
+        """Drop every indexed chunk, with the snapshot and the journal."""
+        with self._lock, self._file_lock():
+            self._reset()
+            if self.path:
+                snapshot = os.path.join(self.path, SNAPSHOT_FILE)
+                if os.path.exists(snapshot):
+                    os.remove(snapshot)
+                self._reset_journal()
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    # --- changes ---
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._terms.get(term)
+        if term_id is None:
+            term_id = self._terms[term] = len(self._post_docs)
+            self._post_docs.append(np.zeros(0, dtype=np.uint32))
+            self._post_tfs.append(np.zeros(0, dtype=np.uint16))
+        return term_id
+
+    # postings of a term with the pending ones merged in
+    def _postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        pending = self._pending.pop(term_id, None)
+        if pending:
+            self._post_docs[term_id] = np.concatenate([self._post_docs[term_id], np.array(pending[0], dtype=np.uint32)])
+            self._post_tfs[term_id] = np.concatenate([self._post_tfs[term_id], np.array(pending[1], dtype=np.uint16)])
+        return self._post_docs[term_id], self._post_tfs[term_id]
+
+    def _grow(self, size: int):
+        capacity = len(self._live)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        self._lengths = np.resize(self._lengths, capacity)
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self._live)] = self._live
+        self._live = live
+        for tag, row in self._tags.items():
+            grown = np.zeros(capacity, dtype=bool)
+            grown[:len(row)] = row
+            self._tags[tag] = grown
+
+    def _tag_row(self, tag: str) -> np.ndarray:
+        if tag not in self._tags:
+            self._tags[tag] = np.zeros(len(self._live), dtype=bool)
+        return self._tags[tag]
+
+    def _set_tags(self, ordinal: int, tags: list[str]):
+        for row in self._tags.values():
+            row[ordinal] = False
+        for tag in tags:
+            self._tag_row(tag)[ordinal] = True
+
+    def _remove(self, chunk_id: str):
+        ordinal = self._ordinal.pop(chunk_id, None)
+        if ordinal is not None:
+            self._live[ordinal] = False
+            self._total_length -= float(self._lengths[ordinal])
+
+    def _apply(self, op: dict):
+        if op["op"] == "add":
+            self._remove(op["id"])
+            ordinal = len(self._doc_ids)
+            self._grow(ordinal + 1)
+            self._doc_ids.append(op["id"])
+            self._ordinal[op["id"]] = ordinal
+            self._live[ordinal] = True
+            self._lengths[ordinal] = op["length"]
+            self._total_length += op["length"]
+            self._set_tags(ordinal, op["tags"])
+            for term, frequency in op["terms"].items():
+                docs, tfs = self._pending.setdefault(self._term_id(term), ([], []))
+                docs.append(ordinal)
+                tfs.append(min(frequency, MAX_TERM_FREQUENCY))
+        elif op["op"] == "remove":
+            for chunk_id in op["ids"]:
+                self._remove(chunk_id)
+        elif op["op"] == "tags":
+            for chunk_id in op["ids"]:
+                if chunk_id in self._ordinal:
+                    self._set_tags(self._ordinal[chunk_id], op["tags"])
+
+    def add(self, ids: list[str], texts: list[str], access_tags: list[str] = None):
+        """
+        Index chunks, replacing the ones already indexed under the same ids.
+
+        Args:
+            ids (list[str]): Chunk ids.
+            texts (list[str]): Chunk texts.
+            access_tags (list[str]): Comma-joined access tags of each chunk; None (or a None entry)
+                keeps the tags already indexed for the chunk.
+        """
+        with self._lock, self._file_lock():
+            self._sync()
+            ops = []
+            for i, (chunk_id, text) in enumerate(zip(ids, texts)):
+                tags = access_tags[i] if access_tags is not None else None
+                if tags is None:
+                    ordinal = self._ordinal.get(chunk_id)
+                    tags = [tag for tag, row in self._tags.items() if ordinal is not None and row[ordinal]]
+                else:
+                    tags = split_access_tags(tags)
+                terms = Counter(tokenize(text))
+                op = {"op": "add", "id": chunk_id, "length": sum(terms.values()), "terms": terms, "tags": tags}
+                self._apply(op)
+                ops.append(op)
+            self._log(ops)
+
+    def remove(self, ids: list[str]):
+        with self._lock, self._file_lock():
+            self._sync()
+            ids = [chunk_id for chunk_id in ids if chunk_id in self._ordinal]
+            if not ids:
+                return
+            op = {"op": "remove", "ids": ids}
+            self._apply(op)
+            self._log([op])
+            if len(self._doc_ids) - len(self._ordinal) > max(1024, len(self._ordinal)):
+                self._compact()
+
+    def set_access_tags(self, ids: list[str], access_tag: str):
+        """Replace the access tags of indexed chunks (comma-joined, as in chunk metadata)."""
+        with self._lock, self._file_lock():
+            self._sync()
+            op = {"op": "tags", "ids": [chunk_id for chunk_id in ids if chunk_id in self._ordinal],
+                  "tags": split_access_tags(access_tag)}
+            if op["ids"]:
+                self._apply(op)
+                self._log([op])
+
+    # drops deleted chunks from the postings and renumbers the live ones
+    def _compact(self):
+        count = len(self._doc_ids)
+        live = np.flatnonzero(self._live[:count])
+        if len(live) == count and not self._pending:
+            return
+        remap = np.full(count, -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        terms, post_docs, post_tfs = {}, [], []
+        for term, term_id in self._terms.items():
+            docs, tfs = self._postings(term_id)
+            keep = self._live[docs] if len(docs) else np.zeros(0, dtype=bool)
+            if keep.any():
+                terms[term] = len(post_docs)
+                post_docs.append(remap[docs[keep]].astype(np.uint32))
+                post_tfs.append(tfs[keep])
+        self._terms, self._post_docs, self._post_tfs, self._pending = terms, post_docs, post_tfs, {}
+        self._doc_ids = [self._doc_ids[i] for i in live]
+        self._ordinal = {chunk_id: i for i, chunk_id in enumerate(self._doc_ids)}
+        self._lengths = self._lengths[live].copy()
+        self._live = np.ones(len(live), dtype=bool)
+        self._tags = {tag: row[live].copy() for tag, row in self._tags.items()}
+
+    # --- search ---
+
+    def search(self, query: str, user_tags: list[str], n_results: int = 10) -> list[tuple[str, float]]:
+        """
+        BM25 ranking of the chunks readable with any of the user's tags.
+
+        Args:
+            query (str): Query text.
+            user_tags (list[str]): Access tags of the user.
+            n_results (int): Number of chunks to return.
+        Returns:
+            list[tuple[str, float]]: (chunk_id, BM25 score), best first; only chunks matching a query term.
+        """
+        with self._lock:
+            self.refresh()
+            count = len(self._ordinal)
+            rows = [self._tags[tag] for tag in dict.fromkeys(user_tags or []) if tag in self._tags]
+            if not count or not rows or n_results <= 0:
+                return []
+            average_length = self._total_length / count
+            has_deleted = len(self._doc_ids) > count
+
+            # only the postings of the query terms are touched, never every indexed chunk
+            scores = np.zeros(len(self._live), dtype=np.float32)
+            matched = []
+            for term in dict.fromkeys(tokenize(query)):
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    continue
+                docs, tfs = self._postings(term_id)
+                if has_deleted:
+                    keep = self._live[docs]
+                    docs, tfs = docs[keep], tfs[keep]
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                if not len(docs) or idf < MIN_TERM_IDF:
+                    continue
+                tfs = tfs.astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / average_length)
+                # ordinals are unique within a posting list, so fancy-index += is safe
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+                matched.append(docs)
+            if not matched:
+                return []
+
+            candidates = matched[0] if len(matched) == 1 else np.flatnonzero(scores)
+            candidates = candidates[np.logical_or.reduce([row[candidates] for row in rows])]
+            if len(candidates) > n_results:
+                candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._doc_ids[i], float(scores[i])) for i in candidates]
+
+
+class LexicalIndexedStore(VectorStore):
+    """
+    VectorStore that keeps a LexicalIndex in step with every write of the wrapped store:
+    added and upserted chunks are indexed, access tag changes are applied, deleted chunks are removed.
+
+    Args:
+        store (VectorStore): The vector store written to and read from.
+        index (LexicalIndex): The index kept in step.
+    """
+
+    def __init__(self, store: VectorStore, index: LexicalIndex):
+        self.store = store
+        self.index = index
+        if len(index) != store.count():
+            logger.warning(f"The lexical index holds {len(index)} chunks, the vector store {store.count()}; "
+                           f"run `python -m app.lexical_index --rebuild`")
+
+    # other attributes (e.g. partitions) are the wrapped store's
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def _index(self, ids, documents, metadatas):
+        access_tags = [(meta or {}).get("access_tags") for meta in metadatas] if metadatas is not None else None
+        if documents is not None:
+            self.index.add(ids, documents, access_tags)
+        elif access_tags is not None:
+            ids_by_tags = {}
+            for chunk_id, tags in zip(ids, access_tags):
+                if tags is not None:
+                    ids_by_tags.setdefault(tags, []).append(chunk_id)
+            for tags, tag_ids in ids_by_tags.items():
+                self.index.set_access_tags(tag_ids, tags)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self.store.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        self._index(ids, documents, metadatas)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self.store.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        self._index(ids, documents, metadatas)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        self.store.update(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        self._index(ids, documents, metadatas)
+
+    def delete(self, ids=None, where=None):
+        deleted = self.store.get(ids=ids, where=where, include=[])["ids"] if where else ids
+        self.store.delete(ids=ids, where=where)
+        self.index.remove(deleted or [])
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        return self.store.get(ids=ids, where=where, limit=limit, offset=offset, include=include)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        return self.store.query(query_embeddings=query_embeddings, n_results=n_results, where=where, include=include)
+
+    def count(self) -> int:
+        return self.store.count()
+
+
+# --- FUNCTION: rebuild_lexical_index ---
+
+# re-indexes every chunk of the vector store, one page at a time; returns the number of chunks indexed
+def rebuild_lexical_index(index: LexicalIndex, collection: VectorStore, page_size: int = 1000) -> int:
+    from app.document_store import iter_chunk_pages
+
+    indexed = 0
+    index.clear()
+    for page in iter_chunk_pages(None, include=["documents", "metadatas"], page_size=page_size,
+                                 collection=collection):
+        index.add(page["ids"], page["documents"], [meta.get("access_tags") for meta in page["metadatas"]])
+        indexed += len(page["ids"])
+        logger.info(f"Indexed {indexed} chunks")
+    index.snapshot()
+    return indexed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the BM25 lexical index of the chunk texts.")
+    parser.add_argument("--rebuild", action="store_true", help="index every chunk of the vector store")
+    args = parser.parse_args()
+
+    from app.vector_store import lexical_index, vector_store
+    if lexical_index is None:
+        parser.error("LEXICAL_INDEX_ENABLED is off")
+    if args.rebuild:
+        print(f"Indexed {rebuild_lexical_index(lexical_index, vector_store.store)} chunks.")
+    print(f"The lexical index holds {len(lexical_index)} chunks.")
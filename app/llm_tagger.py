@@ -0,0 +1,134 @@
+# app/llm_tagger.py
+import asyncio
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# --- FUNCTION: parse_tag_reply ---
+
+# strict parsing of an LLM tag reply: the reply must be one of tags (quotes, backticks and a final
+# period are tolerated) or mention exactly one of them; anything else returns None
+def parse_tag_reply(reply: str, tags: list[str]) -> str:
+    text = reply.strip().strip("`'\". ").lower()
+    if text in tags:
+        return text
+    found = {tag for tag in tags if re.search(rf"(?<![a-z_]){re.escape(tag)}(?![a-z_])", text)}
+    return found.pop() if len(found) == 1 else None
+
+
+class LLMTagger:
+    """
+    Bounded, cached LLM tagging fallback.
+
+    At most `concurrency` requests reach the LLM server at a time, whatever the size of the upload.
+    Replies are cached by the sha256 of the tagged text (the document head), and concurrent requests
+    for the same text share one call. Each call has a timeout and is retried with backoff
+    when it fails, times out or returns an unparsable reply; after the last retry the fallback tag
+    is returned (and not cached).
+
+    Args:
+        llm: LangChain LLM with ainvoke().
+        tags (list[str]): Valid tags.
+        build_prompt (Callable): Builds the prompt from the text.
+        concurrency (int): Max concurrent LLM calls.
+        timeout (float): Seconds per attempt.
+        retries (int): Retries after the first attempt.
+        cache_size (int): Max cached replies (least recently used are dropped).
+        fallback_tag (str): Tag returned when every attempt failed.
+    """
+
+    def __init__(self, llm, tags: list[str], build_prompt: Callable[[str], str], concurrency: int,
+                 timeout: float, retries: int, cache_size: int, fallback_tag: str):
+        self.llm = llm
+        self.tags = list(tags)
+        self.build_prompt = build_prompt
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.cache_size = cache_size
+        self.fallback_tag = fallback_tag
+        self._cache = OrderedDict()
+        self._loop = None
+        self._semaphore = None
+        self._pending = {}
+
+    async def classify(self, text: str) -> str:
+        """
+        Return the LLM tag of a text.
+
+        Args:
+            text (str): Text to classify (the document head).
+        Returns:
+            str: One of tags, or fallback_tag when the LLM gave no valid answer.
+        """
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            logger.info(f"LLM tag cache hit: {self._cache[key]}")
+            return self._cache[key]
+
+        self._bind_loop()
+        # an identical text is already being classified: wait for that call
+        if key in self._pending:
+            return await asyncio.shield(self._pending[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            tag = await self._call(text)
+            if tag is not None:
+                self._cache[key] = tag
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            else:
+                tag = self.fallback_tag
+            future.set_result(tag)
+            return tag
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # raised here too: mark it retrieved so an unwaited future does not log it again
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    # asyncio primitives belong to one event loop; recreate them when called from a new one
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._pending = {}
+
+    # calls the LLM with timeout and retries; None when no attempt gave a valid tag
+    async def _call(self, text: str) -> str:
+        prompt = self.build_prompt(text)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            try:
+                async with self._semaphore:
+                    reply = await asyncio.wait_for(self.llm.ainvoke(prompt), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"LLM tagging timed out after {self.timeout}s (attempt {attempt + 1})")
+                continue
+            except Exception as e:
+                logger.warning(f"LLM tagging failed (attempt {attempt + 1}): {e}")
+                continue
+
+            tag = parse_tag_reply(reply, self.tags)
+            if tag is not None:
+                return tag
+            logger.warning(f"⚠️ Unparsable LLM tag reply (attempt {attempt + 1}): {reply!r}")
+
+        logger.warning(f"LLM tagging gave no valid tag, using '{self.fallback_tag}'")
+        return None
@@ -7,7 +7,9 @@ from app.rag_engine import generate_answer
 from app.rag_engine2 import generate_answer2  # Import the new RAG engine
 from app.rag_engine3 import generate_answer3  # Import the third RAG engine
 from app.rag_engine4 import generate_answer4  # Import the fourth RAG engine
-from app.doc_ingestor import ingest_pdfs
+from app.doc_ingestor import ingest_pdfs, update_pdf, delete_pdfs, save_uploads
+from app.ingestion_jobs import job_manager
+from app.rbac_retrieval import selectivity_estimator
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
@@ -42,6 +44,12 @@ app.mount("/frontend", StaticFiles(directory="frontend_ui", html=True), name="fr
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+# start the background ingestion workers (and resume unfinished jobs)
+@app.on_event("startup")
+async def start_ingestion_jobs():
+    await job_manager.start()
+
+
 # --- LOGIN ENDPOINT ---
 # handles user login using OAuth2PasswordRequestForm
 # OAuth2PasswordRequestForm is a standard form for username and password
@@ -68,6 +76,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 # --- BULK PDF UPLOAD ENDPOINT ---
 # File is used to handle file uploads
 # Form is used to handle form data (like access tags)
+# files are stored and queued as an ingestion job; the response only carries the job id,
+# progress and results are read from /jobs/{job_id}
 @app.post("/upload")
 async def upload_pdfs(
     files: List[UploadFile] = File(...),
@@ -87,8 +97,74 @@ async def upload_pdfs(
     elif mode == "manual":
         if not access_tags or len(access_tags) == 0:
             raise HTTPException(status_code=400, detail="Access tags are required in manual mode.") 
-        
-    return await ingest_pdfs(files, access_tags, user)
+
+    saved_files = await save_uploads(files)
+    job = await job_manager.submit(saved_files, access_tags, user)
+    return {"job_id": job["job_id"], "status": job["status"], "files": len(saved_files)}
+
+# --- INGESTION JOB STATUS ENDPOINT ---
+# reports per-file progress of an upload: parsed, tagged, chunks embedded and chunks written
+# per-file results (same shape as the old /upload response) appear once each file is done
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, user=Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401)
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if "admin" not in user["access_tags"] and job["created_by"] != user["username"]:
+        raise HTTPException(status_code=403, detail="You are not authorized to view this job.")
+    return job_manager.public_view(job)
+
+# --- DOCUMENT UPDATE ENDPOINT ---
+# replaces a stored document with a new version of the PDF
+# the document is looked up by document_id, or by title (default: the uploaded file name)
+# access tags are kept unless new ones are passed
+@app.post("/update")
+async def update_document(
+    file: UploadFile = File(...),
+    document_id: Optional[str] = Form(None),
+    title: Optional[str] = Form(None),
+    access_tags: Optional[List[str]] = Form(None),
+    user=Depends(get_current_user)
+):
+    if not user:
+        raise HTTPException(status_code=401)
+    # Only allow users with 'admin' access to update
+    if "admin" not in user["access_tags"]:
+        raise HTTPException(status_code=403, detail="You are not authorized to update documents.")
+
+    return await update_pdf(file, document_id, title or file.filename, access_tags, user)
+
+# --- DOCUMENT DELETE ENDPOINT ---
+# deletes the stored documents matching every given filter: document_id, title,
+# uploader (created_by) or access tag; returns the number of chunks removed
+@app.delete("/documents")
+async def delete_documents(
+    document_id: Optional[str] = None,
+    title: Optional[str] = None,
+    created_by: Optional[str] = None,
+    access_tag: Optional[str] = None,
+    user=Depends(get_current_user)
+):
+    if not user:
+        raise HTTPException(status_code=401)
+    # Only allow users with 'admin' access to delete
+    if "admin" not in user["access_tags"]:
+        raise HTTPException(status_code=403, detail="You are not authorized to delete documents.")
+
+    return await delete_pdfs(document_id, title, created_by, access_tag)
+
+# --- RBAC RETRIEVAL METRICS ENDPOINT ---
+# per access-tag-set selectivity and the fetch time spent on unauthorized chunks
+# (only recorded when RBAC_FILTER_MODE is "postfilter")
+@app.get("/metrics/rbac")
+async def rbac_metrics(user=Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401)
+    if "admin" not in user["access_tags"]:
+        raise HTTPException(status_code=403, detail="You are not authorized to view metrics.")
+    return selectivity_estimator.snapshot()
 
 # Endpoint to ask questions
 # gets current user from JWT token, checks if user is authenticated,
@@ -4,7 +4,8 @@ from typing import List
 from app.auth import get_current_user
 from app.models import QueryRequest, UploadRequest
 from app.mcp_app import orchestrator
-from app.doc_ingestor import ingest_pdfs
+from app.doc_ingestor import ingest_pdfs, save_uploads
+from app.ingestion_jobs import job_manager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
@@ -39,6 +40,12 @@ app.mount("/frontend", StaticFiles(directory="frontend_ui", html=True), name="fr
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+# start the background ingestion workers (and resume unfinished jobs)
+@app.on_event("startup")
+async def start_ingestion_jobs():
+    await job_manager.start()
+
+
 # --- LOGIN ENDPOINT ---
 # handles user login using OAuth2PasswordRequestForm
 # OAuth2PasswordRequestForm is a standard form for username and password
@@ -84,17 +91,24 @@ async def upload_pdfs(
     elif mode == "manual":
         pass
 
-    # Save uploaded files to disk
-    filepaths = []
-    for file in files:
-        filepath = f"./uploads/{file.filename}"
-        with open(filepath, "wb") as f:
-            f.write(await file.read())
-        filepaths.append(filepath)
+    # Save uploaded files to disk and queue them as an ingestion job
+    # the job runs the same pipeline as the IngestionAgent's ingest_pdfs tool,
+    # without holding the request open; progress is read from /jobs/{job_id}
+    saved_files = await save_uploads(files)
+    job = await job_manager.submit(saved_files, access_tags, user)
+    return {"job_id": job["job_id"], "status": job["status"], "files": len(saved_files)}
 
-    task = f"Please ingest pdfs whose pdf paths and access_tags have been passed.. "
-    result = await orchestrator.plan(task = task, user = user, access_tags = access_tags, file_paths=filepaths)
-    return {"result: ", result}
+# --- INGESTION JOB STATUS ENDPOINT ---
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, user=Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401)
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if "admin" not in user["access_tags"] and job["created_by"] != user["username"]:
+        raise HTTPException(status_code=403, detail="You are not authorized to view this job.")
+    return job_manager.public_view(job)
 
 # Endpoint to ask questions
 # gets current user from JWT token, checks if user is authenticated,
@@ -0,0 +1,391 @@
+# app/numpy_vector_store.py
+# In-process vector store with exact search: the vectors are one float32 matrix (memory-mapped file
+# vectors.f32), ids, documents and metadata live in a SQLite file (rows.sqlite3) next to it.
+# A filtered top-k query is a single matrix-vector product over the rows that pass the where filter,
+# resolved from an in-memory inverted index of the metadata, so there is no index to build, no
+# approximate recall and no external process. Meant for corpora up to ~100k chunks and for tests;
+# select it with VECTOR_STORE_BACKEND = "numpy" (app/config.py).
+import json
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+
+from app.vector_search import squared_l2_distances, top_k_indices
+from app.vector_store_interface import VectorStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+ROWS_FILE = "rows.sqlite3"
+
+# rows per "IN (...)" statement, below SQLite's bound-parameter limit
+SQLITE_BATCH_SIZE = 900
+
+# below this share of candidate rows, distances are computed on the candidates only (gather),
+# above it on the whole matrix with the other rows masked out (no copy)
+SPARSE_CANDIDATE_RATIO = 0.25
+
+DEFAULT_GET_INCLUDE = ["documents", "metadatas"]
+DEFAULT_QUERY_INCLUDE = ["documents", "metadatas", "distances"]
+
+RANGE_OPERATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+# key of a metadata value in the inverted index: True and 1 are different values, as in ChromaDB
+def _index_key(value):
+    return (isinstance(value, bool), value)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact-search vector store on a NumPy matrix, with the ChromaDB collection semantics of
+    app/vector_store_interface.py.
+
+    Args:
+        path (str): Directory of vectors.f32 and rows.sqlite3, created if missing; None keeps everything in memory.
+        dim (int): Vector dimension; taken from the first vectors added (or the stored files) when None.
+        initial_capacity (int): Rows allocated up front; the matrix doubles when full.
+    """
+
+    def __init__(self, path: str = None, dim: int = None, initial_capacity: int = 1024):
+        self.path = path
+        self.dim = dim
+        self._initial_capacity = max(1, initial_capacity)
+        self._lock = threading.RLock()
+
+        self._capacity = 0
+        self._vectors = None
+        self._norms = np.empty(0, dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        self._ids: list = []
+        self._metadatas: list = []
+        self._slot_of: dict[str, int] = {}
+        self._free: list[int] = []
+        # metadata key -> index key of a value -> slots holding it
+        self._index: dict[str, dict[tuple, set[int]]] = {}
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, ROWS_FILE) if path else ":memory:", check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS rows (slot INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                         "document TEXT, metadata TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._load()
+
+    # --- storage ---
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, VECTORS_FILE)
+
+    # reopens the stored matrix and rebuilds ids, metadata, norms and the inverted index from SQLite
+    def _load(self):
+        meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        if "dim" not in meta:
+            return
+        stored_dim = int(meta["dim"])
+        if self.dim is not None and self.dim != stored_dim:
+            raise ValueError(f"Store at {self.path} holds {stored_dim}-dimensional vectors, not {self.dim}")
+        self.dim = stored_dim
+        self._allocate(int(meta["capacity"]), existing=True)
+
+        for slot, chunk_id, metadata in self._db.execute("SELECT slot, id, metadata FROM rows"):
+            self._ids[slot] = chunk_id
+            self._metadatas[slot] = json.loads(metadata)
+            self._slot_of[chunk_id] = slot
+            self._live[slot] = True
+            self._index_add(slot, self._metadatas[slot])
+        live = np.flatnonzero(self._live)
+        if len(live):
+            rows = np.asarray(self._vectors[live])
+            self._norms[live] = np.einsum("ij,ij->i", rows, rows)
+        self._free = [slot for slot in range(self._capacity - 1, -1, -1) if not self._live[slot]]
+        logger.info(f"Loaded {len(self._slot_of)} vectors from {self.path}")
+
+    # (re)maps the matrix with room for capacity rows; in-memory stores copy into a larger array
+    def _allocate(self, capacity: int, existing: bool = False):
+        old_capacity = self._capacity
+        if self.path:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            mode = "r+" if existing or old_capacity else "w+"
+            if mode == "r+":
+                with open(self._vectors_path(), "r+b") as f:
+                    f.truncate(capacity * self.dim * 4)
+            self._vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?), ('capacity', ?)",
+                             (str(self.dim), str(capacity)))
+        else:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            if self._vectors is not None:
+                vectors[:old_capacity] = self._vectors
+            self._vectors = vectors
+
+        self._norms = np.concatenate([self._norms, np.zeros(capacity - old_capacity, dtype=np.float32)])
+        self._live = np.concatenate([self._live, np.zeros(capacity - old_capacity, dtype=bool)])
+        self._ids.extend([None] * (capacity - old_capacity))
+        self._metadatas.extend([None] * (capacity - old_capacity))
+        # lowest slots are handed out first
+        self._free = list(range(capacity - 1, old_capacity - 1, -1)) + self._free
+        self._capacity = capacity
+
+    def _reserve(self, count: int):
+        if self.dim is None:
+            raise ValueError("The vector dimension is unknown until the first vectors are added")
+        if self._vectors is None:
+            self._allocate(max(self._initial_capacity, count))
+        elif len(self._free) < count:
+            capacity = self._capacity
+            while capacity - len(self._slot_of) < count:
+                capacity *= 2
+            self._allocate(capacity)
+
+    def _as_matrix(self, embeddings) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        if matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match the store dimension {self.dim}")
+        return matrix
+
+    def _commit(self):
+        if self.path and self._vectors is not None:
+            self._vectors.flush()
+        self._db.commit()
+
+    # --- inverted index ---
+
+    def _index_add(self, slot: int, metadata: dict):
+        for key, value in metadata.items():
+            self._index.setdefault(key, {}).setdefault(_index_key(value), set()).add(slot)
+
+    def _index_remove(self, slot: int, metadata: dict):
+        for key, value in metadata.items():
+            values = self._index.get(key, {})
+            slots = values.get(_index_key(value))
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del values[_index_key(value)]
+
+    def _slots_equal(self, key: str, value) -> set[int]:
+        return self._index.get(key, {}).get(_index_key(value), set())
+
+    def _mask(self, slots) -> np.ndarray:
+        mask = np.zeros(self._capacity, dtype=bool)
+        if slots:
+            mask[np.fromiter(slots, dtype=np.int64, count=len(slots))] = True
+        return mask
+
+    # boolean mask of the live rows matching a ChromaDB where filter
+    def _match(self, where: dict) -> np.ndarray:
+        if not where:
+            return self._live.copy()
+        if len(where) > 1:
+            return self._match({"$and": [{key: value} for key, value in where.items()]})
+
+        key, condition = next(iter(where.items()))
+        if key in ("$and", "$or"):
+            masks = [self._match(clause) for clause in condition]
+            if not masks:
+                return self._live.copy()
+            return np.logical_and.reduce(masks) if key == "$and" else np.logical_or.reduce(masks)
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        masks = []
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                masks.append(self._mask(self._slots_equal(key, operand)))
+            elif operator == "$ne":
+                masks.append(self._live & ~self._mask(self._slots_equal(key, operand)))
+            elif operator in ("$in", "$nin"):
+                slots = set().union(*(self._slots_equal(key, value) for value in operand))
+                masks.append(self._mask(slots) if operator == "$in" else self._live & ~self._mask(slots))
+            elif operator in RANGE_OPERATORS:
+                compare = RANGE_OPERATORS[operator]
+                slots = set()
+                for (is_bool, value), value_slots in self._index.get(key, {}).items():
+                    if not is_bool and isinstance(value, (int, float)) and compare(value, operand):
+                        slots |= value_slots
+                masks.append(self._mask(slots))
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+        return np.logical_and.reduce(masks) & self._live
+
+    # --- writes ---
+
+    def _write(self, ids, embeddings, documents, metadatas, merge: bool, insert: bool, replace: bool):
+        matrix = self._as_matrix(embeddings) if embeddings is not None else None
+        count = len(ids)
+        if matrix is not None and len(matrix) != count:
+            raise ValueError("ids and embeddings must have the same length")
+
+        new = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._slot_of] if insert else []
+        if new and matrix is None:
+            raise ValueError("Embeddings are required to add chunks")
+        if new:
+            self._reserve(len(new))
+
+        rows = []
+        for i, chunk_id in enumerate(ids):
+            metadata = metadatas[i] if metadatas is not None else None
+            document = documents[i] if documents is not None else None
+            slot = self._slot_of.get(chunk_id)
+            if slot is None:
+                if not insert:
+                    logger.warning(f"Chunk {chunk_id} does not exist, skipping update")
+                    continue
+                slot = self._free.pop()
+                stored = {key: value for key, value in (metadata or {}).items() if value is not None}
+                self._ids[slot] = chunk_id
+                self._slot_of[chunk_id] = slot
+                self._live[slot] = True
+            elif not replace:
+                logger.warning(f"Chunk {chunk_id} already exists, skipping add")
+                continue
+            else:
+                stored = self._metadatas[slot]
+                self._index_remove(slot, stored)
+                if metadata is not None:
+                    stored = {**stored, **metadata} if merge else dict(metadata)
+                    stored = {key: value for key, value in stored.items() if value is not None}
+            self._metadatas[slot] = stored
+            self._index_add(slot, stored)
+            if matrix is not None:
+                self._vectors[slot] = matrix[i]
+                self._norms[slot] = matrix[i] @ matrix[i]
+            rows.append((slot, chunk_id, document, json.dumps(stored)))
+
+        # documents not given keep their stored text
+        self._db.executemany(
+            "INSERT INTO rows (slot, id, document, metadata) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(slot) DO UPDATE SET id = excluded.id, metadata = excluded.metadata, "
+            "document = COALESCE(excluded.document, rows.document)",
+            rows
+        )
+        self._commit()
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        with self._lock:
+            self._write(ids, embeddings, documents, metadatas, merge=False, insert=True, replace=False)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        with self._lock:
+            self._write(ids, embeddings, documents, metadatas, merge=True, insert=True, replace=True)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        with self._lock:
+            self._write(ids, embeddings, documents, metadatas, merge=True, insert=False, replace=True)
+
+    def delete(self, ids=None, where=None):
+        if ids is None and not where:
+            raise ValueError("delete needs ids or a where filter")
+        with self._lock:
+            slots = self._select(ids, where)
+            for slot in slots:
+                self._index_remove(slot, self._metadatas[slot])
+                del self._slot_of[self._ids[slot]]
+                self._ids[slot] = None
+                self._metadatas[slot] = None
+                self._live[slot] = False
+                self._norms[slot] = 0
+            self._free.extend(sorted(slots, reverse=True))
+            for i in range(0, len(slots), SQLITE_BATCH_SIZE):
+                batch = slots[i:i + SQLITE_BATCH_SIZE]
+                self._db.execute(f"DELETE FROM rows WHERE slot IN ({','.join('?' * len(batch))})", batch)
+            self._commit()
+
+    # --- reads ---
+
+    # slots of the given ids (in that order) and/or of the rows matching where (in slot order)
+    def _select(self, ids, where) -> list[int]:
+        if ids is None:
+            return np.flatnonzero(self._match(where)).tolist()
+        slots = [self._slot_of[chunk_id] for chunk_id in ids if chunk_id in self._slot_of]
+        if where:
+            mask = self._match(where)
+            slots = [slot for slot in slots if mask[slot]]
+        return slots
+
+    def _documents(self, slots: list[int]) -> list:
+        documents = {}
+        for i in range(0, len(slots), SQLITE_BATCH_SIZE):
+            batch = slots[i:i + SQLITE_BATCH_SIZE]
+            documents.update(self._db.execute(
+                f"SELECT slot, document FROM rows WHERE slot IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return [documents.get(slot) for slot in slots]
+
+    def _rows(self, slots: list[int], include: list[str]) -> dict:
+        return {
+            "ids": [self._ids[slot] for slot in slots],
+            "embeddings": np.array(self._vectors[slots]) if "embeddings" in include and slots else
+                          ([] if "embeddings" in include else None),
+            "documents": self._documents(slots) if "documents" in include else None,
+            "metadatas": [dict(self._metadatas[slot]) for slot in slots] if "metadatas" in include else None,
+        }
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = DEFAULT_GET_INCLUDE if include is None else include
+        with self._lock:
+            slots = self._select(ids, where)
+            start = offset or 0
+            slots = slots[start:start + limit] if limit is not None else slots[start:]
+            return {**self._rows(slots, include), "included": list(include)}
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        include = DEFAULT_QUERY_INCLUDE if include is None else include
+        keys = ("ids", "embeddings", "documents", "metadatas", "distances")
+        result = {key: [] if key == "ids" or key in include else None for key in keys}
+        with self._lock:
+            if self._vectors is None or not self._slot_of:
+                for key in keys:
+                    if result[key] is not None:
+                        result[key] = [[] for _ in range(len(query_embeddings))]
+                return {**result, "included": list(include)}
+
+            queries = self._as_matrix(query_embeddings)
+            mask = self._match(where)
+            candidates = np.flatnonzero(mask)
+            sparse = len(candidates) < SPARSE_CANDIDATE_RATIO * self._capacity
+            # squared norms of the excluded rows are set to inf, so they never reach the top k
+            masked_norms = None if sparse else np.where(mask, self._norms, np.float32(np.inf))
+
+            for query in queries:
+                if sparse:
+                    distances = squared_l2_distances(query, self._vectors[candidates], self._norms[candidates])
+                    nearest = top_k_indices(distances, n_results)
+                    slots = candidates[nearest].tolist()
+                else:
+                    distances = squared_l2_distances(query, self._vectors, masked_norms)
+                    nearest = top_k_indices(distances, n_results)
+                    slots = nearest.tolist()
+                rows = self._rows(slots, include)
+                result["ids"].append(rows["ids"])
+                for key in ("embeddings", "documents", "metadatas"):
+                    if result[key] is not None:
+                        result[key].append(rows[key])
+                if result["distances"] is not None:
+                    result["distances"].append(distances[nearest].tolist())
+            return {**result, "included": list(include)}
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._slot_of)
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
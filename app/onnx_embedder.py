@@ -0,0 +1,149 @@
+# app/onnx_embedder.py
+import argparse
+import logging
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.config import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR, ONNX_NUM_THREADS, ONNX_QUANTIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ONNX Runtime backend for the sentence-transformers embedding model.
+# The transformer is exported once to an ONNX graph (optionally int8 dynamic-quantized) and run
+# on CPU with a fixed number of threads; pooling matches sentence-transformers' all-MiniLM-L6-v2:
+# mean over the non-padding tokens, then L2 normalisation, inputs truncated to 256 tokens.
+# onnxruntime is only needed when EMBEDDING_BACKEND = "onnx"; torch and transformers only for the export.
+
+MAX_SEQ_LENGTH = 256
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+ONNX_INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+# --- FUNCTION: export_onnx_model ---
+
+# exports the HuggingFace model to {output_dir}/model.onnx, with its tokenizer,
+# and with quantize also writes the int8 dynamic-quantized {output_dir}/model_int8.onnx
+# returns the path of the model to load
+def export_onnx_model(model_name: str = EMBEDDING_MODEL_NAME, output_dir: str = ONNX_MODEL_DIR,
+                      quantize: bool = ONNX_QUANTIZE) -> str:
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    # HuggingFaceEmbeddings resolves bare names under the sentence-transformers organisation
+    model_id = model_name if "/" in model_name or os.path.isdir(model_name) else f"sentence-transformers/{model_name}"
+    logger.info(f"Exporting {model_id} to ONNX in {output_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    # keyword arguments only: the positional order of forward() differs between transformers versions
+    class Encoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    sample = tokenizer(["export sample text"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUT_NAMES}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(),
+            tuple(sample[name] for name in ONNX_INPUT_NAMES),
+            model_path,
+            input_names=ONNX_INPUT_NAMES,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False
+        )
+
+    if not quantize:
+        return model_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Wrote int8 quantized model to {quantized_path}")
+    return quantized_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    LangChain Embeddings running an exported model with ONNX Runtime on CPU.
+
+    Texts are sorted by length before batching so each batch pads to similar lengths;
+    results are returned in input order.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, num_threads: int = ONNX_NUM_THREADS,
+                 quantized: bool = ONNX_QUANTIZE, batch_size: int = 32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}; export it with `python -m app.onnx_embedder`"
+            )
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+        # a fixed thread count: the session never competes with itself for cores
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model {model_path} ({options.intra_op_num_threads} threads)")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, embedding in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                embeddings[i] = embedding.tolist()
+        return embeddings
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        last_hidden_state = self.session.run(None, inputs)[0]
+
+        # mean pooling over real tokens, then L2 normalisation
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (last_hidden_state * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX for EMBEDDING_BACKEND='onnx'.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="HuggingFace model name or local path")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="only export the float32 model")
+    args = parser.parse_args()
+    print(export_onnx_model(args.model, args.output_dir, quantize=not args.no_quantize))
@@ -0,0 +1,403 @@
+# app/partitioned_vector_store.py
+# Vector store split into one partition per access tag (VECTOR_STORE_PARTITION_BY_TAG, app/config.py).
+#
+# A chunk is written to the partition of each of its access tags, so the partition of a tag holds
+# exactly the chunks readable with that tag. An RBAC query (the where filter of
+# document_store.access_filter) only searches the partitions of the user's tags, concurrently,
+# and merges their nearest chunks by distance: retrieval cost follows what the user can read,
+# not the size of the whole corpus, and the other partitions are never touched.
+#
+#   python -m app.partitioned_vector_store      # copy the unpartitioned store into the partitions
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import numpy as np
+
+from app.access_tags import TAG_KEY_PREFIX, split_access_tags, tag_key
+from app.config import PARTITION_SEARCH_WORKERS
+from app.vector_store_interface import VectorStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# partition names (ChromaDB collection or NumPy store directory): documents_tag_<tag>, and
+# documents_untagged for chunks without access tags (stored, never returned by RBAC queries)
+PARTITION_PREFIX = "documents_tag_"
+UNTAGGED_PARTITION = "documents_untagged"
+
+DEFAULT_GET_INCLUDE = ["documents", "metadatas"]
+DEFAULT_QUERY_INCLUDE = ["documents", "metadatas", "distances"]
+
+
+# partition name of an access tag (None: chunks without tags)
+def partition_name(tag: str) -> str:
+    return UNTAGGED_PARTITION if tag is None else f"{PARTITION_PREFIX}{tag}"
+
+
+# access tags (None for the untagged partition) of the partitions among existing store names
+def partition_tags(names: list[str]) -> list:
+    tags = []
+    for name in names:
+        if name == UNTAGGED_PARTITION:
+            tags.append(None)
+        elif name.startswith(PARTITION_PREFIX):
+            tags.append(name[len(PARTITION_PREFIX):])
+    return tags
+
+
+# tags of an RBAC where filter ({"tag_x": True} or {"$or": [{"tag_x": True}, ...]}), None for any other filter
+def filter_tags(where: dict) -> set:
+    clauses = where.get("$or") if where and set(where) == {"$or"} else [where]
+    tags = set()
+    for clause in clauses:
+        if not isinstance(clause, dict) or len(clause) != 1:
+            return None
+        key, value = next(iter(clause.items()))
+        if not key.startswith(TAG_KEY_PREFIX) or value not in (True, {"$eq": True}):
+            return None
+        tags.add(key[len(TAG_KEY_PREFIX):])
+    return tags
+
+
+# partitions a chunk belongs to, from its metadata
+def chunk_partitions(meta: dict) -> set:
+    return set(split_access_tags((meta or {}).get("access_tags"))) or {None}
+
+
+def _partition_order(tag):
+    return (tag is None, tag or "")
+
+
+class PartitionedVectorStore(VectorStore):
+    """
+    VectorStore made of one store per access tag, searched concurrently and merged by distance.
+
+    Chunks with several tags are stored in each of their partitions; reads return every chunk once.
+    Changing the access_tags of a chunk (update/upsert) moves it between partitions, removing it from
+    the partitions it left before adding it to the new ones.
+
+    Nothing is loaded up front: chunk ids are looked up in the partitions when read or written.
+    Pages of get() walk the partitions in name order (untagged last), each chunk being read from its
+    home partition, the first one of its tags; the home is a where filter pushed down to the partition
+    (no tag_<name> key of an earlier partition), so limit and offset are applied by the partition.
+    This relies on the tag_<name> keys of the chunk metadata (access_tags.set_access_tags).
+
+    Args:
+        open_partition (Callable[[str], VectorStore]): Opens or creates the store of a tag (None: untagged chunks).
+        tags (list): Tags of the partitions that already exist.
+        search_workers (int): Threads searching partitions concurrently.
+    """
+
+    def __init__(self, open_partition: Callable[[str], VectorStore], tags: list = (),
+                 search_workers: int = PARTITION_SEARCH_WORKERS):
+        self.open_partition = open_partition
+        self.partitions: dict = {}
+        self._search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="partition-search")
+        self._lock = threading.RLock()
+        # number of chunks, counted on first use and then kept up to date by the writes
+        self._count = None
+        # (tag, where) -> (write generation, chunks of the filter whose home is the partition of tag),
+        # so pages at a high offset skip whole partitions without reading their ids again
+        self._home_counts = {}
+        self._generation = 0
+
+        for tag in tags:
+            self._partition(tag)
+        logger.info(f"Opened {len(self.partitions)} partitions")
+
+    def _partition(self, tag) -> VectorStore:
+        with self._lock:
+            if tag not in self.partitions:
+                self.partitions[tag] = self.open_partition(tag)
+            return self.partitions[tag]
+
+    def _ordered_tags(self) -> list:
+        return sorted(self.partitions, key=_partition_order)
+
+    # chunk id -> tags of the partitions holding it, for the given ids that exist
+    def _locate(self, ids: list[str], where: dict = None) -> dict:
+        located = {}
+        for tag in self._ordered_tags():
+            for chunk_id in self.partitions[tag].get(ids=list(ids), where=where, include=[])["ids"]:
+                located.setdefault(chunk_id, set()).add(tag)
+        return located
+
+    # where filter of the chunks matching where whose home is the partition of tag: none of the
+    # tags of the partitions before it (the untagged partition only holds chunks without tags)
+    def _home_filter(self, tag, where: dict) -> dict:
+        earlier = [] if tag is None else [t for t in self._ordered_tags() if t is not None and t < tag]
+        conditions = [{tag_key(t): {"$ne": True}} for t in earlier] + ([where] if where else [])
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    # number of chunks matching where whose home is the partition of tag (ids only are read)
+    def _home_count(self, tag, where: dict) -> int:
+        key = (tag, json.dumps(where, sort_keys=True))
+        generation, count = self._home_counts.get(key, (None, None))
+        if generation != self._generation:
+            count = len(self.partitions[tag].get(where=self._home_filter(tag, where), include=[])["ids"])
+            self._home_counts[key] = (self._generation, count)
+        return count
+
+    # --- writes ---
+
+    # routes a batch to the partitions of each chunk's tags; update=True only changes existing chunks
+    def _write(self, ids, embeddings, documents, metadatas, update: bool, replace: bool):
+        added, changed, removed, moved = {}, {}, {}, []
+        with self._lock:
+            self._generation += 1
+            located = self._locate(ids)
+            new_chunks = 0
+            for i, chunk_id in enumerate(ids):
+                meta = metadatas[i] if metadatas is not None else None
+                current = located.get(chunk_id)
+                if current is None:
+                    if update:
+                        logger.warning(f"Chunk {chunk_id} does not exist, skipping update")
+                        continue
+                    targets = chunk_partitions(meta)
+                    for tag in targets:
+                        added.setdefault(tag, []).append(i)
+                    # repeated ids of a batch are stored once
+                    located[chunk_id] = targets
+                    new_chunks += 1
+                elif not replace:
+                    logger.warning(f"Chunk {chunk_id} already exists, skipping add")
+                    continue
+                else:
+                    targets = chunk_partitions(meta) if meta is not None and "access_tags" in meta else current
+                    for tag in targets & current:
+                        changed.setdefault(tag, []).append(i)
+                    for tag in current - targets:
+                        removed.setdefault(tag, []).append(chunk_id)
+                    if targets - current:
+                        moved.append((i, next(iter(current)), targets - current))
+
+            # chunks entering a partition are copied whole: stored row merged with the given fields
+            stored = {}
+            for source in {source for _, source, _ in moved}:
+                source_ids = [ids[i] for i, tag, _ in moved if tag == source]
+                rows = self._partition(source).get(ids=source_ids, include=["embeddings", "documents", "metadatas"])
+                for j, chunk_id in enumerate(rows["ids"]):
+                    stored[chunk_id] = (rows["embeddings"][j], rows["documents"][j], rows["metadatas"][j])
+            copies = {}
+            for i, _, tags in moved:
+                embedding, document, meta = stored[ids[i]]
+                row = (
+                    embeddings[i] if embeddings is not None else embedding,
+                    documents[i] if documents is not None else document,
+                    {**meta, **(metadatas[i] if metadatas is not None else {})},
+                )
+                for tag in tags:
+                    copies.setdefault(tag, []).append((ids[i], *row))
+
+            # leave old partitions first, so a chunk is never readable with a tag it no longer has
+            for tag, tag_ids in removed.items():
+                self._partition(tag).delete(ids=tag_ids)
+            for tag in set(added) | set(copies):
+                rows = [(ids[i], embeddings[i], documents[i] if documents is not None else None,
+                         metadatas[i] if metadatas is not None else {}) for i in added.get(tag, [])]
+                rows += copies.get(tag, [])
+                tag_documents = [row[2] for row in rows]
+                self._partition(tag).add(
+                    ids=[row[0] for row in rows],
+                    embeddings=np.asarray([row[1] for row in rows], dtype=np.float32),
+                    documents=tag_documents if any(document is not None for document in tag_documents) else None,
+                    metadatas=[{key: value for key, value in row[3].items() if value is not None} for row in rows],
+                )
+            for tag, rows in changed.items():
+                write = self._partition(tag).update if update else self._partition(tag).upsert
+                write(
+                    ids=[ids[i] for i in rows],
+                    embeddings=np.asarray([embeddings[i] for i in rows], dtype=np.float32) if embeddings is not None else None,
+                    documents=[documents[i] for i in rows] if documents is not None else None,
+                    metadatas=[metadatas[i] for i in rows] if metadatas is not None else None,
+                )
+            if self._count is not None:
+                self._count += new_chunks
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self._write(ids, embeddings, documents, metadatas, update=False, replace=False)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._write(ids, embeddings, documents, metadatas, update=False, replace=True)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._write(ids, embeddings, documents, metadatas, update=True, replace=True)
+
+    def delete(self, ids=None, where=None):
+        if ids is None and not where:
+            raise ValueError("delete needs ids or a where filter")
+        with self._lock:
+            self._generation += 1
+            deleted = set()
+            # a chunk has the same metadata in each of its partitions, so it matches in all of them
+            for tag in self._ordered_tags():
+                tag_ids = self.partitions[tag].get(ids=ids, where=where, include=[])["ids"]
+                if tag_ids:
+                    self.partitions[tag].delete(ids=tag_ids)
+                    deleted.update(tag_ids)
+            if self._count is not None:
+                self._count -= len(deleted)
+
+    # --- reads ---
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = DEFAULT_GET_INCLUDE if include is None else include
+        with self._lock:
+            if ids is not None:
+                selected, rows = self._get_ids(ids, where, include)
+                start = offset or 0
+                selected = selected[start:start + limit] if limit is not None else selected[start:]
+            else:
+                selected, rows = self._get_page(where, limit, offset or 0, include)
+
+        result = {"ids": selected, "included": list(include)}
+        for key in ("embeddings", "documents", "metadatas"):
+            result[key] = [rows[chunk_id][key] for chunk_id in selected] if key in include else None
+        if result["embeddings"] is not None:
+            result["embeddings"] = np.asarray(result["embeddings"], dtype=np.float32)
+        return result
+
+    # chunks by id: each id is read from the first partition holding it, partitions are asked
+    # only for the ids not found yet; returns the found ids in the given order and their rows
+    def _get_ids(self, ids, where, include) -> tuple[list, dict]:
+        rows = {}
+        for tag in self._ordered_tags():
+            missing = [chunk_id for chunk_id in dict.fromkeys(ids) if chunk_id not in rows]
+            if not missing:
+                break
+            self._collect(self.partitions[tag].get(ids=missing, where=where, include=include), include, rows)
+        return [chunk_id for chunk_id in ids if chunk_id in rows], rows
+
+    # one page of the chunks matching where: partitions in order, each read with its home filter,
+    # limit and offset; a partition exhausted by the page records its count for the next pages
+    def _get_page(self, where, limit, offset, include) -> tuple[list, dict]:
+        selected, rows = [], {}
+        for tag in self._ordered_tags():
+            if limit is not None and len(selected) >= limit:
+                break
+            key = (tag, json.dumps(where, sort_keys=True))
+            cached = self._home_counts.get(key, (None, None))
+            if offset and cached[0] == self._generation and cached[1] <= offset:
+                offset -= cached[1]
+                continue
+            wanted = None if limit is None else limit - len(selected)
+            page = self.partitions[tag].get(where=self._home_filter(tag, where), limit=wanted, offset=offset,
+                                            include=include)
+            found = len(page["ids"])
+            if found == 0 and offset:
+                offset = max(0, offset - self._home_count(tag, where))
+                continue
+            if wanted is None or found < wanted:
+                self._home_counts[key] = (self._generation, offset + found)
+            offset = 0
+            selected.extend(page["ids"])
+            self._collect(page, include, rows)
+        return selected, rows
+
+    @staticmethod
+    def _collect(result: dict, include, rows: dict):
+        for j, chunk_id in enumerate(result["ids"]):
+            rows[chunk_id] = {key: result[key][j] for key in ("embeddings", "documents", "metadatas") if key in include}
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        """
+        Nearest chunks of each query embedding, merged across partitions.
+
+        An RBAC filter (document_store.access_filter) selects the partitions of its tags, which are
+        searched without a filter; any other filter is applied in every partition.
+
+        Args:
+            query_embeddings (list[list[float]]): Query vectors.
+            n_results (int): Chunks per query embedding.
+            where (dict): ChromaDB where filter.
+            include (list[str]): Fields to return.
+        Returns:
+            dict: ChromaDB-shaped query result, nearest first.
+        """
+        include = DEFAULT_QUERY_INCLUDE if include is None else include
+        tags = filter_tags(where) if where else None
+        with self._lock:
+            if tags is None:
+                searched = list(self.partitions)
+                partition_where = where
+            else:
+                searched = [tag for tag in tags if tag in self.partitions]
+                partition_where = None
+            stores = [self.partitions[tag] for tag in searched]
+
+        # metadata and distances are needed to merge and to check the tags of every returned chunk
+        fetch = list(dict.fromkeys([*include, "metadatas", "distances"]))
+
+        def search(store):
+            return store.query(query_embeddings=query_embeddings, n_results=n_results,
+                               where=partition_where, include=fetch)
+
+        if len(stores) > 1:
+            partials = list(self._search_executor.map(search, stores))
+        else:
+            partials = [search(store) for store in stores]
+
+        keys = ("ids", "embeddings", "documents", "metadatas", "distances")
+        result = {key: [] if key == "ids" or key in include else None for key in keys}
+        for q in range(len(query_embeddings)):
+            candidates = []
+            for partial in partials:
+                for j, chunk_id in enumerate(partial["ids"][q]):
+                    candidates.append((partial["distances"][q][j], chunk_id, partial, j))
+            candidates.sort(key=lambda candidate: candidate[0])
+
+            seen = set()
+            rows = {key: [] for key in keys}
+            for distance, chunk_id, partial, j in candidates:
+                if chunk_id in seen:
+                    continue
+                if tags is not None and not tags & set(split_access_tags(partial["metadatas"][q][j].get("access_tags"))):
+                    continue
+                seen.add(chunk_id)
+                rows["ids"].append(chunk_id)
+                for key in ("embeddings", "documents", "metadatas", "distances"):
+                    if result[key] is not None:
+                        rows[key].append(partial[key][q][j])
+                if len(seen) == n_results:
+                    break
+            for key in keys:
+                if result[key] is not None:
+                    result[key].append(rows[key])
+        return {**result, "included": list(include)}
+
+    def count(self) -> int:
+        with self._lock:
+            if self._count is None:
+                self._count = sum(self._home_count(tag, None) for tag in self._ordered_tags())
+            return self._count
+
+
+# --- FUNCTION: partition_store ---
+
+# copies every chunk of an unpartitioned store into a partitioned one, one page at a time
+# returns the number of chunks copied
+def partition_store(source: VectorStore, target: PartitionedVectorStore, page_size: int = 1000) -> int:
+    # imported here: app.vector_store creates this store while app.document_store is being imported
+    from app.document_store import iter_chunk_pages
+
+    copied = 0
+    for page in iter_chunk_pages(None, include=["documents", "embeddings", "metadatas"],
+                                 page_size=page_size, collection=source):
+        target.upsert(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"],
+                      metadatas=page["metadatas"])
+        copied += len(page["ids"])
+        logger.info(f"Copied {copied} chunks into {len(target.partitions)} partitions")
+    return copied
+
+
+if __name__ == "__main__":
+    from app.vector_store import create_vector_store
+
+    print("Copying the vector store into per-access-tag partitions...")
+    copied = partition_store(create_vector_store(partitioned=False), create_vector_store(partitioned=True))
+    print(f"Copied {copied} chunks.")
@@ -0,0 +1,171 @@
+# app/pdf_extractor.py
+import hashlib
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator
+import fitz  # PyMuPDF
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.config import CHUNK_SIZE, CHUNK_OVERLAP
+
+# This module runs inside the ingestion process pool workers.
+# Keep it light: importing it must not load the embedding model or open ChromaDB.
+
+# PyMuPDF is the only PDF engine used for ingestion and tagging:
+# on a 200-page text PDF it extracts ~9x faster than LangChain's PyPDFLoader (pypdf),
+# see benchmarks/pdf_parsers.py.
+
+# RecursiveCharacterTextSplitter splits text into smaller chunks based on character count,
+splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+# number of words used by auto-tagging
+HEAD_WORDS = 100
+
+
+# --- Parsed document ---
+
+# result of decoding a PDF once; shared by auto-tagging and chunking
+# pages is empty for streamed documents, whose pages are consumed from an iterator instead
+@dataclass
+class ParsedDocument:
+    path: str
+    file_hash: str
+    head: str
+    page_count: int
+    pages: list[str] = field(default_factory=list)
+
+    @property
+    def content(self) -> str:
+        return "\n".join(self.pages)
+
+
+# sha256 of the file bytes, read in blocks
+def hash_file(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# first max_words words of the given page texts
+def text_head(pages: Iterable[str], max_words: int = HEAD_WORDS) -> str:
+    words = []
+    for page_text in pages:
+        words.extend(page_text.split())
+        if len(words) >= max_words:
+            break
+    return " ".join(words[:max_words])
+
+# decode every page of a PDF once
+def parse_pdf(pdf_path: str, file_hash: str = None) -> ParsedDocument:
+    with fitz.open(pdf_path) as doc:
+        pages = [page.get_text("text") for page in doc]
+    return ParsedDocument(
+        path=pdf_path,
+        file_hash=file_hash or hash_file(pdf_path),
+        head=text_head(pages),
+        page_count=len(pages),
+        pages=pages
+    )
+
+
+# Parse a PDF and split it into chunks
+# runs in a worker process, so the return value must be picklable
+# returns the parsed document and the list of chunk texts
+def extract_and_split(pdf_path: str, file_hash: str = None) -> dict:
+    parsed = parse_pdf(pdf_path, file_hash)
+    content = parsed.content
+
+    if not content.strip():
+        return {"document": parsed, "content_length": len(content), "chunk_texts": [], "is_empty": True}
+
+    chunk_texts = splitter.split_text(content)
+    return {"document": parsed, "content_length": len(content), "chunk_texts": chunk_texts, "is_empty": False}
+
+
+# --- Streaming extraction ---
+# generators used by the streaming ingestion mode, so a document is never held in memory as a whole
+
+# iterator over the page texts of an open PDF, used by the streaming mode
+# the pages read for the tagging head are replayed first, so each page is still decoded once
+# the PDF is closed when the last page has been read, or on close() / leaving a with block,
+# so a caller that stops early (or never reads) does not keep the file open
+class PageStream:
+    def __init__(self, doc, head_pages: list[str]):
+        self.doc = doc
+        self.head_pages = head_pages
+        self.next_page = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.doc.is_closed or self.next_page >= self.doc.page_count:
+            self.close()
+            raise StopIteration
+        page_number = self.next_page
+        self.next_page += 1
+        if page_number < len(self.head_pages):
+            return self.head_pages[page_number]
+        return self.doc[page_number].get_text("text")
+
+    def close(self):
+        if not self.doc.is_closed:
+            self.doc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# open a PDF for streaming: decodes pages only until the tagging head is complete
+# returns the parsed document (without pages) and a PageStream over every page text;
+# callers that do not read the stream to the end must close it
+def open_pdf_stream(pdf_path: str, file_hash: str = None) -> tuple[ParsedDocument, PageStream]:
+    doc = fitz.open(pdf_path)
+    try:
+        head_pages = []
+        word_count = 0
+        for page in doc:
+            page_text = page.get_text("text")
+            head_pages.append(page_text)
+            word_count += len(page_text.split())
+            if word_count >= HEAD_WORDS:
+                break
+
+        parsed = ParsedDocument(
+            path=pdf_path,
+            file_hash=file_hash or hash_file(pdf_path),
+            head=text_head(head_pages),
+            page_count=doc.page_count
+        )
+    except BaseException:
+        doc.close()
+        raise
+    return parsed, PageStream(doc, head_pages)
+
+# splits a stream of page texts into chunks
+# the last chunk of every split may continue on the next page, so it is carried over
+# and re-split together with the next page; this keeps the splitter overlap across page boundaries
+# while holding at most one chunk plus one page in memory
+def iter_chunks(pages: Iterable[str]) -> Iterator[str]:
+    carry = ""
+    for page_text in pages:
+        text = f"{carry}\n{page_text}" if carry else page_text
+        chunks = splitter.split_text(text)
+        if not chunks:
+            continue
+        yield from chunks[:-1]
+        carry = chunks[-1]
+    if carry:
+        yield carry
+
+# groups an iterator into lists of at most window_size items
+def iter_windows(items: Iterable, window_size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        window = list(islice(iterator, window_size))
+        if not window:
+            return
+        yield window
@@ -0,0 +1,189 @@
+# app/pg_vector_store.py
+# Postgres/pgvector chunk store: the same chunks as the ChromaDB collection, in a table that every
+# API host can share. RBAC is part of the similarity search itself: one SQL statement orders the
+# chunks by distance (HNSW index) and keeps the rows whose access_tags overlap (&&, GIN index)
+# the user's tags.
+#
+# Evaluation store only, not a retrieval backend: it does not implement the VectorStore interface,
+# cannot be selected with VECTOR_STORE_BACKEND, and ingestion, updates and deletes never write it.
+# It holds a snapshot of the ChromaDB collection, taken with --sync, for benchmarks/pgvector_vs_chroma.py
+# and for comparing recall and latency on real chunks; a snapshot goes stale with the next ingestion.
+# Serving from it would also need the metadata the pipeline filters on (chunk_count, per-tag keys),
+# which the table does not store.
+#
+#   python -m app.pg_vector_store --create      # extension, table and indexes
+#   python -m app.pg_vector_store --sync        # replace the table with a snapshot of the ChromaDB collection
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import ARRAY, Text, cast, delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import PGVECTOR_EF_SEARCH, PGVECTOR_ITERATIVE_SCAN
+from app.database import DocumentChunk, async_session, engine
+from app.document_store import iter_chunk_pages, split_access_tags
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# chunk metadata keys stored as columns
+METADATA_COLUMNS = ("document_id", "chunk_index", "title", "created_by", "content_hash", "chunk_hash")
+
+# rows per INSERT statement
+INSERT_BATCH_SIZE = 500
+
+
+class PgVectorStore:
+    """
+    Chunk store on Postgres with pgvector, through the async engine of app.database
+    (evaluation only, see the module comment).
+
+    Results use the ChromaDB query shape ({"ids": [[...]], "documents": [[...]], "metadatas": [[...]],
+    "distances": [[...]]}) and distances are squared L2 like the ChromaDB collection, so callers and
+    thresholds work with either store.
+
+    Args:
+        session_factory: SQLAlchemy async session factory.
+        ef_search (int): HNSW candidate list size of a search.
+        iterative_scan (str): hnsw.iterative_scan mode (pgvector >= 0.8), or None.
+    """
+
+    def __init__(self, session_factory=async_session, ef_search: int = PGVECTOR_EF_SEARCH,
+                 iterative_scan: str = PGVECTOR_ITERATIVE_SCAN):
+        if iterative_scan not in (None, "off", "strict_order", "relaxed_order"):
+            raise ValueError(f"Unknown hnsw.iterative_scan mode: {iterative_scan}")
+        self.session_factory = session_factory
+        self.ef_search = ef_search
+        self.iterative_scan = iterative_scan
+
+    async def create_schema(self, bind=engine):
+        """Create the vector extension, the document_chunks table and its indexes if missing."""
+        async with bind.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            await conn.run_sync(lambda sync_conn: DocumentChunk.__table__.create(sync_conn, checkfirst=True))
+
+    async def add(self, ids: list[str], documents: list[str], embeddings: list[list[float]], metadatas: list[dict]):
+        """
+        Insert or replace chunks.
+
+        Args:
+            ids (list[str]): Chunk ids ("{document_id}_{chunk_index}").
+            documents (list[str]): Chunk texts.
+            embeddings (list[list[float]]): Chunk vectors.
+            metadatas (list[dict]): Chunk metadata as stored in ChromaDB.
+        """
+        rows = [{
+            "id": chunk_id,
+            "content": document,
+            "embedding": list(embedding),
+            "access_tags": split_access_tags(meta.get("access_tags")),
+            **{key: meta.get(key) for key in METADATA_COLUMNS},
+        } for chunk_id, document, embedding, meta in zip(ids, documents, embeddings, metadatas)]
+
+        async with self.session_factory() as session:
+            for i in range(0, len(rows), INSERT_BATCH_SIZE):
+                statement = insert(DocumentChunk).values(rows[i:i + INSERT_BATCH_SIZE])
+                statement = statement.on_conflict_do_update(
+                    index_elements=[DocumentChunk.id],
+                    set_={column: statement.excluded[column] for column in rows[0] if column != "id"}
+                )
+                await session.execute(statement)
+            await session.commit()
+
+    async def query(self, query_embedding: list[float], user_tags: list[str], n_results: int = 5) -> dict:
+        """
+        Nearest chunks readable with any of the user's tags, in one SQL statement.
+
+        Args:
+            query_embedding (list[float]): Query vector.
+            user_tags (list[str]): Access tags of the user.
+            n_results (int): Number of chunks to return.
+        Returns:
+            dict: ChromaDB-shaped query result, nearest first.
+        """
+        result = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        if not user_tags:
+            return result
+
+        distance = DocumentChunk.embedding.l2_distance(query_embedding)
+        # every column but the embedding
+        columns = [DocumentChunk.id, DocumentChunk.content, DocumentChunk.access_tags,
+                   *[getattr(DocumentChunk, key) for key in METADATA_COLUMNS]]
+        statement = (
+            select(*columns, distance.label("distance"))
+            .where(DocumentChunk.access_tags.op("&&")(cast(list(user_tags), ARRAY(Text))))
+            .order_by(distance)
+            .limit(n_results)
+        )
+        async with self.session_factory() as session:
+            # SET LOCAL only lasts for this transaction
+            await session.execute(text(f"SET LOCAL hnsw.ef_search = {int(self.ef_search)}"))
+            if self.iterative_scan:
+                await session.execute(text(f"SET LOCAL hnsw.iterative_scan = {self.iterative_scan}"))
+            rows = (await session.execute(statement)).all()
+
+        for row in rows:
+            result["ids"][0].append(row.id)
+            result["documents"][0].append(row.content)
+            result["metadatas"][0].append({
+                **{key: getattr(row, key) for key in METADATA_COLUMNS},
+                "access_tags": ",".join(row.access_tags or []),
+            })
+            result["distances"][0].append(row.distance ** 2)
+        return result
+
+    async def delete(self, document_id: str) -> int:
+        """Delete every chunk of a document; returns the number of chunks deleted."""
+        async with self.session_factory() as session:
+            result = await session.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+            await session.commit()
+            return result.rowcount
+
+    async def clear(self) -> int:
+        """Delete every chunk; returns the number of chunks deleted."""
+        async with self.session_factory() as session:
+            result = await session.execute(delete(DocumentChunk))
+            await session.commit()
+            return result.rowcount
+
+    async def count(self) -> int:
+        async with self.session_factory() as session:
+            return (await session.execute(select(func.count()).select_from(DocumentChunk))).scalar_one()
+
+
+# --- FUNCTION: sync_from_chroma ---
+
+# replaces the pgvector store's chunks with a snapshot of the ChromaDB collection, copied one page at a time
+# (chunks deleted from ChromaDB since the last snapshot are dropped); returns the number of chunks copied
+async def sync_from_chroma(store: PgVectorStore, collection=None, page_size: int = 1000) -> int:
+    deleted = await store.clear()
+    logger.info(f"Deleted {deleted} chunks of the previous snapshot from Postgres")
+    copied = 0
+    for page in iter_chunk_pages(None, include=["documents", "embeddings", "metadatas"],
+                                 page_size=page_size, collection=collection):
+        embeddings = [e.tolist() if hasattr(e, "tolist") else e for e in page["embeddings"]]
+        await store.add(page["ids"], page["documents"], embeddings, page["metadatas"])
+        copied += len(page["ids"])
+        logger.info(f"Copied {copied} chunks to Postgres")
+    return copied
+
+
+pg_vector_store = PgVectorStore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the pgvector chunk store.")
+    parser.add_argument("--create", action="store_true", help="create the extension, table and indexes")
+    parser.add_argument("--sync", action="store_true", help="replace the table with a snapshot of the ChromaDB collection")
+    args = parser.parse_args()
+
+    async def main():
+        if args.create or args.sync:
+            await pg_vector_store.create_schema()
+        if args.sync:
+            copied = await sync_from_chroma(pg_vector_store)
+            print(f"Copied {copied} chunks, {await pg_vector_store.count()} chunks in Postgres.")
+        await engine.dispose()
+
+    asyncio.run(main())
@@ -1,8 +1,9 @@
 from app.retriever import retrieve_documents_by_filter, retrieve_context_by_search
 from langchain_core.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM as Ollama
-from app.embedder import embed_query_to_vector
-from app.vector_store import chroma_collection
+from app.embedding_service import embedding_service
+from app.rbac_retrieval import retrieve_authorized_chunks
+import asyncio
 
 # Initialize the LLM with Ollama
 llm =  Ollama(
@@ -16,18 +17,11 @@ llm =  Ollama(
 # Generate answer using RBAC-filtered ChromaDB docs
 async def generate_answer(query: str, user):
     # Embed the query
-    query_embedding = embed_query_to_vector(query)
-    # RBAC filter: only docs with matching access_tags and roles
-    filter_dict = {
-        "$or": [
-            {"access_tags": {"$in": user["access_tags"]}},
-            {"roles": {"$in": user["roles"]}}
-        ]
-    }
-    results = chroma_collection.query(
-        query_embeddings=[query_embedding],
-        n_results=5,
-        where=filter_dict
+    query_embedding = await embedding_service.embed_query(query)
+    # RBAC filter: only docs with one of the user's access_tags (per-tag metadata keys, filtered inside the query)
+    # with RETRIEVAL_MODE "hybrid", exact-term BM25 matches are fused with the nearest chunks
+    results = await asyncio.to_thread(
+        retrieve_authorized_chunks, query, query_embedding, user["access_tags"], 5
     )
     docs = results.get("documents", [[]])[0]
     context = "\n".join(docs) if docs else ""
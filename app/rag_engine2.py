@@ -2,8 +2,9 @@ import logging
 from app.retriever import retrieve_documents_by_filter, retrieve_context_by_search
 from langchain_core.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM as Ollama
-from app.embedder import embed_query_to_vector
-from app.vector_store import chroma_collection
+from app.embedding_service import embedding_service
+from app.rbac_retrieval import search_authorized_chunks
+import asyncio
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -19,12 +20,11 @@ llm = Ollama(
 async def generate_answer2(query: str, user):
     THRESHOLD = 1.0  
     logger.info(f"Received query: {query}")
-    query_embedding = embed_query_to_vector(query)
+    query_embedding = await embedding_service.embed_query(query)
     logger.info("Query embedding generated.")
-    # Broad fetch (no RBAC filter in Chroma)
-    results = chroma_collection.query(
-        query_embeddings=[query_embedding],
-        n_results=5  # get more, then filter
+    # RBAC filter in Chroma (or adaptive over-fetch): the 5 results are the nearest chunks the user may read
+    results = await asyncio.to_thread(
+        search_authorized_chunks, query_embedding, user["access_tags"], 5, THRESHOLD
     )
     logger.info(f"ChromaDB query results (first element): {results.get('documents', [[]])[0][:1]}")
     print("\n\n\n\n\n\nChromaDB results (first element):", results.get('documents', [[]])[0][:1])
@@ -2,8 +2,9 @@ import logging
 from app.retriever import retrieve_documents_by_filter, retrieve_context_by_search
 from langchain_core.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM as Ollama
-from app.embedder import embed_query_to_vector
-from app.vector_store import chroma_collection
+from app.embedding_service import embedding_service
+from app.rbac_retrieval import search_authorized_chunks
+import asyncio
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -19,13 +20,13 @@ llm = Ollama(
 async def generate_answer3(query: str, user):
     THRESHOLD = 0.6
     logger.info(f"Received query: {query}")
-    query_embedding = embed_query_to_vector(query)
+    query_embedding = await embedding_service.embed_query(query)
     logger.info("Query embedding generated.")
 
-    # Vector search in ChromaDB
-    results = chroma_collection.query(
-        query_embeddings=[query_embedding],
-        n_results=3
+    # Vector search in ChromaDB, restricted to chunks with one of the user's access tags
+    # (the prompt below still asks the LLM to check the tags)
+    results = await asyncio.to_thread(
+        search_authorized_chunks, query_embedding, user["access_tags"], 3, THRESHOLD
     )
     docs = results.get("documents", [[]])[0]
     metas = results.get("metadatas", [[]])[0]
@@ -2,8 +2,9 @@ import logging
 import json
 from langchain_core.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM as Ollama
-from app.embedder import embed_query_to_vector
-from app.vector_store import chroma_collection
+from app.embedding_service import embedding_service
+from app.document_store import query_authorized_chunks
+import asyncio
 from app.rbac_tool import rbac_filter
 from langchain.tools import tool
 from langchain.agents import initialize_agent, AgentType
@@ -37,13 +38,13 @@ agent = initialize_agent(
 
 async def generate_answer4(query: str, user):
     logger.info(f"Received query: {query}")
-    query_embedding = embed_query_to_vector(query)
+    query_embedding = await embedding_service.embed_query(query)
     logger.info("Query embedding generated.")
 
-    # Vector search in ChromaDB
-    results = chroma_collection.query(
-        query_embeddings=[query_embedding],
-        n_results=5
+    # Vector search in ChromaDB, restricted to chunks with one of the user's access tags
+    # (the agent's rbac_filter tool still checks every chunk)
+    results = await asyncio.to_thread(
+        query_authorized_chunks, query_embedding, user["access_tags"], 5
     )
     docs = results.get("documents", [[]])[0]
     metas = results.get("metadatas", [[]])[0]
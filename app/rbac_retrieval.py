@@ -0,0 +1,269 @@
+# app/rbac_retrieval.py
+import logging
+import math
+import threading
+import time
+from typing import Callable
+
+from app.access_tags import split_access_tags
+from app.config import (
+    RBAC_FILTER_MODE, RBAC_OVERFETCH_GROWTH, RBAC_OVERFETCH_MAX_K, RBAC_SELECTIVITY_SMOOTHING,
+    RETRIEVAL_MODE, HYBRID_FETCH_K, RRF_K
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SelectivityEstimator:
+    """
+    Per tag set estimate of the share of nearest chunks a user may read, plus post-filter metrics.
+
+    The estimate (exponential moving average over queries) sets the k of the next query of the
+    same tag set, so users who can read little of the collection start with a wide fetch
+    instead of widening round after round.
+
+    Args:
+        smoothing (float): Weight of the newest query in the moving average.
+    """
+
+    def __init__(self, smoothing: float = RBAC_SELECTIVITY_SMOOTHING):
+        self.smoothing = smoothing
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(tags) -> str:
+        return ",".join(sorted(set(tags)))
+
+    def selectivity(self, tags) -> float:
+        stats = self._stats.get(self.key(tags))
+        return stats["selectivity"] if stats else None
+
+    # first k for a query of this tag set: enough fetched chunks to expect n_results authorized ones
+    # without an estimate yet, start at n_results; a measured selectivity of 0 starts at max_k
+    def initial_k(self, tags, n_results: int, max_k: int) -> int:
+        selectivity = self.selectivity(tags)
+        if selectivity is None:
+            return min(n_results, max_k)
+        if selectivity == 0:
+            return max_k
+        return max(n_results, min(math.ceil(n_results / selectivity), max_k))
+
+    def record(self, tags, selectivity: float, rounds: int, fetched: int, unauthorized: int,
+               seconds: float, wasted_seconds: float):
+        with self._lock:
+            stats = self._stats.setdefault(self.key(tags), {
+                "selectivity": None, "queries": 0, "rounds": 0, "fetched": 0,
+                "unauthorized": 0, "seconds": 0.0, "wasted_seconds": 0.0
+            })
+            if selectivity is not None:
+                if stats["selectivity"] is None:
+                    stats["selectivity"] = selectivity
+                else:
+                    stats["selectivity"] += self.smoothing * (selectivity - stats["selectivity"])
+            stats["queries"] += 1
+            stats["rounds"] += rounds
+            stats["fetched"] += fetched
+            stats["unauthorized"] += unauthorized
+            stats["seconds"] += seconds
+            stats["wasted_seconds"] += wasted_seconds
+
+    def snapshot(self) -> dict:
+        """
+        Post-filter metrics per tag set.
+
+        Returns:
+            dict: {tag set: {"selectivity", "queries", "rounds", "fetched", "unauthorized",
+                   "seconds", "wasted_seconds"}}; wasted_seconds is the share of fetch time spent
+                   on chunks the user could not read.
+        """
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+
+# shared by every post-filtered query of the process
+selectivity_estimator = SelectivityEstimator()
+
+
+# --- FUNCTION: overfetch_authorized ---
+
+# post-filtered retrieval: fetches the k nearest chunks, keeps the authorized ones within threshold and
+# multiplies k by growth until n_results are kept, the k-th neighbour is past the threshold (nothing
+# closer is left), the collection is exhausted or k reached max_k
+# query(k) returns a ChromaDB query result (documents, metadatas, distances) for the k nearest chunks;
+# authorized(metadata) tells whether the user may read a chunk
+# returns a ChromaDB-shaped result holding at most n_results authorized chunks, nearest first
+def overfetch_authorized(query: Callable[[int], dict], authorized: Callable[[dict], bool], user_tags: list[str],
+                         n_results: int, threshold: float, growth: int = RBAC_OVERFETCH_GROWTH,
+                         max_k: int = RBAC_OVERFETCH_MAX_K, estimator: SelectivityEstimator = None) -> dict:
+    estimator = estimator or selectivity_estimator
+    k = estimator.initial_k(user_tags, n_results, max_k)
+    rounds = fetched = unauthorized = 0
+    seconds = wasted_seconds = 0.0
+    while True:
+        started = time.perf_counter()
+        result = query(k)
+        round_seconds = time.perf_counter() - started
+        rounds += 1
+
+        ids = result["ids"][0]
+        metadatas = result["metadatas"][0]
+        distances = result["distances"][0]
+        allowed = [authorized(meta) for meta in metadatas]
+        kept = [i for i, ok in enumerate(allowed) if ok and distances[i] <= threshold]
+
+        denied = len(ids) - sum(allowed)
+        fetched += len(ids)
+        unauthorized += denied
+        seconds += round_seconds
+        if ids:
+            wasted_seconds += round_seconds * denied / len(ids)
+
+        if (len(kept) >= n_results or len(ids) < k or k >= max_k
+                or (distances and distances[-1] > threshold)):
+            break
+        k = min(k * growth, max_k)
+
+    selectivity = (len(ids) - denied) / len(ids) if ids else None
+    estimator.record(user_tags, selectivity, rounds, fetched, unauthorized, seconds, wasted_seconds)
+    logger.info(
+        f"[RBAC] post-filter: {len(kept)} authorized of {len(ids)} fetched (k={k}, {rounds} rounds), "
+        f"{unauthorized} unauthorized chunks fetched, {wasted_seconds * 1000:.1f} ms wasted"
+    )
+
+    kept = kept[:n_results]
+    return {
+        key: [[result[key][0][i] for i in kept]]
+        for key in ("ids", "documents", "metadatas", "distances") if result.get(key)
+    }
+
+
+# --- FUNCTION: search_authorized_chunks ---
+
+# nearest chunks the user may read, with the RBAC_FILTER_MODE of the deployment:
+# "prefilter" filters inside the vector query (document_store.query_authorized_chunks),
+# "postfilter" over-fetches and filters after (overfetch_authorized)
+# returns a ChromaDB-shaped result (ids, documents, metadatas, distances)
+def search_authorized_chunks(query_embedding: list[float], user_tags: list[str], n_results: int,
+                             threshold: float, mode: str = RBAC_FILTER_MODE, collection=None) -> dict:
+    from app.document_store import query_authorized_chunks
+    from app.vector_store import vector_store
+
+    collection = collection if collection is not None else vector_store
+    if mode == "prefilter":
+        return query_authorized_chunks(query_embedding, user_tags, n_results, collection=collection)
+    if mode != "postfilter":
+        raise ValueError(f"Unknown RBAC filter mode: {mode}")
+
+    user_set = set(user_tags or [])
+    if not user_set:
+        return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+    return overfetch_authorized(
+        lambda k: collection.query(
+            query_embeddings=[query_embedding], n_results=k, include=["metadatas", "documents", "distances"]
+        ),
+        lambda meta: bool(user_set & set(split_access_tags(meta.get("access_tags")))),
+        list(user_set), n_results, threshold
+    )
+
+
+# --- FUNCTION: reciprocal_rank_fusion ---
+
+# merges rankings (lists of chunk ids, best first): score(id) = sum over rankings of 1 / (k + rank), rank from 1
+# returns [(chunk_id, score)], best first; ties keep the order of first appearance
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+# --- FUNCTION: hybrid_search_authorized_chunks ---
+
+# vector and BM25 retrieval under the same RBAC filter, merged by reciprocal rank fusion
+# the vector ranking holds the fetch_k nearest authorized chunks, the lexical ranking the fetch_k best
+# BM25 matches among the chunks readable with the user's tags
+# chunks found only lexically are read from the vector store, their distance computed and their tags checked again
+# threshold (squared L2, None: no threshold) applies to every fused chunk, lexical matches included,
+# so a caller's distance cutoff holds in both retrieval modes
+# returns a ChromaDB-shaped result (ids, documents, metadatas, distances) plus "scores" (fused), best first
+def hybrid_search_authorized_chunks(query: str, query_embedding: list[float], user_tags: list[str], n_results: int,
+                                    threshold: float = None, fetch_k: int = HYBRID_FETCH_K, rrf_k: int = RRF_K,
+                                    mode: str = RBAC_FILTER_MODE, collection=None, index=None) -> dict:
+    from app.vector_search import squared_l2_distances
+    from app.vector_store import vector_store, lexical_index
+
+    collection = collection if collection is not None else vector_store
+    index = index if index is not None else lexical_index
+    result = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]], "scores": [[]]}
+    user_set = set(user_tags or [])
+    if not user_set:
+        return result
+
+    vector = search_authorized_chunks(query_embedding, user_tags, max(fetch_k, n_results),
+                                      math.inf if threshold is None else threshold, mode, collection)
+    rows = {
+        chunk_id: (document, meta, distance)
+        for chunk_id, document, meta, distance in zip(
+            vector["ids"][0], vector["documents"][0], vector["metadatas"][0], vector["distances"][0]
+        )
+        if threshold is None or distance <= threshold
+    }
+    started = time.perf_counter()
+    lexical = index.search(query, user_tags, max(fetch_k, n_results)) if index is not None else []
+    lexical_seconds = time.perf_counter() - started
+
+    fused = reciprocal_rank_fusion([list(rows), [chunk_id for chunk_id, _ in lexical]], rrf_k)
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in rows]
+    if missing:
+        stored = collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+        if stored["ids"]:
+            distances = squared_l2_distances(query_embedding, stored["embeddings"])
+            for chunk_id, document, meta, distance in zip(stored["ids"], stored["documents"], stored["metadatas"], distances):
+                rows[chunk_id] = (document, meta, float(distance))
+
+    for chunk_id, score in fused:
+        if chunk_id not in rows:
+            continue
+        document, meta, distance = rows[chunk_id]
+        if threshold is not None and distance > threshold:
+            continue
+        if not user_set & set(split_access_tags(meta.get("access_tags"))):
+            logger.warning(f"[RBAC] hybrid: lexical match {chunk_id} is not readable with {sorted(user_set)}, skipping")
+            continue
+        for key, value in (("ids", chunk_id), ("documents", document), ("metadatas", meta),
+                           ("distances", distance), ("scores", score)):
+            result[key][0].append(value)
+        if len(result["ids"][0]) == n_results:
+            break
+
+    vector_ids = set(vector["ids"][0])
+    lexical_ids = {chunk_id for chunk_id, _ in lexical}
+    logger.info(
+        f"[RBAC] hybrid: {len(vector_ids)} vector + {len(lexical_ids)} lexical candidates "
+        f"({len(vector_ids & lexical_ids)} in both), lexical lookup {lexical_seconds * 1e6:.0f} us, "
+        f"{len(result['ids'][0])} chunks returned"
+    )
+    return result
+
+
+# --- FUNCTION: retrieve_authorized_chunks ---
+
+# the chunks a RAG engine puts in its prompt, with the RETRIEVAL_MODE of the deployment:
+# "vector": nearest authorized chunks within threshold (search_authorized_chunks)
+# "hybrid": vector and BM25 rankings fused (hybrid_search_authorized_chunks)
+# threshold (squared L2, None: no threshold) applies to every returned chunk in both modes
+# returns a ChromaDB-shaped result (ids, documents, metadatas, distances), best first
+def retrieve_authorized_chunks(query: str, query_embedding: list[float], user_tags: list[str], n_results: int,
+                               threshold: float = None, retrieval_mode: str = RETRIEVAL_MODE) -> dict:
+    if retrieval_mode == "hybrid":
+        return hybrid_search_authorized_chunks(query, query_embedding, user_tags, n_results, threshold)
+    if retrieval_mode != "vector":
+        raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+
+    result = search_authorized_chunks(query_embedding, user_tags, n_results,
+                                      math.inf if threshold is None else threshold)
+    kept = [i for i, distance in enumerate(result["distances"][0]) if threshold is None or distance <= threshold]
+    return {key: [[result[key][0][i] for i in kept]] for key in ("ids", "documents", "metadatas", "distances")}
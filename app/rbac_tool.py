@@ -1,5 +1,6 @@
 from typing import List, Dict
-from app.vector_store import chroma_collection
+from app.rbac_retrieval import retrieve_authorized_chunks
+from app.embedding_service import embedding_service
 import logging
 import asyncio
 
@@ -10,7 +11,12 @@ THRESHOLD = 1.0
 
 async def rbac_filter(query: str, user) -> List[Dict[str, str]]:
     """
-    Filters Chroma search results using access_tags from user metadata.
+    Searches Chroma for the chunks the user is authorized to read.
+
+    The access_tags of the user are a where filter of the vector query itself (or, with
+    RBAC_FILTER_MODE "postfilter", k is widened until 5 authorized chunks are found),
+    so the 5 neighbours returned are the 5 nearest authorized chunks within THRESHOLD.
+    With RETRIEVAL_MODE "hybrid" they are fused with the best BM25 matches under the same filter.
     
     Args:
         query (str): User's question/query.
@@ -21,11 +27,12 @@ async def rbac_filter(query: str, user) -> List[Dict[str, str]]:
     """
     logger.info(f"[RBACFilter] Running for query: '{query}' and user tags: {user.get('access_tags')}")
 
-    # Search similar docs from ChromaDB
-    search_results = chroma_collection.query(
-        query_texts=[query],
-        n_results=5,
-        include=["metadatas", "documents", "distances"]
+    # Search similar authorized docs from ChromaDB
+    # the query is embedded with the same model as the stored chunks, batched with concurrent queries
+    query_embedding = await embedding_service.embed_query(query)
+    # THRESHOLD is applied during retrieval, to the BM25 matches of RETRIEVAL_MODE "hybrid" as well
+    search_results = await asyncio.to_thread(
+        retrieve_authorized_chunks, query, query_embedding, user.get("access_tags", []), 5, THRESHOLD
     )
 
     docs = search_results["documents"][0]      # List[str]
@@ -40,13 +47,11 @@ async def rbac_filter(query: str, user) -> List[Dict[str, str]]:
         
         logger.info(f"\nDoc {i} preview: {doc[:100]}...\nTags - Doc: {doc_tags} | User: {user_tags} | Score: {score}")
 
-        if score <= THRESHOLD:
-            if doc_tags & user_tags:
-                context_parts.append({"content": doc})  # ✅ wrap in dict
-            else:
-                logger.info(f"[RBACFilter] Doc {i} access_tags {doc_tags} do not match user tags {user_tags}, skipping.")
+        # already enforced by the query filter; kept as a safety net
+        if doc_tags & user_tags:
+            context_parts.append({"content": doc})  # ✅ wrap in dict
         else:
-            logger.info(f"[RBACFilter] Doc {i} distance score {score:.2f} exceeds threshold ({THRESHOLD}), skipping.")
+            logger.warning(f"[RBACFilter] Doc {i} access_tags {doc_tags} do not match user tags {user_tags}, skipping.")
 
     logger.info(f"[RBACFilter] Authorized context parts: {len(context_parts)} / {len(docs)}")
     return context_parts
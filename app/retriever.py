@@ -1,12 +1,10 @@
 # app/retriever.py
 
 from app.auth import get_current_user
-from app.database import get_documents_by_filter
 from fastapi import Depends, HTTPException
-from app.embedder import embed_query_to_vector, embed_doc 
-from langchain_community.vectorstores import Chroma
-from app.vector_store import chroma_client
-import uuid
+from app.embedding_service import embedding_service, QUERY_PRIORITY
+from app.vector_search import top_k_nearest
+import numpy as np
 
 # Function to retrieve documents based on the current user’s roles, departments, and access tags
 # RBAC and data-level access filtering
@@ -22,6 +20,9 @@ async def retrieve_documents_by_filter(user=Depends(get_current_user)):
     }
 
     # Fetch documents from database with RBAC filters
+    # imported here: get_documents_by_filter is currently disabled in app.database,
+    # and a module-level import would break every module importing this one
+    from app.database import get_documents_by_filter
     documents = await get_documents_by_filter(user_filters)
 
     return documents
@@ -29,39 +30,22 @@ async def retrieve_documents_by_filter(user=Depends(get_current_user)):
 # Function to retrieve context by searching through filtered documents
 # This function performs semantic search on the filtered documents based on the user's query
 # returns empty string if no documents are found
-# temporarily creates a collection in ChromaDB to perform the search
-# temp_collection stores the filtered documents and their embeddings
+# the filtered documents are scored in memory: their vectors come from the embedding service,
+# which reads texts embedded before from the persistent embedding cache and only embeds new ones,
+# and the top K are selected with argpartition (no temporary ChromaDB collection)
 # Function returns a context string which is a concatenation of the top K documents
-async def retrieve_context_by_search(query:str, filtered_docs):
+async def retrieve_context_by_search(query:str, filtered_docs, top_k: int = 5):
     if not filtered_docs:
         return ""
 
-    query_vector = embed_query_to_vector(query)
+    query_vector = await embedding_service.embed_query(query)
 
     doc_texts = [doc["content"] for doc in filtered_docs]
-    doc_ids = [f"temp_{i}" for i in range(len(filtered_docs))]
-    doc_embeddings = embed_doc(doc_texts)
+    doc_embeddings = await embedding_service.embed_documents(doc_texts, priority=QUERY_PRIORITY)
 
-    temp_collection_name = f"temp_filtered_context_{uuid.uuid4()}"
-    temp_collection = chroma_client.get_or_create_collection(temp_collection_name)
+    # semantic similarity search, same distance as the ChromaDB collection (squared L2)
+    nearest, _ = top_k_nearest(query_vector, np.asarray(doc_embeddings, dtype=np.float32), top_k)
 
-    # Add documents to the temporary collection
-    temp_collection.add(
-        documents=doc_texts,
-        embeddings=doc_embeddings,
-        ids=doc_ids
-    )
-
-    # semantic similarity search
-    result = temp_collection.query(
-        query_embeddings=[query_vector],
-        n_results=5,  # Top K documents
-        include=["documents"]
-    )
-
-    # Clean up: delete the temp collection
-    chroma_client.delete_collection(temp_collection_name)
-
-    top_docs = result.get("documents", [[]])[0]
+    top_docs = [doc_texts[i] for i in nearest]
     context_string = "\n".join(top_docs)
     return context_string
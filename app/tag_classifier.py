@@ -0,0 +1,133 @@
+# app/tag_classifier.py
+import logging
+import os
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Local access-tag classifier working on the chunk embeddings computed during ingestion.
+# Each tag has a prototype: the normalised mean of the document vectors of its labelled documents,
+# a document vector being the normalised mean of its chunk embeddings. A document is scored by cosine
+# similarity to every prototype, and a softmax over similarity / temperature gives the confidence.
+# Train it with fine_tuning/train_tag_classifier.py.
+
+
+# L2-normalises the rows of a matrix (or a single vector)
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+class PrototypeTagClassifier:
+    """
+    Nearest-prototype classifier over embedding vectors.
+
+    Args:
+        tags (list[str]): Tag of each prototype row.
+        prototypes (np.ndarray): One unit vector per tag, shape (len(tags), dim).
+        temperature (float): Softmax temperature applied to cosine similarities.
+        model_name (str): Embedding model (and backend) the prototypes were built with.
+    """
+
+    def __init__(self, tags: list[str], prototypes: np.ndarray, temperature: float, model_name: str = None):
+        self.tags = list(tags)
+        self.prototypes = normalize_rows(prototypes)
+        self.temperature = temperature
+        self.model_name = model_name
+
+    # document vector: normalised mean of the normalised chunk embeddings
+    @staticmethod
+    def document_vector(chunk_embeddings) -> np.ndarray:
+        return normalize_rows(normalize_rows(chunk_embeddings).mean(axis=0))
+
+    @classmethod
+    def train(cls, documents: list[tuple[str, np.ndarray]], temperature: float,
+              model_name: str = None) -> "PrototypeTagClassifier":
+        """
+        Build one prototype per tag.
+
+        Args:
+            documents (list[tuple]): (tag, chunk embeddings of the document) pairs.
+            temperature (float): Softmax temperature of the trained classifier.
+            model_name (str): Embedding model the chunk embeddings come from.
+        Returns:
+            PrototypeTagClassifier: The trained classifier.
+        """
+        by_tag = {}
+        for tag, chunk_embeddings in documents:
+            by_tag.setdefault(tag, []).append(cls.document_vector(chunk_embeddings))
+        tags = sorted(by_tag)
+        prototypes = np.stack([normalize_rows(np.mean(by_tag[tag], axis=0)) for tag in tags])
+        return cls(tags, prototypes, temperature, model_name)
+
+    # tag probabilities of each row of vectors, shape (len(vectors), len(tags))
+    def predict_proba(self, vectors) -> np.ndarray:
+        logits = normalize_rows(np.atleast_2d(vectors)) @ self.prototypes.T / self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    # best tag and its probability for each row of vectors
+    def predict(self, vectors) -> tuple[list[str], np.ndarray]:
+        probabilities = self.predict_proba(vectors)
+        best = probabilities.argmax(axis=1)
+        return [self.tags[i] for i in best], probabilities[np.arange(len(best)), best]
+
+    # best tag and its probability for a whole document
+    def classify_document(self, chunk_embeddings) -> tuple[str, float]:
+        tags, confidences = self.predict(self.document_vector(chunk_embeddings))
+        return tags[0], float(confidences[0])
+
+    # best tag and its probability for every chunk of a document, in one pass over the embedding matrix
+    # with smoothing > 0, a chunk's probabilities are averaged with those of the `smoothing` chunks
+    # on each side (by chunk_index), so isolated outliers inside a section follow their neighbours
+    def classify_chunks(self, chunk_embeddings, smoothing: int = 0) -> tuple[list[str], np.ndarray]:
+        probabilities = self.predict_proba(chunk_embeddings)
+        if smoothing > 0 and len(probabilities) > 1:
+            n = len(probabilities)
+            cumulative = np.vstack([np.zeros((1, probabilities.shape[1])), np.cumsum(probabilities, axis=0)])
+            low = np.clip(np.arange(n) - smoothing, 0, n)
+            high = np.clip(np.arange(n) + smoothing + 1, 0, n)
+            probabilities = (cumulative[high] - cumulative[low]) / (high - low)[:, None]
+        best = probabilities.argmax(axis=1)
+        return [self.tags[i] for i in best], probabilities[np.arange(len(best)), best]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            tags=np.array(self.tags),
+            prototypes=self.prototypes,
+            temperature=np.array(self.temperature),
+            model_name=np.array(self.model_name or "")
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PrototypeTagClassifier":
+        with np.load(path) as data:
+            return cls(
+                [str(tag) for tag in data["tags"]],
+                data["prototypes"],
+                float(data["temperature"]),
+                str(data["model_name"]) or None
+            )
+
+
+# --- FUNCTION: load_tag_classifier ---
+
+# loads the trained classifier, or returns None when there is none
+# or when it was trained on the embeddings of another model than model_name
+def load_tag_classifier(path: str, model_name: str = None) -> PrototypeTagClassifier:
+    if not path or not os.path.exists(path):
+        logger.info(f"No tag classifier at {path}, auto-tagging falls back to the LLM.")
+        return None
+    classifier = PrototypeTagClassifier.load(path)
+    if model_name and classifier.model_name and classifier.model_name != model_name:
+        logger.warning(
+            f"Tag classifier {path} was trained on {classifier.model_name} embeddings, not {model_name}; ignoring it."
+        )
+        return None
+    logger.info(f"Loaded tag classifier {path} ({', '.join(classifier.tags)})")
+    return classifier
@@ -8,7 +8,7 @@ import os
 import asyncio
 import uvicorn
 import logging
-from app.auto_tagging import extract_pdf_text, build_prompt, call_ollama
+from app.auto_tagging import extract_pdf_text, auto_tag_pdf
 
 app = FastAPI()
 
@@ -35,10 +35,8 @@ async def upload_pdfs(files: List[UploadFile] = File(...)):
             text = extract_pdf_text(tmp_path)
             logger.info(f"Extracted text from {file.filename}, length: {len(text)}")
             
-            prompt = build_prompt(text)
-            logger.info(f"Built prompt for {file.filename}")
-            
-            tags = await call_ollama(prompt)
+            tag = await auto_tag_pdf(tmp_path)
+            tags = [tag]
             logger.info(f"Received tags for {file.filename}: {tags}")
 
             results[file.filename] = tags
@@ -0,0 +1,35 @@
+# app/vector_search.py
+import numpy as np
+
+
+# squared L2 distances (ChromaDB's default "l2" space) between query and every row of matrix
+# |m - q|^2 = |m|^2 - 2 m.q + |q|^2: one matrix-vector product; pass the row norms |m|^2 when they are kept
+def squared_l2_distances(query, matrix, norms=None) -> np.ndarray:
+    query = np.asarray(query, dtype=np.float32)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if norms is None:
+        norms = np.einsum("ij,ij->i", matrix, matrix)
+    distances = norms - 2 * (matrix @ query) + query @ query
+    return np.maximum(distances, 0, out=distances)
+
+
+# indices of the k smallest distances, smallest first; argpartition selects them in O(n), only those k are sorted
+# infinite distances (excluded rows) are never returned
+def top_k_indices(distances: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, int(np.isfinite(distances).sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    nearest = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+    return nearest[np.argsort(distances[nearest], kind="stable")]
+
+
+# --- FUNCTION: top_k_nearest ---
+
+# indices and squared L2 distances of the k rows of matrix nearest to query, nearest first
+def top_k_nearest(query, matrix, k: int) -> tuple[np.ndarray, np.ndarray]:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim != 2 or not len(matrix) or k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    distances = squared_l2_distances(query, matrix)
+    nearest = top_k_indices(distances, k)
+    return nearest, distances[nearest]
@@ -1,5 +1,11 @@
+import os
 import chromadb
 
+from app.config import (
+    VECTOR_STORE_BACKEND, NUMPY_STORE_DIR, VECTOR_STORE_PARTITION_BY_TAG, LEXICAL_INDEX_ENABLED, LEXICAL_INDEX_DIR
+)
+from app.vector_store_interface import ChromaVectorStore
+
 # create a persistent ChromaDB client
 # PersistentClient allows for storing data on disk
 # This client will store the vector embeddings and metadata in a local directory
@@ -9,3 +15,41 @@ chroma_client = chromadb.PersistentClient(path="./chroma_store")
 # chroma_collection is the collection where documents and their embeddings will be stored
 chroma_collection = chroma_client.get_or_create_collection(name="documents")
 
+
+# --- FUNCTION: create_vector_store ---
+
+# the store selected by VECTOR_STORE_BACKEND ("chroma" or "numpy"), see app/vector_store_interface.py
+# partitioned: one store per access tag (ChromaDB collections documents_tag_<tag>, or NumPy stores
+# in NUMPY_STORE_DIR/partitions), see app/partitioned_vector_store.py
+def create_vector_store(backend: str = VECTOR_STORE_BACKEND, partitioned: bool = VECTOR_STORE_PARTITION_BY_TAG):
+    if backend not in ("chroma", "numpy"):
+        raise ValueError(f"Unknown vector store backend: {backend}")
+    if backend == "numpy":
+        from app.numpy_vector_store import NumpyVectorStore
+    if not partitioned:
+        return ChromaVectorStore(chroma_collection) if backend == "chroma" else NumpyVectorStore(NUMPY_STORE_DIR)
+
+    from app.partitioned_vector_store import PartitionedVectorStore, partition_name, partition_tags
+    if backend == "chroma":
+        names = [c if isinstance(c, str) else c.name for c in chroma_client.list_collections()]
+        return PartitionedVectorStore(
+            lambda tag: ChromaVectorStore(chroma_client.get_or_create_collection(name=partition_name(tag))),
+            partition_tags(names)
+        )
+    partitions_dir = os.path.join(NUMPY_STORE_DIR, "partitions")
+    names = os.listdir(partitions_dir) if os.path.isdir(partitions_dir) else []
+    return PartitionedVectorStore(
+        lambda tag: NumpyVectorStore(os.path.join(partitions_dir, partition_name(tag))),
+        partition_tags(names)
+    )
+
+
+# vector_store is the store that ingestion, document_store and retrieval read and write
+vector_store = create_vector_store()
+
+# lexical_index is the BM25 index of the chunk texts, kept in step with every write to vector_store
+lexical_index = None
+if LEXICAL_INDEX_ENABLED:
+    from app.lexical_index import LexicalIndex, LexicalIndexedStore
+    lexical_index = LexicalIndex(LEXICAL_INDEX_DIR)
+    vector_store = LexicalIndexedStore(vector_store, lexical_index)
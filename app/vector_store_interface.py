@@ -0,0 +1,81 @@
+# app/vector_store_interface.py
+# The vector store contract used by ingestion, document_store and retrieval.
+#
+# It is the subset of the ChromaDB collection API the application relies on, so call sites and
+# results keep one shape whichever store is configured (VECTOR_STORE_BACKEND, see app/vector_store.py):
+#   get()   -> {"ids": [...], "documents": [...], "metadatas": [...], "embeddings": [...]}
+#   query() -> the same keys with one list per query embedding, plus "distances" (squared L2)
+# where filters use the ChromaDB syntax: {"key": value}, {"key": {"$eq" | "$ne" | "$gt" | "$gte" |
+# "$lt" | "$lte" | "$in" | "$nin": value}}, {"$and": [...]}, {"$or": [...]}.
+# Metadata updates merge with the stored keys; a None value removes a key.
+
+
+class VectorStore:
+    """Interface of a chunk store: add, upsert, update, delete by ids or filter, get, filtered top-k search."""
+
+    def add(self, ids: list[str], embeddings: list[list[float]], documents: list[str] = None,
+            metadatas: list[dict] = None):
+        """Insert new chunks; ids that already exist are left unchanged."""
+        raise NotImplementedError
+
+    def upsert(self, ids: list[str], embeddings: list[list[float]], documents: list[str] = None,
+               metadatas: list[dict] = None):
+        """Insert new chunks and replace the embedding and document of existing ones (metadata is merged)."""
+        raise NotImplementedError
+
+    def update(self, ids: list[str], embeddings: list[list[float]] = None, documents: list[str] = None,
+               metadatas: list[dict] = None):
+        """Change existing chunks; metadata is merged with the stored keys."""
+        raise NotImplementedError
+
+    def delete(self, ids: list[str] = None, where: dict = None):
+        """Delete chunks by id, by metadata filter, or both (chunks matching both)."""
+        raise NotImplementedError
+
+    def get(self, ids: list[str] = None, where: dict = None, limit: int = None, offset: int = None,
+            include: list[str] = None) -> dict:
+        """Chunks by id and/or filter, in a stable order, paginated with limit/offset."""
+        raise NotImplementedError
+
+    def query(self, query_embeddings: list[list[float]], n_results: int = 10, where: dict = None,
+              include: list[str] = None) -> dict:
+        """The n_results nearest chunks of each query embedding among the chunks matching where."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    VectorStore over a ChromaDB collection.
+
+    Args:
+        collection: ChromaDB collection.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        self.collection.update(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        kwargs = {"include": include} if include is not None else {}
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset, **kwargs)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        kwargs = {"include": include} if include is not None else {}
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where, **kwargs)
+
+    def count(self) -> int:
+        return self.collection.count()
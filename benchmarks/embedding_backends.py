@@ -0,0 +1,109 @@
+# benchmarks/embedding_backends.py
+# Compares the ONNX embedding backend with the PyTorch one (HuggingFaceEmbeddings):
+#   parity     -> cosine similarity between the two backends' vectors for the same texts
+#   throughput -> texts/sec of each backend per batch size
+#
+# Export the ONNX model first:  python -m app.onnx_embedder
+# Then run:                     python benchmarks/embedding_backends.py [--pdf-dir DIR] [--json out.json]
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import glob
+import json
+import random
+import time
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+from app.config import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR, ONNX_NUM_THREADS
+from app.onnx_embedder import OnnxEmbeddings
+from app.pdf_extractor import extract_and_split
+
+VOCAB = (
+    "employee leave policy payroll server access network budget review quarterly report manager "
+    "office security incident password vacation benefits salary onboarding training compliance audit "
+    "the of and to in for with on is are was will be by this that from"
+).split()
+
+
+# chunk texts from the PDFs in pdf_dir, or synthetic chunk-sized texts
+def load_texts(pdf_dir: str, count: int) -> list[str]:
+    texts = []
+    if pdf_dir:
+        for path in sorted(glob.glob(os.path.join(pdf_dir, "**", "*.pdf"), recursive=True)):
+            texts.extend(extract_and_split(path)["chunk_texts"])
+            if len(texts) >= count:
+                break
+    rng = random.Random(0)
+    while len(texts) < count:
+        texts.append(" ".join(rng.choice(VOCAB) for _ in range(rng.randint(20, 180))))
+    return texts[:count]
+
+
+def cosine_parity(reference: list[list[float]], candidate: list[list[float]]) -> dict:
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {
+        "mean": float(cos.mean()),
+        "min": float(cos.min()),
+        "p01": float(np.percentile(cos, 1)),
+        "below_0.99": int((cos < 0.99).sum())
+    }
+
+
+def throughput(model, texts: list[str], batch_size: int, repeat: int) -> float:
+    model.embed_documents(texts[:batch_size])  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            model.embed_documents(texts[i:i + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and throughput of the torch and onnx embedding backends.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--onnx-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--threads", type=int, default=ONNX_NUM_THREADS)
+    parser.add_argument("--pdf-dir", help="take texts from the chunks of these PDFs")
+    parser.add_argument("--texts", type=int, default=512, help="number of texts")
+    parser.add_argument("--batch-sizes", default="1,8,32,64")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    texts = load_texts(args.pdf_dir, args.texts)
+    backends = {
+        "torch": HuggingFaceEmbeddings(model_name=args.model),
+        "onnx-fp32": OnnxEmbeddings(args.onnx_dir, num_threads=args.threads, quantized=False),
+        "onnx-int8": OnnxEmbeddings(args.onnx_dir, num_threads=args.threads, quantized=True),
+    }
+
+    reference = backends["torch"].embed_documents(texts)
+    results = {"model": args.model, "texts": len(texts), "parity": {}, "throughput": {}}
+    for name, model in backends.items():
+        if name != "torch":
+            results["parity"][name] = cosine_parity(reference, model.embed_documents(texts))
+        results["throughput"][name] = {
+            str(batch_size): round(throughput(model, texts, batch_size, args.repeat), 1)
+            for batch_size in map(int, args.batch_sizes.split(","))
+        }
+
+    print(f"{len(texts)} texts, model {args.model}")
+    for name, parity in results["parity"].items():
+        print(f"parity {name:10s} cosine mean={parity['mean']:.5f} min={parity['min']:.5f} "
+              f"p01={parity['p01']:.5f} below 0.99: {parity['below_0.99']}")
+    for name, by_batch in results["throughput"].items():
+        print(f"throughput {name:10s} " + "  ".join(f"bs={bs}: {tps:.1f}/s" for bs, tps in by_batch.items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
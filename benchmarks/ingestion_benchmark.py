@@ -0,0 +1,299 @@
+# benchmarks/ingestion_benchmark.py
+# Ingestion throughput benchmark on a synthetic PDF corpus, with no network access needed.
+#
+# Generates PDFs with PyMuPDF, replaces Ollama with a local stand-in, and measures:
+#   stages     -> extract+split (process pool), tagging, embedding and ChromaDB insert, each run alone
+#   end_to_end -> doc_ingestor.ingest_pdfs on the whole corpus (all stages overlapping)
+# plus pages/sec, chunks/sec and peak RSS. The benchmark runs in a temporary directory, so the stores the app
+# creates on import (./chroma_store, ./embedding_cache, ./lexical_index, ...) never touch the caller's;
+# the embedding cache is bypassed unless --use-cache is given.
+#
+#   python benchmarks/ingestion_benchmark.py --docs 20 --pages 5,50 --json results.json
+#   python benchmarks/ingestion_benchmark.py --compare results.json   # exit code 1 on a regression
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import random
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# words of the synthetic documents; KEYWORDS make the keyword tagger match, the rest never does
+FILLER = (
+    "the of and to in for with on is are was will be by this that from team quarter plan project "
+    "meeting office process request customer product service support week month call note"
+).split()
+KEYWORDS = ["payroll", "server", "invoice", "announcement"]
+
+
+# --- Corpus ---
+
+# writes docs PDFs into directory; page counts cycle through pages, a share of the documents
+# (keyword_ratio) start with a tagging keyword, the others go through the LLM stand-in
+def generate_corpus(directory: str, docs: int, pages: list[int], words_per_page: int,
+                    keyword_ratio: float, seed: int) -> list[str]:
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    paths = []
+    for i in range(docs):
+        doc = fitz.open()
+        for page_number in range(pages[i % len(pages)]):
+            words = [rng.choice(FILLER) for _ in range(words_per_page)]
+            if page_number == 0 and rng.random() < keyword_ratio:
+                words.insert(0, rng.choice(KEYWORDS))
+            # unique first words keep documents from being deduplicated by content hash
+            if page_number == 0:
+                words.insert(0, f"document-{seed}-{i}")
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(36, 36, 560, 806), " ".join(words), fontsize=7)
+        path = os.path.join(directory, f"doc_{i:04d}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+# --- Stand-ins ---
+
+class LocalLLM:
+    """Ollama stand-in: answers every tagging prompt with a fixed tag after a fixed latency."""
+
+    def __init__(self, latency: float, tag: str = "general_access"):
+        self.latency = latency
+        self.tag = tag
+        self.calls = 0
+
+    async def ainvoke(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self.tag
+
+
+class HashEmbeddings:
+    """Embedding stand-in (--fake-embedder): deterministic unit vectors derived from the text hash."""
+
+    def __init__(self, model_name: str = None, dim: int = 384, **kwargs):
+        self.model_name = model_name
+        self.dim = dim
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.sha256(t.encode("utf-8")).digest()[:8], "little"))
+            .standard_normal(self.dim) for t in texts
+        ])
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def peak_rss_mb() -> dict:
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def rate(count: float, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds else 0.0
+
+
+# --- Benchmark ---
+
+async def run_benchmark(args, paths: list[str], store_dir: str) -> dict:
+    import chromadb
+    from fastapi import UploadFile
+    import app.auto_tagging as auto_tagging
+    import app.ingestion_pipeline as ingestion_pipeline
+    from app.doc_ingestor import ingest_pdfs
+    from app.embedding_service import embedding_service
+    from app.pdf_extractor import extract_and_split
+    from app.vector_store_interface import ChromaVectorStore
+
+    llm = LocalLLM(args.llm_latency)
+    auto_tagging.llm_tagger.llm = llm
+    if not args.use_cache:
+        embedding_service.cache = None
+
+    client = chromadb.PersistentClient(path=store_dir)
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    # stage 1: extract + split in the process pool
+    start = time.perf_counter()
+    with ProcessPoolExecutor() as pool:
+        extracted = await asyncio.gather(*[loop.run_in_executor(pool, extract_and_split, path) for path in paths])
+    seconds = time.perf_counter() - start
+    pages = sum(e["document"].page_count for e in extracted)
+    chunk_texts = [text for e in extracted for text in e["chunk_texts"]]
+    results["extract_split"] = {
+        "seconds": round(seconds, 3), "pages_per_sec": rate(pages, seconds), "chunks_per_sec": rate(len(chunk_texts), seconds)
+    }
+
+    # stage 2: tagging (keyword matcher, LLM stand-in for the others); the LLM tag cache is cleared first
+    auto_tagging.llm_tagger._cache.clear()
+    start = time.perf_counter()
+    tags = await asyncio.gather(*[auto_tagging.auto_tag_pdf(e["document"]) for e in extracted])
+    seconds = time.perf_counter() - start
+    results["tagging"] = {
+        "seconds": round(seconds, 3), "docs_per_sec": rate(len(tags), seconds), "llm_calls": llm.calls
+    }
+
+    # stage 3: embedding every chunk through the embedding service
+    start = time.perf_counter()
+    embeddings = await embedding_service.embed_documents(chunk_texts)
+    seconds = time.perf_counter() - start
+    results["embedding"] = {"seconds": round(seconds, 3), "chunks_per_sec": rate(len(chunk_texts), seconds)}
+
+    # stage 4: ChromaDB insert into a scratch collection
+    collection = client.get_or_create_collection("benchmark_write")
+    start = time.perf_counter()
+    for i in range(0, len(chunk_texts), args.chroma_batch_size):
+        collection.add(
+            documents=chunk_texts[i:i + args.chroma_batch_size],
+            embeddings=embeddings[i:i + args.chroma_batch_size],
+            metadatas=[{"chunk_index": j} for j in range(i, min(i + args.chroma_batch_size, len(chunk_texts)))],
+            ids=[f"bench_{j}" for j in range(i, min(i + args.chroma_batch_size, len(chunk_texts)))]
+        )
+    seconds = time.perf_counter() - start
+    results["write"] = {"seconds": round(seconds, 3), "chunks_per_sec": rate(len(chunk_texts), seconds)}
+
+    # end to end: ingest_pdfs into an empty collection, with the LLM tag cache cleared again
+    auto_tagging.llm_tagger._cache.clear()
+    ingestion_pipeline.vector_store = ChromaVectorStore(client.get_or_create_collection("benchmark_ingest"))
+    uploads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            uploads.append(UploadFile(file=io.BytesIO(f.read()), filename=os.path.basename(path)))
+    start = time.perf_counter()
+    response = await ingest_pdfs(uploads, None, {"username": "benchmark"}, streaming=args.streaming)
+    seconds = time.perf_counter() - start
+    statuses = {}
+    for result in response["results"]:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    ingested_chunks = sum(result.get("chunks_uploaded", 0) for result in response["results"])
+
+    return {
+        "corpus": {
+            "files": len(paths),
+            "pages": pages,
+            "chunks": len(chunk_texts),
+            "megabytes": round(sum(os.path.getsize(p) for p in paths) / 1024 / 1024, 2),
+        },
+        "stages": results,
+        "end_to_end": {
+            "seconds": round(seconds, 3),
+            "files_per_sec": rate(len(paths), seconds),
+            "pages_per_sec": rate(pages, seconds),
+            "chunks_per_sec": rate(ingested_chunks, seconds),
+            "statuses": statuses,
+        },
+    }
+
+
+# metrics compared with --compare (higher is better)
+def throughput_metrics(results: dict) -> dict:
+    metrics = {f"end_to_end.{key}": results["end_to_end"][key] for key in ("pages_per_sec", "chunks_per_sec")}
+    for stage, values in results["stages"].items():
+        for key, value in values.items():
+            if key.endswith("_per_sec"):
+                metrics[f"{stage}.{key}"] = value
+    return metrics
+
+
+# metrics more than tolerance below the baseline
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    current = throughput_metrics(results)
+    for name, expected in throughput_metrics(baseline).items():
+        value = current.get(name)
+        if value is not None and expected and value < expected * (1 - tolerance):
+            regressions.append(f"{name}: {value} < {expected} (-{(1 - value / expected):.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion throughput benchmark on a synthetic PDF corpus.")
+    parser.add_argument("--docs", type=int, default=20, help="number of PDFs")
+    parser.add_argument("--pages", default="5", help="comma-separated page counts, cycled over the documents")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--keyword-ratio", type=float, default=0.5, help="share of documents tagged by keywords")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per call of the Ollama stand-in")
+    parser.add_argument("--chroma-batch-size", type=int, default=5000)
+    parser.add_argument("--streaming", action="store_true", default=None, help="force the streaming ingestion mode")
+    parser.add_argument("--fake-embedder", action="store_true", help="hash-based vectors instead of the embedding model")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="keep the embedding cache enabled (a new one, in the temporary directory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline results JSON; exit with code 1 when a throughput regresses")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop for --compare")
+    args = parser.parse_args()
+
+    if args.fake_embedder:
+        # must happen before app.embedder is imported
+        import langchain_huggingface
+        langchain_huggingface.HuggingFaceEmbeddings = HashEmbeddings
+
+    # output paths are given relative to the caller's directory
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    if args.compare:
+        args.compare = os.path.abspath(args.compare)
+
+    # the app modules create their stores in the working directory when imported (in run_benchmark):
+    # run in the temporary directory, removed at the end
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="ingestion_benchmark_")
+    os.chdir(work_dir)
+    try:
+        corpus_dir = os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir)
+        start = time.perf_counter()
+        paths = generate_corpus(corpus_dir, args.docs, [int(p) for p in args.pages.split(",")],
+                                args.words_per_page, args.keyword_ratio, args.seed)
+        generation_seconds = time.perf_counter() - start
+
+        results = asyncio.run(run_benchmark(args, paths, os.path.join(work_dir, "chroma")))
+        results["config"] = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+        results["corpus"]["generation_seconds"] = round(generation_seconds, 3)
+        results["peak_rss_mb"] = peak_rss_mb()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    corpus = results["corpus"]
+    print(f"corpus: {corpus['files']} files, {corpus['pages']} pages, {corpus['chunks']} chunks, {corpus['megabytes']} MB")
+    for stage, values in results["stages"].items():
+        print(f"  {stage:14s} " + "  ".join(f"{key}={value}" for key, value in values.items()))
+    end_to_end = results["end_to_end"]
+    print(f"  {'end_to_end':14s} seconds={end_to_end['seconds']}  pages_per_sec={end_to_end['pages_per_sec']}  "
+          f"chunks_per_sec={end_to_end['chunks_per_sec']}  statuses={end_to_end['statuses']}")
+    print(f"  peak RSS (MB): {results['peak_rss_mb']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against " + args.compare + ":\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"No regression against {args.compare} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/pdf_parsers.py
+# Text extraction speed of the PDF parsers considered for ingestion and tagging (app/pdf_extractor.py):
+#   pymupdf     -> fitz, page.get_text("text") (the parser used by app/pdf_extractor.py)
+#   pypdf       -> pypdf.PdfReader, page.extract_text()
+#   pypdfloader -> LangChain's PyPDFLoader (pypdf underneath, plus a Document per page), as used before
+# Synthetic text PDFs are written to a temporary directory; each parser reads every file --repeat times
+# and the best run is kept. Parsers whose package is not installed are skipped.
+#
+#   python benchmarks/pdf_parsers.py --pages 10 200 --json results.json
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+
+WORDS = (
+    "the of and to in for with on is are was will be by this that from team quarter plan project "
+    "meeting office process request customer product service support week month call note payroll "
+    "server invoice policy leave budget access"
+).split()
+
+
+# writes a text PDF of the given page count; returns its path
+def generate_pdf(directory: str, pages: int, words_per_page: int, seed: int) -> str:
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 560, 806), " ".join(rng.choice(WORDS) for _ in range(words_per_page)),
+                            fontsize=7)
+    path = os.path.join(directory, f"doc_{pages}_pages.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def parse_pymupdf(path: str) -> list[str]:
+    import fitz
+    with fitz.open(path) as doc:
+        return [page.get_text("text") for page in doc]
+
+
+def parse_pypdf(path: str) -> list[str]:
+    from pypdf import PdfReader
+    return [page.extract_text() for page in PdfReader(path).pages]
+
+
+def parse_pypdfloader(path: str) -> list[str]:
+    from langchain_community.document_loaders import PyPDFLoader
+    return [document.page_content for document in PyPDFLoader(path).load()]
+
+
+PARSERS = {"pymupdf": parse_pymupdf, "pypdf": parse_pypdf, "pypdfloader": parse_pypdfloader}
+
+
+# best of repeat runs: seconds, pages and extracted characters
+def time_parser(parse, path: str, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = parse(path)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return {"seconds": round(best, 4), "pages": len(pages), "characters": sum(len(text) for text in pages),
+            "pages_per_sec": round(len(pages) / best, 1) if best else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text extraction speed of the candidate PDF parsers.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 200], help="page counts of the test PDFs")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--parsers", nargs="+", default=list(PARSERS), choices=list(PARSERS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="pdf_parser_benchmark_")
+    results = {"config": {key: value for key, value in vars(args).items() if key != "json"}}
+    try:
+        for pages in args.pages:
+            path = generate_pdf(work_dir, pages, args.words_per_page, args.seed)
+            results[pages] = {}
+            for name in args.parsers:
+                try:
+                    results[pages][name] = time_parser(PARSERS[name], path, args.repeat)
+                except ImportError as e:
+                    print(f"{name}: skipped ({e})")
+            fastest = results[pages].get("pymupdf")
+            for name, r in results[pages].items():
+                speedup = f"  pymupdf is {r['seconds'] / fastest['seconds']:.1f}x faster" \
+                    if fastest and name != "pymupdf" and fastest["seconds"] else ""
+                print(f"{pages:>5d} pages  {name:12s} {r['seconds'] * 1000:9.1f} ms  "
+                      f"{r['pages_per_sec']:>8} pages/s  {r['characters']} chars{speedup}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/vector_store_backends.py
+# Latency of RBAC-filtered top-k queries (document_store.query_authorized_chunks) on each vector store
+# backend: ChromaDB (HNSW) and the in-process NumPy store (exact search), at several corpus sizes,
+# as a single store or partitioned per access tag (app/partitioned_vector_store.py).
+# Recall is measured against exact filtered search. Stores are written to temporary directories.
+#
+#   python benchmarks/vector_store_backends.py --sizes 10000 50000 100000
+#   python benchmarks/vector_store_backends.py --backends chroma chroma-partitioned --tag-weights 0.45 0.45 0.05 0.05
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import numpy as np
+
+TAGS = ["hr_only", "it_only", "finance_only", "general_access"]
+BACKENDS = ["chroma", "numpy", "chroma-partitioned", "numpy-partitioned"]
+WRITE_BATCH_SIZE = 5000
+
+
+# tag_weights: share of chunks carrying each tag of TAGS
+def generate_chunks(count: int, dim: int, clusters: int, seed: int, tag_weights: list[float] = None):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(clusters, size=count)] + 0.5 * rng.standard_normal((count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    p = np.asarray(tag_weights, dtype=float) / sum(tag_weights) if tag_weights else None
+    tags = [sorted(set(rng.choice(TAGS, size=rng.choice([1, 1, 1, 2]), replace=False, p=p))) for _ in range(count)]
+    return vectors.astype(np.float32), tags
+
+
+def percentile_ms(latencies: list[float], q: float) -> float:
+    return round(float(np.percentile(latencies, q)) * 1000, 3)
+
+
+def run_backend(store, ids, documents, vectors, metadatas, queries, user_tag_sets, expected, k) -> dict:
+    from app.document_store import query_authorized_chunks
+
+    start = time.perf_counter()
+    for i in range(0, len(ids), WRITE_BATCH_SIZE):
+        store.add(ids=ids[i:i + WRITE_BATCH_SIZE], embeddings=vectors[i:i + WRITE_BATCH_SIZE],
+                  documents=documents[i:i + WRITE_BATCH_SIZE], metadatas=metadatas[i:i + WRITE_BATCH_SIZE])
+    load_seconds = time.perf_counter() - start
+
+    latencies, recalls = [], []
+    for query, user_tags, exact in zip(queries, user_tag_sets, expected):
+        start = time.perf_counter()
+        found = query_authorized_chunks(query.tolist(), user_tags, k, collection=store)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(set(found["ids"][0]) & set(exact)) / len(exact) if exact else 1.0)
+    return {"load_seconds": round(load_seconds, 2), "recall": round(float(np.mean(recalls)), 4),
+            "p50_ms": percentile_ms(latencies, 50), "p95_ms": percentile_ms(latencies, 95)}
+
+
+def run_size(size: int, args) -> dict:
+    import chromadb
+    from app.document_store import set_access_tags
+    from app.numpy_vector_store import NumpyVectorStore
+    from app.partitioned_vector_store import PartitionedVectorStore, partition_name
+    from app.vector_search import top_k_nearest
+    from app.vector_store_interface import ChromaVectorStore
+
+    vectors, chunk_tags = generate_chunks(size, args.dim, args.clusters, args.seed, args.tag_weights)
+    ids = [f"benchmark_{i}" for i in range(size)]
+    documents = [f"chunk {i}" for i in range(size)]
+    metadatas = [set_access_tags({"document_id": "benchmark", "chunk_index": i}, ",".join(tags))
+                 for i, tags in enumerate(chunk_tags)]
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.integers(size, size=args.queries)] + 0.3 * rng.standard_normal((args.queries, args.dim))
+    user_tag_sets = [list(rng.choice(TAGS, size=rng.choice([1, 2]), replace=False)) for _ in range(args.queries)]
+    expected = []
+    for query, user_tags in zip(queries, user_tag_sets):
+        allowed = np.array([i for i, tags in enumerate(chunk_tags) if set(tags) & set(user_tags)])
+        nearest, _ = top_k_nearest(query, vectors[allowed], args.k)
+        expected.append([ids[i] for i in allowed[nearest]])
+
+    results = {}
+    for backend in args.backends:
+        store_dir = tempfile.mkdtemp(prefix=f"vector_store_benchmark_{backend}_")
+        try:
+            if backend.startswith("chroma"):
+                client = chromadb.PersistentClient(path=store_dir)
+                open_store = lambda name: ChromaVectorStore(client.get_or_create_collection(name))
+            else:
+                open_store = lambda name: NumpyVectorStore(os.path.join(store_dir, name), dim=args.dim)
+            if backend.endswith("-partitioned"):
+                store = PartitionedVectorStore(lambda tag: open_store(partition_name(tag)))
+            else:
+                store = open_store("benchmark")
+            results[backend] = run_backend(store, ids, documents, vectors, metadatas,
+                                           queries, user_tag_sets, expected, args.k)
+        finally:
+            shutil.rmtree(store_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RBAC-filtered query latency of the vector store backends.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy"], choices=BACKENDS)
+    parser.add_argument("--tag-weights", type=float, nargs=len(TAGS), help=f"share of chunks per tag of {TAGS}")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = {"config": {key: value for key, value in vars(args).items() if key != "json"}}
+    for size in args.sizes:
+        results[size] = run_size(size, args)
+        for backend, r in results[size].items():
+            print(f"{size:>7d} chunks  {backend:18s} recall@{args.k}={r['recall']}  "
+                  f"p50={r['p50_ms']} ms  p95={r['p95_ms']} ms  load={r['load_seconds']} s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,8 @@ import json
 from collections import Counter
 
 from app.embedder import embed_query_to_vector
-from app.vector_store import chroma_collection
+from app.rbac_retrieval import retrieve_authorized_chunks
+from fine_tuning.pdf_access import pdf_access
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -19,17 +20,8 @@ logger = logging.getLogger(__name__)
 
 def get_context(query, user):
     query_embedding = embed_query_to_vector(query)
-    filter_dict = {
-        "$or": [
-            {"access_tags": {"$in": user["access_tags"]}},
-            {"roles": {"$in": user["roles"]}}
-        ]
-    }
-    results = chroma_collection.query(
-        query_embeddings=[query_embedding],
-        n_results=5,
-        where=filter_dict
-    )
+    # same retrieval as the RAG engines (RETRIEVAL_MODE, RBAC filter on the user's access tags)
+    results = retrieve_authorized_chunks(query, query_embedding, user["access_tags"], 5)
     docs = results.get("documents", [[]])[0]
     return "\n".join(docs) if docs else ""
 
@@ -45,49 +37,6 @@ test_user = {
     "access_tags": ["it_user","it_only", "general_access"],
 }
 
-pdf_access = {
-    "Data_Visualization_Guidelines.pdf": {
-        "roles": ["it_user"],
-        "access_tags": ["it_user", "it_only"]
-    },
-    "Cloud_Usage_Policy.pdf": {
-        "roles": ["it_user"],
-        "access_tags": ["it_user", "it_only"]
-    },
-    "Audit_logs_and_Trials.pdf": {
-        "roles": ["it_user"],
-        "access_tags": ["it_user", "it_only"]
-    },
-    "Performance_Review_Policy_ACME.pdf": {
-        "roles": ["hr_user"],
-        "access_tags": ["hr_only","hr_user"]
-    },
-    "Recruitment_Guidelines_ACME.pdf": {
-        "roles": ["hr_user"],
-        "access_tags": ["hr_only","hr_user"]
-    },
-    "Internship_Policy_expanded.pdf": {
-        "roles": ["hr_user"],
-        "access_tags": ["hr_only","hr_user"]
-    },
-    "Email_Etiquette_and_Collaboration_Tool_Usage.pdf": {
-        "roles": ["general_access", "it_user", "hr_user"],
-        "access_tags": ["general_access"]
-    },
-    "Long_Leave_of_Absence_Policy_ACME.pdf": {
-        "roles": ["general_access", "hr_user", "it_user"],
-        "access_tags": ["general_access"]
-    },
-    "Dress_Code_Guidelines_ACME.pdf": {
-        "roles": ["general_access", "hr_user", "it_user"],
-        "access_tags": ["general_access"]
-    },
-    "Employee_Referral_Policy_ACME.pdf": {
-        "roles": ["general_access", "hr_user", "it_user"],
-        "access_tags": ["general_access"]
-    }
-}
-
 async def evaluate_model():
     total = 0
     correct = 0
@@ -0,0 +1,45 @@
+# fine_tuning/pdf_access.py
+# access metadata of the labelled company PDFs, shared by the QA evaluation and the tag classifier training
+
+pdf_access = {
+    "Data_Visualization_Guidelines.pdf": {
+        "roles": ["it_user"],
+        "access_tags": ["it_user", "it_only"]
+    },
+    "Cloud_Usage_Policy.pdf": {
+        "roles": ["it_user"],
+        "access_tags": ["it_user", "it_only"]
+    },
+    "Audit_logs_and_Trials.pdf": {
+        "roles": ["it_user"],
+        "access_tags": ["it_user", "it_only"]
+    },
+    "Performance_Review_Policy_ACME.pdf": {
+        "roles": ["hr_user"],
+        "access_tags": ["hr_only","hr_user"]
+    },
+    "Recruitment_Guidelines_ACME.pdf": {
+        "roles": ["hr_user"],
+        "access_tags": ["hr_only","hr_user"]
+    },
+    "Internship_Policy_expanded.pdf": {
+        "roles": ["hr_user"],
+        "access_tags": ["hr_only","hr_user"]
+    },
+    "Email_Etiquette_and_Collaboration_Tool_Usage.pdf": {
+        "roles": ["general_access", "it_user", "hr_user"],
+        "access_tags": ["general_access"]
+    },
+    "Long_Leave_of_Absence_Policy_ACME.pdf": {
+        "roles": ["general_access", "hr_user", "it_user"],
+        "access_tags": ["general_access"]
+    },
+    "Dress_Code_Guidelines_ACME.pdf": {
+        "roles": ["general_access", "hr_user", "it_user"],
+        "access_tags": ["general_access"]
+    },
+    "Employee_Referral_Policy_ACME.pdf": {
+        "roles": ["general_access", "hr_user", "it_user"],
+        "access_tags": ["general_access"]
+    }
+}
@@ -0,0 +1,115 @@
+# fine_tuning/train_tag_classifier.py
+# Trains the embedding-prototype access-tag classifier used by auto-tagging (app/tag_classifier.py).
+#
+# Labels come from the pdf_access mapping (or a JSON file of {filename: tag}); the chunk embeddings
+# of each labelled document are read from ChromaDB (documents already ingested, matched by title)
+# or computed from a directory of PDFs.
+#
+#   python fine_tuning/train_tag_classifier.py                    # labelled documents already in ChromaDB
+#   python fine_tuning/train_tag_classifier.py --pdf-dir ./pdfs   # labelled PDFs on disk
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import logging
+import numpy as np
+from app.auto_tagging import ACCESS_TAGS
+from app.config import TAG_CLASSIFIER_PATH, TAG_CLASSIFIER_TEMPERATURE, TAG_CLASSIFIER_MIN_CONFIDENCE
+from app.document_store import iter_chunk_pages
+from app.embedder import embed_doc, embedding_model_id
+from app.pdf_extractor import extract_and_split
+from app.tag_classifier import PrototypeTagClassifier
+from fine_tuning.pdf_access import pdf_access
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# {filename: tag}: the access tag of each document in pdf_access that is one of ACCESS_TAGS
+def labels_from_pdf_access() -> dict:
+    labels = {}
+    for filename, access in pdf_access.items():
+        tags = [tag for tag in access["access_tags"] if tag in ACCESS_TAGS]
+        if tags:
+            labels[filename] = tags[0]
+    return labels
+
+
+# {filename: chunk embeddings} of the labelled documents stored in ChromaDB
+def embeddings_from_store(filenames: list[str]) -> dict:
+    embeddings = {}
+    for page in iter_chunk_pages({"title": {"$in": filenames}}, include=["metadatas", "embeddings"]):
+        for meta, embedding in zip(page["metadatas"], page["embeddings"]):
+            embeddings.setdefault(meta["title"], []).append(embedding)
+    return embeddings
+
+
+# {filename: chunk embeddings} of the labelled PDFs found in pdf_dir
+def embeddings_from_pdfs(pdf_dir: str, filenames: list[str]) -> dict:
+    embeddings = {}
+    for filename in filenames:
+        path = os.path.join(pdf_dir, filename)
+        if not os.path.exists(path):
+            continue
+        chunk_texts = extract_and_split(path)["chunk_texts"]
+        if chunk_texts:
+            embeddings[filename] = embed_doc(chunk_texts)
+    return embeddings
+
+
+# accuracy and confidences when each document is classified by prototypes built without it
+def leave_one_out(documents: list[tuple[str, np.ndarray]], temperature: float) -> tuple[float, list[float]]:
+    correct = 0
+    confidences = []
+    for i, (tag, chunk_embeddings) in enumerate(documents):
+        others = documents[:i] + documents[i + 1:]
+        if tag not in {other_tag for other_tag, _ in others}:
+            continue
+        classifier = PrototypeTagClassifier.train(others, temperature)
+        predicted, confidence = classifier.classify_document(chunk_embeddings)
+        correct += predicted == tag
+        confidences.append(confidence)
+    return (correct / len(confidences) if confidences else 0.0), confidences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the embedding-prototype access-tag classifier.")
+    parser.add_argument("--pdf-dir", help="embed the labelled PDFs in this directory instead of reading ChromaDB")
+    parser.add_argument("--labels", help="JSON file of {filename: access tag} replacing the pdf_access mapping")
+    parser.add_argument("--temperature", type=float, default=TAG_CLASSIFIER_TEMPERATURE)
+    parser.add_argument("--output", default=TAG_CLASSIFIER_PATH)
+    args = parser.parse_args()
+
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+    else:
+        labels = labels_from_pdf_access()
+
+    filenames = sorted(labels)
+    if args.pdf_dir:
+        embeddings = embeddings_from_pdfs(args.pdf_dir, filenames)
+    else:
+        embeddings = embeddings_from_store(filenames)
+
+    missing = [filename for filename in filenames if filename not in embeddings]
+    if missing:
+        logger.warning(f"No chunks found for {len(missing)} labelled documents: {missing}")
+    documents = [(labels[filename], np.asarray(embeddings[filename])) for filename in filenames if filename in embeddings]
+    if len({tag for tag, _ in documents}) < 2:
+        raise SystemExit("At least two tags with labelled documents are needed to train the classifier.")
+
+    accuracy, confidences = leave_one_out(documents, args.temperature)
+    confident = sum(confidence >= TAG_CLASSIFIER_MIN_CONFIDENCE for confidence in confidences)
+    print(f"{len(documents)} documents, leave-one-out accuracy {accuracy:.2%}, "
+          f"{confident}/{len(confidences)} above the {TAG_CLASSIFIER_MIN_CONFIDENCE} confidence threshold")
+
+    classifier = PrototypeTagClassifier.train(documents, args.temperature, model_name=embedding_model_id)
+    classifier.save(args.output)
+    print(f"Saved classifier for tags {classifier.tags} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -162,23 +162,55 @@ async function uploadDoc() {
 
         const data = await res.json();
 
-        let html = "";
-        if (data.results && Array.isArray(data.results)) {
-            html = "<ul>";
-            data.results.forEach(r => {
-                if (r.status === "success") {
-                    html += `<li><b>${r.filename}</b>: ✅ Uploaded (${r.chunks_uploaded} chunks)</li>`;
-                } else {
-                    html += `<li><b>${r.filename}</b>: ❌ Failed (${r.reason})</li>`;
-                }
-            });
-            html += "</ul>";
-        } else {
-            html = "Unexpected response: " + JSON.stringify(data);
+        if (!data.job_id) {
+            document.getElementById('upload-result').innerHTML = "Unexpected response: " + JSON.stringify(data);
+            return;
         }
 
-        document.getElementById('upload-result').innerHTML = html;
+        // ingestion runs in the background, poll the job until it finishes
+        document.getElementById('upload-result').innerText = "Upload queued...";
+        pollJob(data.job_id, jwt);
     } catch (err) {
         document.getElementById('upload-result').innerText = "Upload failed due to network/server error.";
     }
 }
+
+// Poll /jobs/{id} and render per-file progress until the job is done
+async function pollJob(jobId, jwt) {
+    try {
+        const res = await fetch(`${API_URL}/jobs/${jobId}`, {
+            headers: {
+                "Authorization": `Bearer ${jwt}`
+            }
+        });
+        const job = await res.json();
+
+        if (!job.files || !Array.isArray(job.files)) {
+            document.getElementById('upload-result').innerHTML = "Unexpected response: " + JSON.stringify(job);
+            return;
+        }
+
+        let html = "<ul>";
+        job.files.forEach(f => {
+            const r = f.result;
+            if (r && r.status === "success") {
+                html += `<li><b>${f.filename}</b>: ✅ Uploaded (${r.chunks_uploaded} chunks)</li>`;
+            } else if (r && r.status === "duplicate") {
+                html += `<li><b>${f.filename}</b>: ♻️ Already uploaded</li>`;
+            } else if (r) {
+                html += `<li><b>${f.filename}</b>: ❌ Failed (${r.reason})</li>`;
+            } else {
+                const total = f.chunks_total !== null ? f.chunks_total : "?";
+                html += `<li><b>${f.filename}</b>: ⏳ ${f.status} (${f.chunks_written}/${total} chunks written)</li>`;
+            }
+        });
+        html += "</ul>";
+        document.getElementById('upload-result').innerHTML = html;
+
+        if (job.status === "queued" || job.status === "running") {
+            setTimeout(() => pollJob(jobId, jwt), 1000);
+        }
+    } catch (err) {
+        document.getElementById('upload-result').innerText = "Could not read upload progress.";
+    }
+}
@@ -0,0 +1,28 @@
+from app.batch_sizer import AdaptiveBatchSizer
+
+
+def _sizer():
+    return AdaptiveBatchSizer(initial=100, min_size=10, max_size=1000, target_seconds=0.5, smoothing=1.0)
+
+
+def test_shrinks_on_slow_writes():
+    sizer = _sizer()
+    # 10 ms per item -> 50 items per 0.5 s
+    assert sizer.record(100, 1.0) == 50
+    # never below min_size
+    assert sizer.record(50, 50.0) == 10
+
+
+def test_grows_gradually_up_to_max():
+    sizer = _sizer()
+    # 0.1 ms per item would allow 5000, growth is capped at 2x per write
+    assert sizer.record(100, 0.01) == 200
+    assert sizer.record(200, 0.02) == 400
+    assert sizer.record(400, 0.04) == 800
+    assert sizer.record(800, 0.08) == 1000
+
+
+def test_empty_write_is_ignored():
+    sizer = _sizer()
+    assert sizer.record(0, 1.0) == 100
+    assert sizer.seconds_per_item is None
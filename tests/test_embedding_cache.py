@@ -0,0 +1,18 @@
+from app.embedding_cache import EmbeddingCache
+
+
+def test_instances_sharing_a_directory_share_slots_and_clock(tmp_path):
+    # two instances on the same directory stand for two processes
+    first = EmbeddingCache(str(tmp_path), "m", max_entries=3)
+    second = EmbeddingCache(str(tmp_path), "m", max_entries=3)
+
+    first.put_many(["a", "b"], [[1.0, 0.0], [2.0, 0.0]])
+    second.put_many(["c"], [[3.0, 0.0]])
+    assert second.get_many(["a"]) == [[1.0, 0.0]]
+    assert second.get_many(["b"]) == [[2.0, 0.0]]
+    assert first.get_many(["c"]) == [[3.0, 0.0]]
+
+    # "a" and "b" were used by second, "c" last by first: the eviction in second takes the oldest, "a"
+    second.put_many(["d"], [[4.0, 0.0]])
+    assert first.get_many(["a", "b", "c", "d"]) == [None, [2.0, 0.0], [3.0, 0.0], [4.0, 0.0]]
+    assert len(first) == 3
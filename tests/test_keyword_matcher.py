@@ -0,0 +1,76 @@
+import json
+import random
+
+from app.keyword_matcher import KeywordMatcher, load_keyword_patterns
+
+PATTERNS = {
+    "hr_only": ["payroll", "leave policy", "employee handbook"],
+    "it_only": ["server", "API", "VPN"],
+    "finance_only": ["tax", "balance sheet"],
+    "general_access": ["handbook", "policy"],
+}
+
+
+def test_case_insensitive_with_positions():
+    matcher = KeywordMatcher(PATTERNS)
+    text = "The VPN and the Server"
+    matches = [(m.tag, m.keyword, text[m.start:m.end]) for m in matcher.find(text)]
+    assert matches == [("it_only", "vpn", "VPN"), ("it_only", "server", "Server")]
+
+
+def test_word_boundaries():
+    matcher = KeywordMatcher(PATTERNS)
+    assert matcher.find("syntax taxonomy rapid") == []
+    assert [m.keyword for m in matcher.find("tax, api.")] == ["tax", "api"]
+
+
+def test_whitespace_runs_match_a_space():
+    matcher = KeywordMatcher(PATTERNS)
+    text = "our leave\n  policy"
+    [leave, policy] = matcher.find(text)
+    assert (leave.keyword, text[leave.start:leave.end]) == ("leave policy", "leave\n  policy")
+    assert policy.tag == "general_access"
+
+
+def test_overlapping_keywords_score_every_tag():
+    matcher = KeywordMatcher(PATTERNS)
+    scores = matcher.score("Employee Handbook: payroll and payroll dates")
+    assert scores["hr_only"].counts == {"employee handbook": 1, "payroll": 2}
+    assert scores["hr_only"].positions == [(0, 17), (19, 26), (31, 38)]
+    assert scores["general_access"].counts == {"handbook": 1}
+    assert matcher.best_tag("Employee Handbook: payroll and payroll dates") == "hr_only"
+
+
+def test_best_tag_ties_and_no_match():
+    matcher = KeywordMatcher(PATTERNS)
+    assert matcher.best_tag("nothing relevant here") is None
+    # one keyword each: more occurrences wins, then the tag listed first
+    assert matcher.best_tag("policy policy server") == "general_access"
+    assert matcher.best_tag("policy server") == "it_only"
+
+
+def test_matches_naive_scan():
+    rng = random.Random(3)
+    words = ["pay", "payroll", "roll", "tax", "taxes", "api", "balance", "sheet", "x"]
+    patterns = {"a": ["payroll", "roll", "balance sheet"], "b": ["tax", "api", "pay"]}
+    matcher = KeywordMatcher(patterns)
+    for _ in range(200):
+        tokens = [rng.choice(words) for _ in range(30)]
+        found = sorted((m.tag, m.keyword, m.start) for m in matcher.find(" ".join(tokens)))
+        expected = []
+        offset = 0
+        for i, token in enumerate(tokens):
+            for tag, keywords in patterns.items():
+                for keyword in keywords:
+                    parts = keyword.split()
+                    if tokens[i:i + len(parts)] == parts:
+                        expected.append((tag, keyword, offset))
+            offset += len(token) + 1
+        assert found == sorted(expected)
+
+
+def test_load_keyword_patterns(tmp_path):
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps({"it_only": ["kubernetes"]}))
+    matcher = KeywordMatcher(load_keyword_patterns(str(path)))
+    assert matcher.best_tag("Kubernetes cluster") == "it_only"
@@ -0,0 +1,69 @@
+from app.lexical_index import LexicalIndex, tokenize
+
+
+def make_index(path=None):
+    index = LexicalIndex(path)
+    index.add(
+        ["it_0", "it_1", "hr_0", "hr_1"],
+        ["For a High/Critical IT issue contact it-support@acme.com immediately.",
+         "Low priority IT issues are handled by the service desk within two days.",
+         "Payroll questions go to hr@acme.com, see policy HR-2023-07.",
+         "Annual leave requests need manager approval."],
+        ["it_only", "it_only", "hr_only", "hr_only,general_access"],
+    )
+    return index
+
+
+def test_tokenize_keeps_compound_terms_and_parts():
+    terms = tokenize("Contact it-support@acme.com for High/Critical issues.")
+    assert {"it-support@acme.com", "it", "support", "acme", "com", "high/critical", "high", "critical"} <= set(terms)
+    assert "for" not in terms
+
+
+def test_bm25_ranks_exact_terms_within_user_tags():
+    index = make_index()
+    assert index.search("Who should be contacted for a High/Critical IT issue?", ["it_only"], 2)[0][0] == "it_0"
+    assert [chunk_id for chunk_id, _ in index.search("hr@acme.com", ["hr_only"], 5)] == ["hr_0"]
+    # chunks outside the user's tags are never returned
+    assert index.search("payroll policy HR-2023-07", ["it_only"], 5) == []
+    assert [chunk_id for chunk_id, _ in index.search("leave approval", ["general_access"], 5)] == ["hr_1"]
+
+
+def test_remove_retag_and_reload(tmp_path):
+    index = make_index(str(tmp_path))
+    index.remove(["it_0"])
+    index.set_access_tags(["hr_0"], "finance_only")
+    index.add(["it_1"], ["Escalate critical outages to the on-call engineer."], [None])
+    index.close()
+
+    reloaded = LexicalIndex(str(tmp_path))
+    assert len(reloaded) == 3
+    assert reloaded.search("contact it-support@acme.com", ["it_only"], 5) == []
+    assert reloaded.search("critical outages", ["it_only"], 5)[0][0] == "it_1"
+    assert reloaded.search("HR-2023-07", ["hr_only"], 5) == []
+    assert reloaded.search("HR-2023-07", ["finance_only"], 5)[0][0] == "hr_0"
+
+    reloaded.snapshot()
+    reloaded.close()
+    assert LexicalIndex(str(tmp_path)).search("critical outages", ["it_only"], 5)[0][0] == "it_1"
+
+
+def test_writers_sharing_a_directory_see_each_other(tmp_path):
+    server = make_index(str(tmp_path))
+    bulk = LexicalIndex(str(tmp_path), snapshot_every=3)
+    # the second writer starts from the first one's journal
+    assert len(bulk) == 4
+    bulk.add(["fin_0"], ["Quarterly budget review for the finance team."], ["finance_only"])
+    assert server.search("quarterly budget", ["finance_only"], 5)[0][0] == "fin_0"
+
+    # the second writer has snapshotted (snapshot_every=3) and replaced the journal; the first one
+    # reloads before its next change, and nothing written by either is lost
+    server.remove(["hr_1"])
+    bulk.add(["fin_1"], ["Budget approvals above the limit need the CFO."], ["finance_only"])
+    bulk.add(["fin_2"], ["Travel expenses are reimbursed monthly."], ["finance_only"])
+    server.set_access_tags(["fin_2"], "general_access")
+    for index in (server, bulk, LexicalIndex(str(tmp_path))):
+        assert len(index) == 6
+        assert index.search("leave approval", ["general_access", "hr_only"], 5) == []
+        assert index.search("travel expenses", ["general_access"], 5)[0][0] == "fin_2"
+        assert {chunk_id for chunk_id, _ in index.search("budget", ["finance_only"], 5)} == {"fin_0", "fin_1"}
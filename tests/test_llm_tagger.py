@@ -0,0 +1,61 @@
+import asyncio
+
+from app.llm_tagger import LLMTagger, parse_tag_reply
+
+TAGS = ["hr_only", "it_only", "finance_only", "general_access"]
+
+
+def test_parse_tag_reply():
+    assert parse_tag_reply("hr_only", TAGS) == "hr_only"
+    assert parse_tag_reply(" 'IT_ONLY'.\n", TAGS) == "it_only"
+    assert parse_tag_reply("The tag is finance_only", TAGS) == "finance_only"
+    assert parse_tag_reply("hr_only or it_only", TAGS) is None
+    assert parse_tag_reply("{'access_tags': ['hr']}", TAGS) is None
+    assert parse_tag_reply("general_access_v2", TAGS) is None
+
+
+class FakeLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            return self.replies.pop(0) if self.replies else "it_only"
+        finally:
+            self.active -= 1
+
+
+def _tagger(llm, **kwargs):
+    options = dict(concurrency=2, timeout=1, retries=1, cache_size=100, fallback_tag="general_access")
+    options.update(kwargs)
+    return LLMTagger(llm, TAGS, lambda text: text, **options)
+
+
+def test_bounded_and_cached():
+    llm = FakeLLM([])
+    tagger = _tagger(llm)
+
+    async def run():
+        return await asyncio.gather(*[tagger.classify(f"head {i % 5}") for i in range(40)])
+
+    assert set(asyncio.run(run())) == {"it_only"}
+    assert llm.calls == 5
+    assert llm.peak == 2
+
+
+def test_retry_then_fallback_is_not_cached():
+    llm = FakeLLM(["no idea", "hr_only"])
+    tagger = _tagger(llm)
+    assert asyncio.run(tagger.classify("head")) == "hr_only"
+
+    llm = FakeLLM(["no idea", "still no idea", "finance_only"])
+    tagger = _tagger(llm)
+    assert asyncio.run(tagger.classify("head")) == "general_access"
+    assert asyncio.run(tagger.classify("head")) == "finance_only"
@@ -0,0 +1,52 @@
+import numpy as np
+
+from app.numpy_vector_store import NumpyVectorStore
+
+
+def make_store(path=None):
+    store = NumpyVectorStore(path, initial_capacity=2)
+    store.add(
+        ids=["a_0", "a_1", "b_0"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [0.9, 0.1]],
+        documents=["alpha", "beta", "gamma"],
+        metadatas=[{"document_id": "a", "chunk_index": 0, "tag_hr_only": True},
+                   {"document_id": "a", "chunk_index": 1, "tag_general_access": True},
+                   {"document_id": "b", "chunk_index": 0, "tag_hr_only": True}],
+    )
+    return store
+
+
+def test_filtered_query_matches_exact_search():
+    store = make_store()
+    result = store.query([[1.0, 0.0]], n_results=5, where={"tag_hr_only": True})
+    assert result["ids"] == [["a_0", "b_0"]]
+    assert result["documents"] == [["alpha", "gamma"]]
+    np.testing.assert_allclose(result["distances"][0], [0.0, 0.02], atol=1e-6)
+
+    either = {"$or": [{"tag_general_access": True}, {"document_id": {"$in": ["b"]}}]}
+    assert store.query([[0.0, 1.0]], n_results=1, where=either)["ids"] == [["a_1"]]
+    assert store.get(where={"$and": [{"document_id": "a"}, {"chunk_index": {"$gte": 1}}]})["ids"] == ["a_1"]
+
+
+def test_update_merges_metadata_and_delete_by_filter():
+    store = make_store()
+    store.update(ids=["a_0"], metadatas=[{"tag_hr_only": None, "tag_it_only": True}])
+    assert store.get(ids=["a_0"])["metadatas"] == [{"document_id": "a", "chunk_index": 0, "tag_it_only": True}]
+    assert store.get(where={"tag_hr_only": True})["ids"] == ["b_0"]
+
+    store.delete(where={"document_id": "a"})
+    assert store.count() == 1
+    assert store.query([[1.0, 0.0]], n_results=3)["ids"] == [["b_0"]]
+
+
+def test_persists_across_reopen(tmp_path):
+    store = make_store(str(tmp_path))
+    store.upsert(ids=["c_0"], embeddings=[[0.5, 0.5]], documents=["delta"], metadatas=[{"document_id": "c"}])
+    store.close()
+
+    reopened = NumpyVectorStore(str(tmp_path))
+    assert reopened.count() == 4
+    result = reopened.get(ids=["c_0"], include=["documents", "embeddings"])
+    assert result["documents"] == ["delta"]
+    np.testing.assert_allclose(result["embeddings"], [[0.5, 0.5]])
+    assert reopened.query([[0.0, 1.0]], n_results=1, where={"document_id": "a"})["ids"] == [["a_1"]]
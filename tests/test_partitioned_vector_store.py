@@ -0,0 +1,67 @@
+from app.access_tags import access_filter, set_access_tags
+from app.numpy_vector_store import NumpyVectorStore
+from app.partitioned_vector_store import PartitionedVectorStore
+
+
+class CountingStore(NumpyVectorStore):
+    def __init__(self):
+        super().__init__()
+        self.queries = 0
+
+    def query(self, *args, **kwargs):
+        self.queries += 1
+        return super().query(*args, **kwargs)
+
+
+def make_store():
+    store = PartitionedVectorStore(lambda tag: CountingStore())
+    store.add(
+        ids=["hr_0", "it_0", "both_0", "fin_0"],
+        embeddings=[[1.0, 0.0], [0.9, 0.1], [0.8, 0.2], [1.0, 0.0]],
+        documents=["hr", "it", "both", "finance"],
+        metadatas=[set_access_tags({"document_id": "a"}, "hr_only"),
+                   set_access_tags({"document_id": "b"}, "it_only"),
+                   set_access_tags({"document_id": "c"}, "hr_only,it_only"),
+                   set_access_tags({"document_id": "d"}, "finance_only")],
+    )
+    return store
+
+
+def test_rbac_query_searches_only_user_partitions_and_merges_by_distance():
+    store = make_store()
+    result = store.query([[1.0, 0.0]], n_results=3, where=access_filter(["hr_only", "it_only"]))
+    # both_0 is in two partitions but returned once
+    assert result["ids"] == [["hr_0", "it_0", "both_0"]]
+    assert result["distances"][0] == sorted(result["distances"][0])
+    assert store.partitions["finance_only"].queries == 0
+    assert store.count() == 4
+
+
+def test_tag_change_moves_chunk_between_partitions():
+    store = make_store()
+    meta = set_access_tags({}, "finance_only", previous="hr_only,it_only")
+    store.update(ids=["both_0"], metadatas=[meta])
+
+    assert "both_0" not in store.query([[0.8, 0.2]], n_results=4, where=access_filter(["hr_only", "it_only"]))["ids"][0]
+    finance = store.query([[0.8, 0.2]], n_results=1, where=access_filter(["finance_only"]))
+    assert finance["ids"] == [["both_0"]] and finance["documents"] == [["both"]]
+    assert finance["metadatas"][0][0]["document_id"] == "c" and "tag_hr_only" not in finance["metadatas"][0][0]
+
+    store.delete(where={"document_id": "c"})
+    # partitions in name order: finance_only, hr_only, it_only
+    assert store.get(include=[])["ids"] == ["fin_0", "hr_0", "it_0"]
+
+
+def test_pages_walk_partitions_and_return_each_chunk_once():
+    store = make_store()
+    full = store.get(include=["metadatas"])
+    # both_0 is in hr_only and it_only, it is read from hr_only only
+    assert full["ids"] == ["fin_0", "hr_0", "both_0", "it_0"]
+    pages = [store.get(limit=1, offset=offset, include=[])["ids"] for offset in range(5)]
+    assert pages == [["fin_0"], ["hr_0"], ["both_0"], ["it_0"], []]
+    assert store.get(limit=2, offset=1, include=[])["ids"] == ["hr_0", "both_0"]
+    # a fresh store skips earlier partitions by counting them
+    assert make_store().get(limit=2, offset=3, include=[])["ids"] == ["it_0"]
+    assert store.get(where={"document_id": {"$in": ["c", "d"]}}, include=[])["ids"] == ["fin_0", "both_0"]
+    assert store.get(ids=["it_0", "both_0", "nope"], include=["documents"])["documents"] == ["it", "both"]
+    assert store.count() == 4
@@ -0,0 +1,30 @@
+import fitz
+
+from app.pdf_extractor import open_pdf_stream
+
+
+def _write_pdf(path, page_count=4):
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        page.insert_text((72, 72), " ".join(f"page{i}word{j}" for j in range(60)))
+    doc.save(str(path))
+    doc.close()
+
+
+def test_stream_replays_head_pages_and_closes_when_exhausted(tmp_path):
+    _write_pdf(tmp_path / "a.pdf")
+    parsed, pages = open_pdf_stream(str(tmp_path / "a.pdf"), file_hash="h")
+    assert parsed.page_count == 4
+    texts = list(pages)
+    assert [text.split()[0] for text in texts] == ["page0word0", "page1word0", "page2word0", "page3word0"]
+    assert pages.doc.is_closed
+
+
+def test_stream_closed_early_releases_the_pdf(tmp_path):
+    _write_pdf(tmp_path / "a.pdf")
+    _, pages = open_pdf_stream(str(tmp_path / "a.pdf"), file_hash="h")
+    next(pages)
+    pages.close()
+    assert pages.doc.is_closed
+    assert list(pages) == []
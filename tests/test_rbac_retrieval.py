@@ -0,0 +1,78 @@
+from app.rbac_retrieval import SelectivityEstimator, overfetch_authorized
+
+# 100 chunks at increasing distance, one in every 10 readable
+CHUNKS = [{"access_tags": "hr_only" if i % 10 == 0 else "it_only"} for i in range(100)]
+
+
+def _query(calls, distance_step=0.01):
+    def query(k):
+        calls.append(k)
+        chunks = CHUNKS[:k]
+        return {
+            "ids": [[f"c{i}" for i in range(len(chunks))]],
+            "documents": [[f"doc {i}" for i in range(len(chunks))]],
+            "metadatas": [chunks],
+            "distances": [[i * distance_step for i in range(len(chunks))]],
+        }
+    return query
+
+
+def _authorized(meta):
+    return meta["access_tags"] == "hr_only"
+
+
+def test_widens_until_enough_authorized():
+    calls = []
+    estimator = SelectivityEstimator(smoothing=1.0)
+    result = overfetch_authorized(_query(calls), _authorized, ["hr_only"], 3, threshold=1.0,
+                                  growth=2, max_k=64, estimator=estimator)
+    assert result["ids"] == [["c0", "c10", "c20"]]
+    assert calls == [3, 6, 12, 24]
+    stats = estimator.snapshot()["hr_only"]
+    assert stats["rounds"] == 4
+    assert stats["unauthorized"] == 2 + 5 + 10 + 21
+    assert stats["selectivity"] == 3 / 24
+
+    # the next query of the same tag set starts at the estimated k
+    calls.clear()
+    overfetch_authorized(_query(calls), _authorized, ["hr_only"], 3, threshold=1.0,
+                         growth=2, max_k=64, estimator=estimator)
+    assert calls == [24]
+
+
+def test_tag_set_matching_nothing_starts_at_max_k():
+    calls = []
+    estimator = SelectivityEstimator(smoothing=0.5)
+    nobody = lambda meta: False
+    overfetch_authorized(_query(calls), nobody, ["finance_only"], 5, threshold=1.0,
+                         growth=2, max_k=40, estimator=estimator)
+    assert calls == [5, 10, 20, 40]
+    assert estimator.selectivity(["finance_only"]) == 0.0
+
+    calls.clear()
+    overfetch_authorized(_query(calls), nobody, ["finance_only"], 5, threshold=1.0,
+                         growth=2, max_k=40, estimator=estimator)
+    assert calls == [40]
+
+
+def test_stops_at_cap_and_threshold():
+    calls = []
+    result = overfetch_authorized(_query(calls), _authorized, ["hr_only"], 5, threshold=1.0,
+                                  growth=4, max_k=20, estimator=SelectivityEstimator())
+    assert calls == [5, 20]
+    assert result["ids"] == [["c0", "c10"]]
+
+    # nothing within the threshold past the first fetch: no widening
+    calls = []
+    result = overfetch_authorized(_query(calls, distance_step=0.5), _authorized, ["hr_only"], 3, threshold=0.6,
+                                  max_k=64, estimator=SelectivityEstimator())
+    assert calls == [3]
+    assert result["ids"] == [["c0"]]
+
+
+def test_reciprocal_rank_fusion_favours_chunks_in_both_rankings():
+    from app.rbac_retrieval import reciprocal_rank_fusion
+
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+    assert [chunk_id for chunk_id, _ in fused] == ["c", "a", "b", "d"]
+    assert fused[0][1] == 1 / 63 + 1 / 61
@@ -0,0 +1,38 @@
+import numpy as np
+
+from app.tag_classifier import PrototypeTagClassifier, load_tag_classifier
+
+
+def _classifier():
+    documents = [
+        ("hr_only", np.array([[1.0, 0.1, 0.0], [0.9, 0.0, 0.1]])),
+        ("it_only", np.array([[0.0, 1.0, 0.1], [0.1, 0.9, 0.0]])),
+    ]
+    return PrototypeTagClassifier.train(documents, temperature=0.05, model_name="test-model")
+
+
+def test_classify_document():
+    tag, confidence = _classifier().classify_document([[1.0, 0.0, 0.0], [0.8, 0.2, 0.0]])
+    assert tag == "hr_only"
+    assert confidence > 0.9
+
+
+def test_classify_chunks_with_smoothing():
+    classifier = _classifier()
+    hr, it = [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]
+    chunks = [hr, hr, it, hr, hr, it, it, it]
+    assert classifier.classify_chunks(chunks)[0] == ["hr_only"] * 2 + ["it_only"] + ["hr_only"] * 2 + ["it_only"] * 3
+    # the isolated chunk follows its neighbours, the section boundary stays
+    assert classifier.classify_chunks(chunks, smoothing=1)[0] == ["hr_only"] * 5 + ["it_only"] * 3
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "classifier.npz")
+    classifier = _classifier()
+    classifier.save(path)
+    loaded = load_tag_classifier(path, "test-model")
+    assert loaded.tags == classifier.tags
+    np.testing.assert_allclose(loaded.prototypes, classifier.prototypes)
+    # trained on other embeddings: ignored
+    assert load_tag_classifier(path, "other-model") is None
+    assert load_tag_classifier(str(tmp_path / "missing.npz")) is None
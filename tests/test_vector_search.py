@@ -0,0 +1,20 @@
+import numpy as np
+
+from app.vector_search import top_k_nearest
+
+
+def test_matches_full_sort():
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((500, 16)).astype(np.float32)
+    query = rng.standard_normal(16).astype(np.float32)
+    indices, distances = top_k_nearest(query, matrix, 7)
+
+    expected = np.argsort(((matrix - query) ** 2).sum(axis=1))[:7]
+    assert indices.tolist() == expected.tolist()
+    np.testing.assert_allclose(distances, ((matrix[expected] - query) ** 2).sum(axis=1), rtol=1e-4)
+
+
+def test_k_larger_than_rows_and_empty():
+    indices, _ = top_k_nearest([0.0, 0.0], [[3.0, 0.0], [1.0, 0.0]], 5)
+    assert indices.tolist() == [1, 0]
+    assert top_k_nearest([0.0, 0.0], np.empty((0, 2)), 5)[0].tolist() == []